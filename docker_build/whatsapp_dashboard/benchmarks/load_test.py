@@ -0,0 +1,193 @@
+"""Gerador de carga HTTP para a dashboard.
+
+Faz login com um usuário de cada papel (lidos do manifesto de generate_data.py),
+dispara requisições concorrentes às páginas de cada blueprint e mostra latência
+p50/p95/p99 e vazão por rota.
+
+Exemplo:
+    python benchmarks/load_test.py --base-url http://localhost:5000 --concurrency 20 --duration 60
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+# Rotas exercitadas por papel. {client_id}, {order_id} e {technician_id} são sorteados
+# dentro das faixas do manifesto
+ROUTES_BY_ROLE = {
+    'admin': [
+        '/dashboard/',
+        '/clients/',
+        '/clients/?search=silva',
+        '/clients/{client_id}',
+        '/financial/',
+        '/financial/invoices',
+        '/financial/invoices?status=open&search=mensalidade',
+        '/financial/reports?period=month',
+        '/financial/reports?period=year',
+        '/technicians/',
+        '/technicians/{technician_id}',
+        '/technicians/performance?period=month',
+        '/orders/',
+        '/orders/?status=completed',
+        '/orders/{order_id}',
+        '/orders/map'
+    ],
+    'attendant': [
+        '/dashboard/',
+        '/clients/',
+        '/clients/?search=santos',
+        '/clients/{client_id}',
+        '/financial/',
+        '/financial/invoices',
+        '/orders/',
+        '/orders/{order_id}'
+    ],
+    'technician': [
+        '/dashboard/',
+        '/orders/',
+        '/orders/{order_id}'
+    ]
+}
+
+class Session:
+    """Cliente HTTP com cookies (uma sessão logada por papel)"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+
+    def login(self, username, password):
+        data = urllib.parse.urlencode({'username': username, 'password': password}).encode()
+        response = self.opener.open(self.base_url + '/auth/login', data=data, timeout=30)
+        response.read()
+        if '/auth/login' in response.geturl():
+            raise RuntimeError(f"Falha no login de {username}")
+
+    def get(self, path):
+        """Retorna (status, segundos, bytes)"""
+        started = time.perf_counter()
+        try:
+            response = self.opener.open(self.base_url + path, timeout=60)
+            body = response.read()
+            status = response.status
+        except urllib.error.HTTPError as e:
+            body = e.read()
+            status = e.code
+        except Exception:
+            return 0, time.perf_counter() - started, 0
+        return status, time.perf_counter() - started, len(body)
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def resolve(route, counts, rng):
+    return route.format(
+        client_id=rng.randint(1, counts.get('clients', 1)),
+        order_id=rng.randint(1, counts.get('service_orders', 1)),
+        technician_id=rng.randint(1, counts.get('technicians', 1))
+    )
+
+def run(args, manifest):
+    counts = manifest.get('counts', {})
+    roles = args.roles.split(',')
+
+    sessions = {}
+    for role in roles:
+        user = manifest['users'][role]
+        session = Session(args.base_url)
+        session.login(user['username'], user['password'])
+        sessions[role] = session
+        print(f"Logado como {role} ({user['username']})")
+
+    results = {}
+    lock = threading.Lock()
+    deadline = time.time() + args.duration
+
+    def worker(worker_id):
+        rng = random.Random(args.seed + worker_id)
+        role = roles[worker_id % len(roles)]
+        session = sessions[role]
+        routes = ROUTES_BY_ROLE[role]
+        while time.time() < deadline:
+            route = rng.choice(routes)
+            status, elapsed, size = session.get(resolve(route, counts, rng))
+            with lock:
+                entry = results.setdefault((role, route), {'times': [], 'errors': 0, 'bytes': 0})
+                entry['times'].append(elapsed)
+                entry['bytes'] += size
+                if status != 200:
+                    entry['errors'] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    started = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.time() - started
+
+def report(results, elapsed):
+    """Tabela por rota + resumo geral; retorna as linhas para o JSON"""
+    rows = []
+    for (role, route), entry in sorted(results.items()):
+        times = sorted(entry['times'])
+        rows.append({
+            'role': role,
+            'route': route,
+            'requests': len(times),
+            'errors': entry['errors'],
+            'rps': len(times) / elapsed,
+            'p50_ms': percentile(times, 50) * 1000,
+            'p95_ms': percentile(times, 95) * 1000,
+            'p99_ms': percentile(times, 99) * 1000,
+            'avg_kb': entry['bytes'] / max(len(times), 1) / 1024
+        })
+
+    header = f"{'papel':<11} {'rota':<52} {'req':>6} {'erros':>6} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'KB':>7}"
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        print(f"{row['role']:<11} {row['route']:<52} {row['requests']:>6} {row['errors']:>6} "
+              f"{row['rps']:>7.1f} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['avg_kb']:>7.1f}")
+
+    all_times = sorted(t for entry in results.values() for t in entry['times'])
+    total_errors = sum(entry['errors'] for entry in results.values())
+    print('-' * len(header))
+    print(f"Total: {len(all_times)} requisições em {elapsed:.1f}s ({len(all_times) / elapsed:.1f} req/s), "
+          f"{total_errors} erros, p50 {percentile(all_times, 50) * 1000:.1f} ms, "
+          f"p95 {percentile(all_times, 95) * 1000:.1f} ms, p99 {percentile(all_times, 99) * 1000:.1f} ms")
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga da dashboard por papel e rota')
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--manifest', default='benchmarks/manifest.json', help='gerado por generate_data.py')
+    parser.add_argument('--roles', default='admin,attendant,technician')
+    parser.add_argument('--concurrency', type=int, default=10, help='número de clientes simultâneos')
+    parser.add_argument('--duration', type=int, default=30, help='duração em segundos')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='grava o resultado em JSON (para comparar antes/depois)')
+    args = parser.parse_args()
+
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+
+    results, elapsed = run(args, manifest)
+    rows = report(results, elapsed)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'duration': elapsed, 'concurrency': args.concurrency, 'routes': rows}, f, indent=2)
+        print(f"Resultado gravado em {args.output}")
+
+if __name__ == '__main__':
+    main()
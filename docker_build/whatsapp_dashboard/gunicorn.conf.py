@@ -0,0 +1,46 @@
+# Configuração do gunicorn para produção: gunicorn -c gunicorn.conf.py src.wsgi:app
+#
+# Recarga sem derrubar requisições em andamento:
+#   kill -HUP <pid do master>    -> recria os workers com a configuração atual
+#   kill -USR2 <pid do master>   -> sobe um novo master com o código novo (preload);
+#   kill -WINCH <pid antigo>     -> encerra os workers antigos e depois kill -QUIT <pid antigo>
+import multiprocessing
+import os
+import shutil
+
+# Métricas do prometheus_client compartilhadas entre workers (precisa ser definido antes do preload)
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/dashboard_metrics')
+
+bind = os.environ.get('DASHBOARD_BIND', '0.0.0.0:5000')
+
+# Processos dimensionados pelo número de CPUs, cada um com algumas threads para I/O do banco e
+# para as conexões do dashboard ao vivo (até LIVE_MAX_SUBSCRIBERS por worker)
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+worker_class = 'gthread'
+
+# Carrega a aplicação uma vez no master (create_app não abre conexões antes do fork)
+preload_app = True
+
+# Relatórios longos não devem ser mortos pelo timeout padrão de 30s
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Recicla workers periodicamente para conter vazamentos de memória
+max_requests = 1000
+max_requests_jitter = 100
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+def on_starting(server):
+    # Começa sempre com o diretório de métricas limpo
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
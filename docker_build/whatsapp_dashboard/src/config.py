@@ -0,0 +1,97 @@
+import os
+from urllib.parse import quote_plus
+
+def _database_uri():
+    """URI do banco do bot WhatsApp: DATABASE_URL ou variáveis DB_* do docker-compose (None sem nenhum dos dois)"""
+    if os.environ.get('DATABASE_URL'):
+        return os.environ['DATABASE_URL']
+
+    if os.environ.get('DB_HOST'):
+        user = quote_plus(os.environ.get('DB_USER', 'root'))
+        password = quote_plus(os.environ.get('DB_PASSWORD', ''))
+        host = os.environ['DB_HOST']
+        port = os.environ.get('DB_PORT', '3306')
+        name = os.environ.get('DB_NAME', 'WTS2')
+        return f"mysql+pymysql://{user}:{password}@{host}:{port}/{name}"
+
+    return None
+
+class Config:
+    """Configuração padrão, lida das variáveis de ambiente"""
+
+    # Obrigatória fora de testes/debug (create_app recusa iniciar sem ela)
+    SECRET_KEY = os.environ.get('SECRET_KEY')
+
+    # Configuração do banco de dados - usando o mesmo banco do bot WhatsApp
+    # Obrigatória fora de testes/debug (create_app recusa iniciar sem ela)
+    SQLALCHEMY_DATABASE_URI = _database_uri()
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Pool por processo: valida conexões antes do uso e as recicla antes do wait_timeout do MariaDB
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_pre_ping': True,
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 280)),
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    }
+
+    # Validade (segundos) do cache compartilhado das estatísticas do dashboard
+    STATS_CACHE_TTL = int(os.environ.get('STATS_CACHE_TTL', 60))
+
+    # Validade (segundos) da visão consolidada de cada cliente (detalhe do cliente)
+    CLIENT360_CACHE_TTL = int(os.environ.get('CLIENT360_CACHE_TTL', 120))
+
+    # Intervalo mínimo (segundos) entre atualizações incrementais do agregado diário de faturas
+    INVOICE_ROLLUP_REFRESH = int(os.environ.get('INVOICE_ROLLUP_REFRESH', 60))
+
+    # Idem para os agregados de desempenho dos técnicos
+    TECHNICIAN_ROLLUP_REFRESH = int(os.environ.get('TECHNICIAN_ROLLUP_REFRESH', 60))
+
+    # Dashboard ao vivo (SSE): intervalo do produtor, telas por processo e duração de cada conexão
+    LIVE_STATS_INTERVAL = int(os.environ.get('LIVE_STATS_INTERVAL', 10))
+    LIVE_MAX_SUBSCRIBERS = int(os.environ.get('LIVE_MAX_SUBSCRIBERS', 4))
+    LIVE_STREAM_MAX_SECONDS = int(os.environ.get('LIVE_STREAM_MAX_SECONDS', 300))
+
+    # Geocodificação dos endereços do mapa: backend (google/local), chave e endereços por rodada
+    GEOCODER_BACKEND = os.environ.get('GEOCODER_BACKEND')
+    GOOGLE_MAPS_API_KEY = os.environ.get('GOOGLE_MAPS_API_KEY')
+    GEOCODE_REGION = os.environ.get('GEOCODE_REGION', 'br')
+    GEOCODE_BATCH_SIZE = int(os.environ.get('GEOCODE_BATCH_SIZE', 25))
+
+    # Sugestão de técnico mais próximo: idade máxima (segundos) do índice espacial em memória
+    DISPATCH_INDEX_TTL = int(os.environ.get('DISPATCH_INDEX_TTL', 15))
+
+    # Fotos dos serviços: raiz onde o bot grava uploads/service_photos/<ordem>/ (volume compartilhado),
+    # cache em disco das miniaturas e threads por processo para gerá-las
+    PHOTO_UPLOAD_ROOT = os.environ.get('PHOTO_UPLOAD_ROOT', '/usr/src/app')
+    THUMBNAIL_CACHE_DIR = os.environ.get('THUMBNAIL_CACHE_DIR', '/usr/src/app/cache/thumbnails')
+    THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+
+    # ETag das listas/detalhes: validade máxima (segundos) sem mudanças e versão do deploy
+    # (mudar APP_VERSION invalida as páginas guardadas pelos navegadores após alterar templates)
+    CONDITIONAL_GET_MAX_AGE = int(os.environ.get('CONDITIONAL_GET_MAX_AGE', 300))
+    APP_VERSION = os.environ.get('APP_VERSION', '')
+
+    # Cache de fragmentos de template: entradas no LRU de cada processo, validade (segundos) e se
+    # os fragmentos também vão para o dashboard_cache (compartilhado entre workers)
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 256))
+    FRAGMENT_CACHE_TTL = int(os.environ.get('FRAGMENT_CACHE_TTL', 300))
+    FRAGMENT_CACHE_SHARED = os.environ.get('FRAGMENT_CACHE_SHARED', '0') == '1'
+
+    # Jobs em segundo plano (flask jobs-worker): processos do worker, intervalo de consulta à fila
+    # (segundos), validade dos resultados reaproveitados (segundos) e dias até apagar jobs antigos.
+    # JOBS_INLINE=1 executa os jobs na própria requisição (desenvolvimento sem worker)
+    JOB_WORKER_PROCESSES = int(os.environ.get('JOB_WORKER_PROCESSES', 2))
+    JOB_POLL_INTERVAL = int(os.environ.get('JOB_POLL_INTERVAL', 2))
+    JOB_RESULT_TTL = int(os.environ.get('JOB_RESULT_TTL', 600))
+    JOB_RETENTION_DAYS = int(os.environ.get('JOB_RETENTION_DAYS', 7))
+    JOBS_INLINE = os.environ.get('JOBS_INLINE', '0') == '1'
+
+    # Tempo (segundos) em que a identidade guardada na sessão é reaproveitada sem consultar o banco
+    IDENTITY_CLAIMS_TTL = int(os.environ.get('IDENTITY_CLAIMS_TTL', 60))
+
+    # Consultas acima deste tempo (ms) vão para o log de consultas lentas
+    SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 500))
+
+    # Se definido, /metrics exige o cabeçalho "Authorization: Bearer <token>"
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
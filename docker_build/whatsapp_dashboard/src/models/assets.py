@@ -0,0 +1,91 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+try:
+    import brotli
+except ImportError:  # Sem o pacote Brotli só as variantes gzip são geradas
+    brotli = None
+
+# Pasta (dentro de static) com os arquivos versionados e o manifesto gerados pelo build
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Arquivos de static que recebem hash no nome; base.html e index.html são páginas, não recursos
+ASSET_EXTENSIONS = ('.js', '.css', '.map', '.json', '.svg', '.png', '.jpg', '.jpeg', '.gif',
+                    '.webp', '.ico', '.woff', '.woff2')
+
+# Formatos de texto que valem a pena comprimir (imagens e fontes já são comprimidas)
+COMPRESSIBLE_EXTENSIONS = ('.js', '.css', '.map', '.json', '.svg')
+
+# Variantes pré-comprimidas: codificação HTTP -> sufixo do arquivo, em ordem de preferência
+ENCODING_SUFFIXES = (('br', '.br'), ('gzip', '.gz'))
+
+# Abaixo disto (bytes) o cabeçalho Content-Encoding custa mais do que economiza
+MIN_COMPRESS_SIZE = 256
+
+def fingerprint_name(relative_path, digest):
+    """js/app.js -> js/app.<hash>.js"""
+    root, ext = os.path.splitext(relative_path)
+    return f"{root}.{digest}{ext}"
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11) if brotli else None
+    # mtime=0: o mesmo conteúdo gera sempre o mesmo .gz (builds reproduzíveis)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as output:
+        output.write(data)
+
+def build_assets(static_dir):
+    """Gera static/dist: cópias com hash do conteúdo no nome, variantes .br/.gz e o manifesto.
+
+    O manifesto mapeia o nome lógico (js/live_dashboard.js) para o arquivo versionado e as
+    codificações disponíveis. A pasta é refeita do zero; retorna o manifesto.
+    """
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    if os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+
+    manifest = {}
+    for folder, subfolders, files in os.walk(static_dir):
+        subfolders[:] = sorted(name for name in subfolders
+                               if os.path.join(folder, name) != dist_dir)
+        for name in sorted(files):
+            if not name.lower().endswith(ASSET_EXTENSIONS):
+                continue
+            source = os.path.join(folder, name)
+            relative_path = os.path.relpath(source, static_dir).replace(os.sep, '/')
+            with open(source, 'rb') as asset_file:
+                data = asset_file.read()
+
+            hashed = fingerprint_name(relative_path, hashlib.sha256(data).hexdigest()[:12])
+            target = os.path.join(dist_dir, hashed)
+            _write(target, data)
+
+            encodings = []
+            if name.lower().endswith(COMPRESSIBLE_EXTENSIONS) and len(data) >= MIN_COMPRESS_SIZE:
+                for encoding, suffix in ENCODING_SUFFIXES:
+                    compressed = _compress(data, encoding)
+                    if compressed is not None and len(compressed) < len(data):
+                        _write(target + suffix, compressed)
+                        encodings.append(encoding)
+
+            manifest[relative_path] = {'path': hashed, 'size': len(data), 'encodings': encodings}
+
+    _write(os.path.join(dist_dir, MANIFEST_NAME),
+           json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+def load_manifest(static_dir):
+    """Manifesto do último build ou {} se o build não foi executado (desenvolvimento)"""
+    try:
+        with open(os.path.join(static_dir, DIST_DIR, MANIFEST_NAME), encoding='utf-8') as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
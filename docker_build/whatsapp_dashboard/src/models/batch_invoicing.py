@@ -0,0 +1,175 @@
+import csv
+import io
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from src.models.database import db, execute_sql
+from src.models.rollups import in_placeholders, chunks
+
+# Faturas por INSERT multi-linha
+BATCH_INSERT_ROWS = 500
+
+# Colunas aceitas no CSV (description é opcional)
+CSV_COLUMNS = ('client_id', 'amount', 'due_date', 'description')
+
+def parse_amount(value):
+    """Aceita 150.50, 150,50 e 1.234,56; retorna Decimal positivo ou None"""
+    value = (value or '').strip().replace('R$', '').replace(' ', '')
+    if ',' in value:
+        value = value.replace('.', '').replace(',', '.')
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        return None
+    return amount.quantize(Decimal('0.01')) if amount > 0 else None
+
+def parse_due_date(value):
+    """Aceita AAAA-MM-DD ou DD/MM/AAAA"""
+    value = (value or '').strip()
+    for date_format in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+def _make_row(line, client_id, amount, due_date, description):
+    """Linha normalizada + lista de erros de formato"""
+    errors = []
+    try:
+        client_id = int(str(client_id).strip())
+    except (TypeError, ValueError):
+        errors.append('client_id inválido')
+        client_id = None
+
+    parsed_amount = parse_amount(amount)
+    if parsed_amount is None:
+        errors.append(f"valor inválido: '{amount}'")
+
+    parsed_due_date = parse_due_date(due_date)
+    if parsed_due_date is None:
+        errors.append(f"vencimento inválido: '{due_date}'")
+
+    return {
+        'line': line,
+        'client_id': client_id,
+        'amount': parsed_amount,
+        'due_date': parsed_due_date,
+        'description': (description or '').strip(),
+        'errors': errors
+    }
+
+def rows_from_csv(text):
+    """Lê o CSV (separador ; ou ,) com cabeçalho client_id, amount, due_date[, description]"""
+    sample = text[:4096]
+    delimiter = ';' if sample.count(';') > sample.count(',') else ','
+    reader = csv.DictReader(io.StringIO(text.lstrip('\ufeff')), delimiter=delimiter)
+
+    missing = [column for column in CSV_COLUMNS[:3] if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"Colunas ausentes no CSV: {', '.join(missing)}")
+
+    # Linha 1 é o cabeçalho
+    return [_make_row(line, record.get('client_id'), record.get('amount'),
+                      record.get('due_date'), record.get('description'))
+            for line, record in enumerate(reader, start=2)]
+
+def rows_from_selection(client_ids, amount, due_date, description):
+    """Uma fatura com o mesmo valor/vencimento para cada cliente selecionado"""
+    if isinstance(client_ids, str):
+        client_ids = re.split(r'[\s,;]+', client_ids.strip())
+    return [_make_row(line, client_id, amount, due_date, description)
+            for line, client_id in enumerate([c for c in client_ids if c], start=1)]
+
+def _existing_clients(client_ids):
+    """Ids de clientes existentes (consulta por conjunto, em lotes)"""
+    existing = set()
+    for batch in chunks(client_ids, 1000):
+        result = execute_sql(f"""
+            SELECT id FROM clients WHERE id IN ({in_placeholders(batch)})
+        """, tuple(batch))
+        existing.update(row[0] for row in result)
+    return existing
+
+def _existing_invoices(rows, with_amount=False):
+    """Pares (cliente, vencimento) que já têm fatura - evita duplicar ao repetir o lote do mês.
+    Com with_amount, trios (cliente, vencimento, valor)"""
+    client_ids = sorted({row['client_id'] for row in rows})
+    due_dates = sorted({row['due_date'] for row in rows})
+    existing = set()
+    if not client_ids:
+        return existing
+
+    for batch in chunks(client_ids, 1000):
+        result = execute_sql(f"""
+            SELECT client_id, due_date, amount FROM invoices
+            WHERE client_id IN ({in_placeholders(batch)}) AND due_date IN ({in_placeholders(due_dates)})
+              AND status != 'cancelled'
+        """, tuple(batch) + tuple(due_dates))
+        existing.update(tuple(row) if with_amount else (row[0], row[1]) for row in result)
+    return existing
+
+def create_invoices(rows, skip_existing=True, skip_saved=False):
+    """Valida e insere o lote numa única transação com INSERTs multi-linha.
+
+    Linhas com erro são ignoradas e reportadas; as válidas são gravadas juntas (ou nenhuma,
+    se o banco recusar o lote). Retorna {'created', 'client_ids', 'errors': [(linha, mensagem)]}.
+    skip_saved ignora linhas com fatura igual (cliente, vencimento e valor) já gravada, mesmo
+    com duplicatas permitidas: usado ao repetir um lote que pode ter sido gravado antes.
+    """
+    errors = [(row['line'], '; '.join(row['errors'])) for row in rows if row['errors']]
+    candidates = [row for row in rows if not row['errors']]
+
+    existing_clients = _existing_clients(sorted({row['client_id'] for row in candidates}))
+    valid = []
+    for row in candidates:
+        if row['client_id'] not in existing_clients:
+            errors.append((row['line'], f"cliente {row['client_id']} não encontrado"))
+        else:
+            valid.append(row)
+
+    if skip_existing and valid:
+        existing_invoices = _existing_invoices(valid)
+        seen = set()
+        remaining = []
+        for row in valid:
+            key = (row['client_id'], row['due_date'])
+            if key in existing_invoices:
+                errors.append((row['line'], f"cliente {row['client_id']} já tem fatura com vencimento {row['due_date']}"))
+            elif key in seen:
+                errors.append((row['line'], f"linha duplicada para o cliente {row['client_id']}"))
+            else:
+                seen.add(key)
+                remaining.append(row)
+        valid = remaining
+    elif skip_saved and valid:
+        saved_invoices = _existing_invoices(valid, with_amount=True)
+        remaining = []
+        for row in valid:
+            if (row['client_id'], row['due_date'], row['amount']) in saved_invoices:
+                errors.append((row['line'], f"fatura do cliente {row['client_id']} com vencimento {row['due_date']} já gravada"))
+            else:
+                remaining.append(row)
+        valid = remaining
+
+    try:
+        for batch in chunks(valid, BATCH_INSERT_ROWS):
+            values = ', '.join(["(%s, %s, %s, 'open', %s, NOW())"] * len(batch))
+            params = []
+            for row in batch:
+                params.extend([row['client_id'], row['amount'], row['due_date'], row['description']])
+            execute_sql(f"""
+                INSERT INTO invoices (client_id, amount, due_date, status, description, created_at)
+                VALUES {values}
+            """, tuple(params))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    errors.sort(key=lambda error: error[0])
+    return {
+        'created': len(valid),
+        'client_ids': sorted({row['client_id'] for row in valid}),
+        'errors': errors
+    }
@@ -0,0 +1,96 @@
+import json
+import logging
+from prometheus_client import Counter
+from src.models.database import db, execute_sql
+
+cache_logger = logging.getLogger('dashboard.cache')
+
+# Falhas do cache não derrubam a página (ela é recalculada), mas não podem passar despercebidas:
+# vão para o log com o traceback e para /metrics
+CACHE_ERRORS = Counter(
+    'dashboard_cache_errors_total', 'Falhas de leitura/gravação no cache compartilhado',
+    ['operation'])
+
+def _report_error(operation, key):
+    CACHE_ERRORS.labels(operation).inc()
+    cache_logger.exception("Erro no cache compartilhado (%s %s)", operation, key)
+
+class CacheEntry(db.Model):
+    """Cache compartilhado entre todos os workers, guardado no próprio banco"""
+    __tablename__ = 'dashboard_cache'
+
+    cache_key = db.Column(db.String(191), primary_key=True)
+    value = db.Column(db.Text(16777215), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<CacheEntry {self.cache_key}>'
+
+def _write(sql, params=None):
+    """Grava o cache numa conexão própria, confirmada na hora.
+
+    Um cache miss acontece no meio da requisição: commit/rollback na sessão levaria junto (ou
+    desfaria) o trabalho ainda pendente de quem chamou.
+    """
+    with db.engine.begin() as connection:
+        return execute_sql(sql, params, connection=connection)
+
+def cache_get(key):
+    """Retorna o valor em cache ou None se ausente/expirado"""
+    try:
+        result = execute_sql("""
+            SELECT value FROM dashboard_cache
+            WHERE cache_key = %s AND expires_at > NOW()
+        """, (key,))
+        row = result.fetchone()
+    except Exception:
+        _report_error('get', key)
+        return None
+
+    if not row:
+        return None
+    return json.loads(row[0])
+
+def cache_get_prefix(prefix):
+    """Entradas válidas cujas chaves começam com o prefixo: {chave: valor} (faixa da chave primária)"""
+    try:
+        result = execute_sql("""
+            SELECT cache_key, value FROM dashboard_cache
+            WHERE cache_key LIKE %s AND expires_at > NOW()
+        """, (prefix + '%',))
+        return {key: json.loads(value) for key, value in result}
+    except Exception:
+        _report_error('get_prefix', prefix + '*')
+        return {}
+
+def cache_set(key, value, ttl):
+    """Grava o valor (serializado em JSON) com validade de ttl segundos"""
+    try:
+        _write("""
+            INSERT INTO dashboard_cache (cache_key, value, expires_at)
+            VALUES (%s, %s, DATE_ADD(NOW(), INTERVAL %s SECOND))
+            ON DUPLICATE KEY UPDATE value = VALUES(value), expires_at = VALUES(expires_at)
+        """, (key, json.dumps(value, default=str), int(ttl)))
+    except Exception:
+        _report_error('set', key)
+
+def cache_delete(*keys):
+    """Remove as chaves informadas do cache"""
+    if not keys:
+        return
+    try:
+        placeholders = ', '.join(['%s'] * len(keys))
+        _write(f"DELETE FROM dashboard_cache WHERE cache_key IN ({placeholders})", keys)
+    except Exception:
+        _report_error('delete', keys)
+
+def cache_delete_prefix(prefix):
+    """Remove todas as chaves que começam com o prefixo (usa o índice da chave primária)"""
+    try:
+        _write("DELETE FROM dashboard_cache WHERE cache_key LIKE %s", (prefix + '%',))
+    except Exception:
+        _report_error('delete_prefix', prefix + '*')
+
+def cache_purge_expired():
+    """Apaga entradas expiradas (chamado pela tarefa diária)"""
+    return _write("DELETE FROM dashboard_cache WHERE expires_at <= NOW()").rowcount
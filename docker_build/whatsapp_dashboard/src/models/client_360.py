@@ -0,0 +1,141 @@
+import os
+import time
+from datetime import datetime, date
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from src.models.database import db
+from src.models.cache import cache_get, cache_set, cache_delete
+
+# Prefixo das chaves no dashboard_cache (uma entrada por cliente)
+CLIENT360_CACHE_PREFIX = 'client360:'
+DEFAULT_CLIENT360_TTL = 120
+
+# Seções da visão do cliente; cada uma é uma consulta independente
+SECTION_QUERIES = {
+    'client': """
+        SELECT id, name, whatsapp_number, address, last_interaction_type,
+               last_interaction_at, created_at
+        FROM clients
+        WHERE id = %s
+    """,
+    'appointments': """
+        SELECT id, specialty, appointment_date, status, created_at
+        FROM appointments
+        WHERE client_id = %s
+        ORDER BY appointment_date DESC
+        LIMIT 10
+    """,
+    'orders': """
+        SELECT id, status, created_at, completed_at
+        FROM service_orders
+        WHERE client_id = %s
+        ORDER BY created_at DESC
+        LIMIT 10
+    """,
+    'invoices': """
+        SELECT id, amount, due_date, status, description
+        FROM invoices
+        WHERE client_id = %s
+        ORDER BY due_date DESC
+        LIMIT 10
+    """
+}
+
+SECTIONS = tuple(SECTION_QUERIES)
+
+# Lista de clientes (clients.list), paginada por cursor em last_interaction_at + id; também
+# analisada com EXPLAIN pelo "flask upgrade --check"
+LIST_QUERY = """
+    SELECT id, name, whatsapp_number, address, last_interaction_type,
+           last_interaction_at, created_at
+    FROM clients
+"""
+LIST_SORT = {'sort_column': 'last_interaction_at', 'id_column': 'id', 'nullable': True}
+
+# Colunas de data que voltam do cache JSON como texto ISO
+DATE_COLUMNS = ('appointment_date', 'created_at', 'completed_at', 'due_date', 'last_interaction_at')
+
+_executor = None
+_executor_pid = None
+
+def _get_executor():
+    """Pool de threads do processo (recriado após fork dos workers do gunicorn)"""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=len(SECTIONS), thread_name_prefix='client360')
+        _executor_pid = os.getpid()
+    return _executor
+
+def _cache_key(client_id):
+    return f"{CLIENT360_CACHE_PREFIX}{client_id}"
+
+def _serialize(row):
+    """Linha -> dict serializável em JSON"""
+    data = {}
+    for key, value in row._mapping.items():
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = float(value)
+        data[key] = value
+    return data
+
+def _restore(data):
+    """Converte de volta as datas guardadas como texto, para os templates usarem strftime"""
+    for column in DATE_COLUMNS:
+        value = data.get(column)
+        if isinstance(value, str):
+            parsed = datetime.fromisoformat(value)
+            data[column] = parsed.date() if len(value) == 10 else parsed
+    return data
+
+def _fetch_section(engine, section, client_id):
+    """Executa uma seção em uma conexão própria do pool"""
+    with engine.connect() as conn:
+        result = conn.exec_driver_sql(SECTION_QUERIES[section], (client_id,))
+        return [_serialize(row) for row in result]
+
+def fetch_sections(client_id, sections=SECTIONS):
+    """Busca as seções em paralelo (uma conexão do pool por seção); retorna {seção: linhas}"""
+    engine = db.engine
+    executor = _get_executor()
+    futures = {section: executor.submit(_fetch_section, engine, section, client_id)
+               for section in sections}
+    return {section: future.result() for section, future in futures.items()}
+
+def _assemble(data):
+    """Formato usado pelas rotas: client é um dict (ou None) e as demais seções listas"""
+    view = {}
+    for section, rows in data.items():
+        rows = [_restore(row) for row in rows]
+        view[section] = (rows[0] if rows else None) if section == 'client' else rows
+    return view
+
+def get_client_360(client_id, sections=SECTIONS):
+    """Visão consolidada do cliente, lida do cache compartilhado ou montada em paralelo.
+
+    Com o cache vazio, todas as seções são buscadas (mesmo se só algumas forem pedidas),
+    para que a próxima carga parcial já encontre a visão completa.
+    """
+    key = _cache_key(client_id)
+    cached = cache_get(key)
+    if cached is None:
+        cached = fetch_sections(client_id)
+        cached['fetched_at'] = time.time()
+        if cached['client']:
+            ttl = current_app.config.get('CLIENT360_CACHE_TTL', DEFAULT_CLIENT360_TTL)
+            cache_set(key, cached, ttl)
+
+    return _assemble({section: cached.get(section, []) for section in sections})
+
+def client_360_version(client_id):
+    """Momento em que a visão em cache foi montada (None sem cache: a view buscará dados atuais)"""
+    cached = cache_get(_cache_key(client_id))
+    return cached.get('fetched_at') if cached else None
+
+def invalidate_client_360(*client_ids):
+    """Descarta a visão em cache dos clientes alterados pela dashboard"""
+    keys = [_cache_key(client_id) for client_id in client_ids if client_id]
+    if keys:
+        cache_delete(*keys)
@@ -0,0 +1,99 @@
+import hashlib
+import time
+from datetime import date
+from functools import wraps
+from flask import current_app, request, session, make_response
+from src.models.database import db, execute_sql
+from src.models.identity import get_current_user
+
+# Marcadores de mudança por tabela: índices em updated_at (migrações 0004, 0005 e 0007) e na chave
+# primária tornam cada MAX uma leitura da ponta do índice. service_photos só recebe inserções
+CHANGE_MARKERS = {
+    'clients': ('updated_at', 'id'),
+    'invoices': ('updated_at', 'id'),
+    'service_orders': ('updated_at', 'id'),
+    'technicians': ('updated_at', 'id'),
+    'appointments': ('updated_at', 'id'),
+    'service_photos': ('id',)
+}
+
+# Validade máxima (segundos) de um ETag mesmo sem mudanças: exclusões feitas direto no banco não
+# alteram os marcadores e aparecem no máximo após esse tempo - sobrescrito por CONDITIONAL_GET_MAX_AGE
+DEFAULT_MAX_AGE = 300
+
+def table_versions(tables):
+    """NOW() do banco e os marcadores das tabelas numa única consulta"""
+    columns = ['NOW()']
+    for table in tables:
+        columns.extend(f"(SELECT MAX({column}) FROM {table})" for column in CHANGE_MARKERS[table])
+    row = execute_sql(f"SELECT {', '.join(columns)}").fetchone()
+    return row[0], list(row[1:])
+
+def _compute_etag(tables, data_version=None):
+    """ETag da página atual ou None quando não é seguro validar (marcador do segundo corrente)"""
+    now, versions = table_versions(tables)
+
+    # updated_at tem resolução de segundos: uma mudança no mesmo segundo da resposta não
+    # alteraria o marcador, então páginas recém-alteradas não recebem validador
+    timestamps = [value for value in versions if hasattr(value, 'year')]
+    if timestamps and (now - max(timestamps)).total_seconds() < 2:
+        return None
+
+    user = get_current_user()
+    max_age = current_app.config.get('CONDITIONAL_GET_MAX_AGE', DEFAULT_MAX_AGE)
+    parts = [
+        request.full_path,
+        # Conteúdo depende do usuário (técnico vê só as próprias ordens) e do dia (vencidas)
+        (user.id, user.role, user.technician_id, user.full_name) if user else None,
+        date.today().isoformat(),
+        int(time.time() // max_age),
+        current_app.config.get('APP_VERSION', ''),
+        tables, versions,
+        # Views que leem cache ou agregado: versão do que será exibido, não só das tabelas
+        data_version
+    ]
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+def conditional_get(*tables, version=None):
+    """Responde 304 sem executar a view quando as tabelas que ela lê não mudaram.
+
+    O ETag combina a URL, o usuário, o dia e os marcadores de mudança (MAX(updated_at) e
+    MAX(id)) das tabelas. Só vale para GET de usuário logado sem mensagens pendentes; se os
+    marcadores não puderem ser lidos, a view roda normalmente.
+
+    Views que exibem um cache ou agregado (atualizado depois das tabelas) informam version:
+    função que recebe os argumentos da view e retorna a versão desses dados. Sem ela, um corpo
+    ainda antigo do cache ficaria guardado pelo navegador sob o ETag das tabelas já alteradas.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Mensagens flash são consumidas pela renderização: a página precisa ser gerada
+            if request.method != 'GET' or 'user_id' not in session or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            try:
+                etag = _compute_etag(tables, version(**kwargs) if version else None)
+            except Exception as e:
+                print(f"Erro ao ler marcadores de mudança ({', '.join(tables)}): {e}")
+                db.session.rollback()
+                etag = None
+
+            if etag is None:
+                return view(*args, **kwargs)
+
+            if etag in request.if_none_match:
+                response = make_response('', 304)
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'private, no-cache'
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            # Redirecionamentos (acesso negado, erro), respostas em streaming e páginas marcadas
+            # como no-store pela view (ex.: relatório ainda processando) não são validados
+            if response.status_code == 200 and not response.is_streamed and not response.cache_control.no_store:
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
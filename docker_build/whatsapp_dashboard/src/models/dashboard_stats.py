@@ -1,13 +1,26 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from datetime import datetime, date, timedelta
 from sqlalchemy import Numeric
-from src.models.database import db
+from src.models.database import db, execute_sql
+from src.models.financial_summary import get_financial_summary
+
+# Campos numéricos gravados em cada snapshot diário
+STAT_FIELDS = [
+    'total_clients',
+    'total_appointments',
+    'total_service_orders',
+    'pending_orders',
+    'completed_orders',
+    'total_revenue',
+    'pending_invoices',
+    'active_technicians'
+]
 
 class DashboardStats(db.Model):
     __tablename__ = 'dashboard_stats'
-    
+
     id = db.Column(db.Integer, primary_key=True)
-    stat_date = db.Column(db.Date, nullable=False, default=datetime.utcnow().date())
+    stat_date = db.Column(db.Date, nullable=False, unique=True, index=True, default=lambda: date.today())
     total_clients = db.Column(db.Integer, default=0)
     total_appointments = db.Column(db.Integer, default=0)
     total_service_orders = db.Column(db.Integer, default=0)
@@ -16,61 +29,157 @@ class DashboardStats(db.Model):
     total_revenue = db.Column(Numeric(10, 2), default=0.00)
     pending_invoices = db.Column(db.Integer, default=0)
     active_technicians = db.Column(db.Integer, default=0)
+    # Horário do banco no momento do cálculo - usado como marca d'água do delta do dia
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
+
+    def to_dict(self):
+        """Retorna os valores do snapshot como dicionário"""
+        stats = {field: getattr(self, field) or 0 for field in STAT_FIELDS}
+        stats['total_revenue'] = float(stats['total_revenue'])
+        return stats
+
     @staticmethod
-    def get_current_stats():
-        """Calcula estatísticas atuais do sistema"""
-        from datetime import date
-        
-        # Buscar dados das tabelas existentes do bot WhatsApp
-        stats = {}
-        
+    def empty_stats():
+        """Valores padrão usados quando não é possível calcular as estatísticas"""
+        stats = {field: 0 for field in STAT_FIELDS}
+        stats['total_revenue'] = 0.00
+        return stats
+
+    @staticmethod
+    def compute_stats():
+        """Calcula as estatísticas completas (uma consulta agregada por tabela) - usado apenas pelo snapshot"""
+        stats = DashboardStats.empty_stats()
+
+        result = execute_sql("""
+            SELECT COUNT(*),
+                   COALESCE(SUM(CASE WHEN status IN ('assigned', 'en_route', 'arrived') THEN 1 ELSE 0 END), 0),
+                   COALESCE(SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END), 0)
+            FROM service_orders
+        """)
+        stats['total_service_orders'], stats['pending_orders'], stats['completed_orders'] = result.fetchone()
+
+        stats['total_clients'] = execute_sql("SELECT COUNT(*) FROM clients").fetchone()[0]
+        stats['total_appointments'] = execute_sql("SELECT COUNT(*) FROM appointments").fetchone()[0]
+        stats['active_technicians'] = execute_sql(
+            "SELECT COUNT(*) FROM technicians WHERE status = 'available'").fetchone()[0]
+
+        financial = get_financial_summary()
+        stats['pending_invoices'] = financial['pending_count']
+        stats['total_revenue'] = financial['total_revenue']
+        return stats
+
+    @staticmethod
+    def take_snapshot(stat_date=None):
+        """Grava (ou recalcula) o snapshot do dia na tabela dashboard_stats"""
+        stat_date = stat_date or date.today()
+
+        # Marca d'água no relógio do banco, antes das contagens, para que o delta não perca linhas
+        taken_at = execute_sql("SELECT NOW()").fetchone()[0]
+        values = DashboardStats.compute_stats()
+
+        snapshot = DashboardStats.query.filter_by(stat_date=stat_date).first()
+        if not snapshot:
+            snapshot = DashboardStats(stat_date=stat_date)
+            db.session.add(snapshot)
+
+        for field, value in values.items():
+            setattr(snapshot, field, value)
+        snapshot.created_at = taken_at
+
+        db.session.commit()
+        return snapshot
+
+    @staticmethod
+    def get_latest_snapshot():
+        """Retorna o snapshot mais recente (consulta indexada por stat_date)"""
+        return DashboardStats.query.order_by(DashboardStats.stat_date.desc()).first()
+
+    @staticmethod
+    def get_delta_since(since):
+        """Calcula a variação "de hoje até agora" desde o snapshot usando apenas faixas de created_at/completed_at"""
+        delta = {field: 0 for field in STAT_FIELDS}
+
+        # Novos clientes e agendamentos
+        result = execute_sql("SELECT COUNT(*) FROM clients WHERE created_at >= %s", (since,))
+        delta['total_clients'] = result.fetchone()[0]
+
+        result = execute_sql("SELECT COUNT(*) FROM appointments WHERE created_at >= %s", (since,))
+        delta['total_appointments'] = result.fetchone()[0]
+
+        # Novas ordens de serviço (e quantas delas já estão pendentes)
+        result = execute_sql("""
+            SELECT COUNT(*),
+                   COALESCE(SUM(CASE WHEN status IN ('assigned', 'en_route', 'arrived') THEN 1 ELSE 0 END), 0)
+            FROM service_orders
+            WHERE created_at >= %s
+        """, (since,))
+        new_orders = result.fetchone()
+        delta['total_service_orders'] = new_orders[0]
+        delta['pending_orders'] = new_orders[1]
+
+        # Ordens concluídas desde o snapshot - as criadas antes dele deixam de ser pendentes
+        result = execute_sql("""
+            SELECT COUNT(*),
+                   COALESCE(SUM(CASE WHEN created_at < %s THEN 1 ELSE 0 END), 0)
+            FROM service_orders
+            WHERE completed_at >= %s AND status = 'completed'
+        """, (since, since))
+        completed = result.fetchone()
+        delta['completed_orders'] = completed[0]
+        delta['pending_orders'] -= completed[1]
+
+        return delta
+
+    @staticmethod
+    def get_current_stats(financial=None):
+        """Retorna as estatísticas atuais: último snapshot diário + delta do dia.
+
+        Faturas pendentes e receita vêm do resumo financeiro (índice de cobertura), que também
+        enxerga pagamentos feitos pelo bot; financial permite reaproveitar um resumo já calculado.
+        """
         try:
-            # Total de clientes
-            result = db.session.execute("SELECT COUNT(*) as count FROM clients")
-            stats['total_clients'] = result.fetchone()[0]
-            
-            # Total de agendamentos
-            result = db.session.execute("SELECT COUNT(*) as count FROM appointments")
-            stats['total_appointments'] = result.fetchone()[0]
-            
-            # Ordens de serviço
-            result = db.session.execute("SELECT COUNT(*) as count FROM service_orders")
-            stats['total_service_orders'] = result.fetchone()[0]
-            
-            # Ordens pendentes
-            result = db.session.execute("SELECT COUNT(*) as count FROM service_orders WHERE status IN ('assigned', 'en_route', 'arrived')")
-            stats['pending_orders'] = result.fetchone()[0]
-            
-            # Ordens concluídas
-            result = db.session.execute("SELECT COUNT(*) as count FROM service_orders WHERE status = 'completed'")
-            stats['completed_orders'] = result.fetchone()[0]
-            
-            # Faturas pendentes
-            result = db.session.execute("SELECT COUNT(*) as count FROM invoices WHERE status = 'open'")
-            stats['pending_invoices'] = result.fetchone()[0]
-            
-            # Técnicos ativos
-            result = db.session.execute("SELECT COUNT(*) as count FROM technicians WHERE status = 'available'")
+            snapshot = DashboardStats.get_latest_snapshot()
+            if not snapshot:
+                # Primeiro acesso: gera o snapshot do dia uma única vez
+                snapshot = DashboardStats.take_snapshot()
+
+            stats = snapshot.to_dict()
+            delta = DashboardStats.get_delta_since(snapshot.created_at)
+            for field, value in delta.items():
+                stats[field] += value
+            stats['pending_orders'] = max(stats['pending_orders'], 0)
+
+            financial = financial or get_financial_summary()
+            stats['pending_invoices'] = financial['pending_count']
+            stats['total_revenue'] = financial['total_revenue']
+
+            # Técnicos mudam de status o tempo todo e a tabela é pequena: contagem direta
+            result = execute_sql("SELECT COUNT(*) as count FROM technicians WHERE status = 'available'")
             stats['active_technicians'] = result.fetchone()[0]
-            
-            # Receita total (faturas pagas)
-            result = db.session.execute("SELECT COALESCE(SUM(amount), 0) as total FROM invoices WHERE status = 'paid'")
-            stats['total_revenue'] = float(result.fetchone()[0])
-            
+
         except Exception as e:
             print(f"Erro ao calcular estatísticas: {e}")
             # Valores padrão em caso de erro
-            stats = {
-                'total_clients': 0,
-                'total_appointments': 0,
-                'total_service_orders': 0,
-                'pending_orders': 0,
-                'completed_orders': 0,
-                'pending_invoices': 0,
-                'active_technicians': 0,
-                'total_revenue': 0.00
-            }
-        
+            stats = DashboardStats.empty_stats()
+
         return stats
+
+    @staticmethod
+    def get_history(days=30):
+        """Retorna a série histórica de snapshots para gráficos"""
+        start_date = date.today() - timedelta(days=days)
+
+        try:
+            snapshots = DashboardStats.query.filter(
+                DashboardStats.stat_date >= start_date
+            ).order_by(DashboardStats.stat_date).all()
+        except Exception as e:
+            print(f"Erro ao buscar histórico de estatísticas: {e}")
+            return []
+
+        history = []
+        for snapshot in snapshots:
+            row = snapshot.to_dict()
+            row['stat_date'] = snapshot.stat_date.strftime('%Y-%m-%d')
+            history.append(row)
+        return history
@@ -2,3 +2,17 @@ from flask_sqlalchemy import SQLAlchemy
 
 # Criação do objeto db que será importado por outros módulos
 db = SQLAlchemy()
+
+def execute_sql(sql, params=None, connection=None):
+    """Executa SQL literal com placeholders %s (paramstyle do PyMySQL) na transação da sessão.
+
+    O SQLAlchemy 2 recusa texto puro em db.session.execute (exige text()); exec_driver_sql
+    repassa o SQL e os parâmetros direto ao driver, como já fazem client_360 e export. Sem
+    parâmetros o driver não interpola o SQL, então '%' literal não precisa ser duplicado.
+    connection executa numa conexão própria (ex.: db.engine.begin()) em vez da sessão.
+    """
+    if connection is None:
+        connection = db.session.connection()
+    if not params:
+        return connection.exec_driver_sql(sql, execution_options={'no_parameters': True})
+    return connection.exec_driver_sql(sql, tuple(params))
@@ -0,0 +1,181 @@
+import heapq
+import math
+import threading
+import time
+from flask import current_app
+from src.models.database import execute_sql
+from src.models.geocoding import lookup_coordinates
+
+# Idade máxima (segundos) do índice antes de ser reconstruído - sobrescrito por DISPATCH_INDEX_TTL
+DEFAULT_INDEX_TTL = 15
+
+# Lado da célula da grade em graus (~5,5 km de latitude): a maioria das buscas olha poucas células
+DEFAULT_CELL_DEGREES = 0.05
+
+# Status de ordem que contam como carga do técnico
+OPEN_ORDER_STATUSES = ('assigned', 'en_route', 'arrived', 'in_progress')
+
+# Penalidades da ordenação, em km equivalentes: cada ordem aberta e estar ocupado
+LOAD_PENALTY_KM = 5.0
+BUSY_PENALTY_KM = 10.0
+
+# Vizinhos buscados na grade por sugestão pedida (a carga pode reordenar os mais próximos)
+CANDIDATE_FACTOR = 4
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Distância em km entre dois pontos (lat/lng em graus)"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+class GridIndex:
+    """Índice espacial em grade regular de lat/lng para busca dos k vizinhos mais próximos"""
+
+    def __init__(self, cell_degrees=DEFAULT_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self.cells = {}
+        self.size = 0
+        self._bounds = None
+
+    def _cell(self, latitude, longitude):
+        return (int(math.floor(latitude / self.cell_degrees)), int(math.floor(longitude / self.cell_degrees)))
+
+    def insert(self, latitude, longitude, item):
+        cell = self._cell(latitude, longitude)
+        self.cells.setdefault(cell, []).append((latitude, longitude, item))
+        self.size += 1
+        if self._bounds is None:
+            self._bounds = [cell[0], cell[0], cell[1], cell[1]]
+        else:
+            self._bounds = [min(self._bounds[0], cell[0]), max(self._bounds[1], cell[0]),
+                            min(self._bounds[2], cell[1]), max(self._bounds[3], cell[1])]
+
+    def _ring(self, center, radius):
+        """Células na borda do quadrado de raio radius em volta da célula central"""
+        ci, cj = center
+        if radius == 0:
+            yield center
+            return
+        for j in range(cj - radius, cj + radius + 1):
+            yield (ci - radius, j)
+            yield (ci + radius, j)
+        for i in range(ci - radius + 1, ci + radius):
+            yield (i, cj - radius)
+            yield (i, cj + radius)
+
+    def _max_radius(self, center):
+        """Anel a partir do qual não há mais células ocupadas"""
+        min_i, max_i, min_j, max_j = self._bounds
+        return max(abs(center[0] - min_i), abs(center[0] - max_i),
+                   abs(center[1] - min_j), abs(center[1] - max_j))
+
+    def nearest(self, latitude, longitude, k):
+        """Até k itens mais próximos: [(distância_km, item)] em ordem crescente.
+
+        Percorre anéis de células a partir da célula do ponto e para quando o k-ésimo mais
+        próximo já está mais perto do que qualquer ponto dos anéis seguintes poderia estar.
+        Se um anel tiver mais células do que há células ocupadas (técnicos esparsos ou muito
+        distantes), calcula a distância de todos - ainda exato e mais barato que varrer a grade.
+        """
+        if not self.size or k <= 0:
+            return []
+
+        center = self._cell(latitude, longitude)
+        max_radius = self._max_radius(center)
+        found = []
+        for radius in range(max_radius + 1):
+            if 8 * radius > len(self.cells):
+                found = [(haversine_km(latitude, longitude, item_lat, item_lng), item)
+                         for entries in self.cells.values()
+                         for item_lat, item_lng, item in entries]
+                break
+
+            for cell in self._ring(center, radius):
+                for item_lat, item_lng, item in self.cells.get(cell, ()):
+                    found.append((haversine_km(latitude, longitude, item_lat, item_lng), item))
+
+            if len(found) >= k:
+                # Distância mínima até o anel radius + 1 (longitude encolhe com o cosseno da latitude)
+                lat_limit = min(89.0, abs(latitude) + (radius + 1) * self.cell_degrees)
+                bound = radius * self.cell_degrees * KM_PER_DEGREE * math.cos(math.radians(lat_limit))
+                if heapq.nsmallest(k, found, key=lambda entry: entry[0])[-1][0] <= bound:
+                    break
+
+        return heapq.nsmallest(k, found, key=lambda entry: entry[0])
+
+_index = None
+_index_built_at = 0
+_index_lock = threading.Lock()
+
+def build_technician_index():
+    """Grade com os técnicos em serviço que têm localização geocodificada, com a carga atual"""
+    result = execute_sql("""
+        SELECT id, name, status, COALESCE(current_location, last_location) as location
+        FROM technicians
+        WHERE status IN ('available', 'busy')
+          AND (current_location IS NOT NULL OR last_location IS NOT NULL)
+    """)
+    technicians = [dict(row._mapping) for row in result]
+
+    result = execute_sql(f"""
+        SELECT technician_id, COUNT(*) FROM service_orders
+        WHERE technician_id IS NOT NULL AND status IN ({', '.join(['%s'] * len(OPEN_ORDER_STATUSES))})
+        GROUP BY technician_id
+    """, OPEN_ORDER_STATUSES)
+    open_orders = {technician_id: count for technician_id, count in result}
+
+    coordinates = lookup_coordinates([tech['location'] for tech in technicians])
+    index = GridIndex(current_app.config.get('DISPATCH_CELL_DEGREES', DEFAULT_CELL_DEGREES))
+    for tech in technicians:
+        coords = coordinates.get(tech['location'])
+        if coords:
+            tech['open_orders'] = open_orders.get(tech['id'], 0)
+            index.insert(coords[0], coords[1], tech)
+    return index
+
+def get_technician_index():
+    """Índice do processo, reconstruído quando passa de DISPATCH_INDEX_TTL ou após invalidação"""
+    global _index, _index_built_at
+    ttl = current_app.config.get('DISPATCH_INDEX_TTL', DEFAULT_INDEX_TTL)
+    with _index_lock:
+        if _index is None or time.monotonic() - _index_built_at > ttl:
+            _index = build_technician_index()
+            _index_built_at = time.monotonic()
+        return _index
+
+def invalidate_technician_index():
+    """Força a reconstrução na próxima sugestão (chamar após atribuir/reatribuir ordens)"""
+    global _index
+    with _index_lock:
+        _index = None
+
+def suggest_technicians(latitude, longitude, limit=5):
+    """Técnicos sugeridos para um endereço, ordenados por distância + carga.
+
+    Busca limit * CANDIDATE_FACTOR vizinhos na grade e reordena pela pontuação
+    distância + LOAD_PENALTY_KM por ordem aberta + BUSY_PENALTY_KM se ocupado.
+    """
+    index = get_technician_index()
+    candidates = index.nearest(latitude, longitude, limit * CANDIDATE_FACTOR)
+
+    suggestions = []
+    for distance, tech in candidates:
+        score = distance + LOAD_PENALTY_KM * tech['open_orders']
+        if tech['status'] == 'busy':
+            score += BUSY_PENALTY_KM
+        suggestions.append({
+            'id': tech['id'],
+            'name': tech['name'],
+            'status': tech['status'],
+            'open_orders': tech['open_orders'],
+            'distance_km': round(distance, 1),
+            'score': round(score, 1)
+        })
+
+    suggestions.sort(key=lambda suggestion: suggestion['score'])
+    return suggestions[:limit]
@@ -0,0 +1,67 @@
+import csv
+import io
+from datetime import datetime, date
+from decimal import Decimal
+from flask import Response, stream_with_context
+from src.models.database import db
+
+# Linhas lidas do cursor do servidor e enviadas a cada pedaço da resposta
+EXPORT_CHUNK_ROWS = 1000
+
+# Separador e BOM que o Excel em português abre direto (vírgula é o separador decimal)
+CSV_DELIMITER = ';'
+CSV_BOM = '\ufeff'
+
+def _format_value(value):
+    """Formata para planilha pt-BR: decimais com vírgula, datas ISO, vazio para NULL"""
+    if value is None:
+        return ''
+    if isinstance(value, (Decimal, float)):
+        return f"{value:.2f}".replace('.', ',')
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+def stream_rows(sql, params):
+    """Executa a consulta com cursor do lado do servidor e gera as linhas em lotes.
+
+    Usa uma conexão própria do pool (fora da sessão da requisição) com stream_results: o
+    PyMySQL lê do socket sob demanda, então a memória não cresce com o número de linhas.
+    """
+    with db.engine.connect() as conn:
+        result = conn.execution_options(stream_results=True,
+                                        max_row_buffer=EXPORT_CHUNK_ROWS).exec_driver_sql(sql, tuple(params))
+        for partition in result.partitions(EXPORT_CHUNK_ROWS):
+            yield partition
+
+def generate_csv(header, sql, params):
+    """Gera o CSV em pedaços: o cabeçalho sai imediatamente, depois um pedaço por lote de linhas"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=CSV_DELIMITER)
+
+    writer.writerow(header)
+    yield CSV_BOM + buffer.getvalue()
+
+    for rows in stream_rows(sql, params):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_format_value(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+
+def csv_response(filename, header, sql, params):
+    """Resposta HTTP em streaming (chunked) com o CSV da consulta"""
+    response = Response(stream_with_context(generate_csv(header, sql, params)),
+                        mimetype='text/csv')
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename="{filename}-{datetime.now().strftime("%Y%m%d-%H%M")}.csv"')
+    response.headers['Cache-Control'] = 'no-store'
+    # Não deixa um proxy reverso (nginx) acumular a resposta antes de enviar
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def export_query(select_sql, from_sql, where_clauses, order_by):
+    """Monta a consulta completa da exportação com os mesmos filtros da listagem"""
+    where_sql = f"WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
+    return f"{select_sql} {from_sql} {where_sql} ORDER BY {order_by}"
@@ -0,0 +1,73 @@
+from src.models.database import execute_sql
+
+# Lista de faturas (financial.invoices e exportação); a mesma consulta e ordenação são analisadas
+# com EXPLAIN pelo "flask upgrade --check"
+INVOICES_FROM = """
+    FROM invoices i
+    JOIN clients c ON i.client_id = c.id
+"""
+INVOICE_LIST_QUERY = """
+    SELECT i.id, i.amount, i.due_date, i.status, i.description,
+           c.name as client_name, c.whatsapp_number
+""" + INVOICES_FROM
+INVOICE_LIST_SORT = {'sort_column': 'i.due_date', 'id_column': 'i.id'}
+
+# Faixas de vencimento em relação a hoje (calculadas pelo banco, com CURDATE())
+DUE_BUCKETS = ('current', 'last_30_days', 'older')
+
+def empty_summary():
+    """Estrutura vazia usada quando o cálculo falha"""
+    return {
+        'by_status': {},
+        'pending_count': 0,
+        'pending_total': 0.0,
+        'paid_count': 0,
+        'paid_total': 0.0,
+        'overdue_count': 0,
+        'overdue_total': 0.0,
+        'total_revenue': 0.0
+    }
+
+def get_financial_summary():
+    """Resumo de faturas por status e faixa de vencimento numa única passada agrupada.
+
+    A consulta só lê status, due_date e amount, então é resolvida pelo índice de cobertura
+    idx_invoices_status_due_amount (migração 0002) sem acessar as linhas da tabela.
+
+    - pending: faturas em aberto
+    - paid: pagas com vencimento nos últimos 30 dias (ou futuro)
+    - overdue: em aberto com vencimento anterior a hoje
+    - total_revenue: soma das pagas
+    """
+    summary = empty_summary()
+
+    result = execute_sql("""
+        SELECT status,
+               CASE WHEN due_date >= CURDATE() THEN 'current'
+                    WHEN due_date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY) THEN 'last_30_days'
+                    ELSE 'older' END as due_bucket,
+               COUNT(*) as count,
+               COALESCE(SUM(amount), 0) as total
+        FROM invoices
+        GROUP BY status, due_bucket
+    """)
+
+    for status, due_bucket, count, total in result:
+        total = float(total)
+        by_status = summary['by_status'].setdefault(status, {'count': 0, 'total': 0.0})
+        by_status['count'] += count
+        by_status['total'] += total
+
+        if status == 'open':
+            summary['pending_count'] += count
+            summary['pending_total'] += total
+            if due_bucket != 'current':
+                summary['overdue_count'] += count
+                summary['overdue_total'] += total
+        elif status == 'paid':
+            summary['total_revenue'] += total
+            if due_bucket != 'older':
+                summary['paid_count'] += count
+                summary['paid_total'] += total
+
+    return summary
@@ -0,0 +1,134 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from prometheus_client import Counter
+from src.models.cache import cache_get, cache_set, cache_delete_prefix
+
+# Prefixo das chaves do nível compartilhado no dashboard_cache
+SHARED_PREFIX = 'fragment:'
+
+# Padrões sobrescritos por FRAGMENT_CACHE_SIZE, FRAGMENT_CACHE_TTL e FRAGMENT_CACHE_SHARED
+DEFAULT_LOCAL_SIZE = 256
+DEFAULT_TTL = 300
+
+FRAGMENT_REQUESTS = Counter(
+    'dashboard_fragment_cache_total', 'Consultas ao cache de fragmentos por nível e resultado',
+    ['namespace', 'result'])
+
+class LocalFragmentCache:
+    """LRU limitado por número de entradas, com validade por entrada (nível do processo)"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+_local = None
+_local_lock = threading.Lock()
+
+def _local_cache():
+    global _local
+    with _local_lock:
+        if _local is None:
+            _local = LocalFragmentCache(current_app.config.get('FRAGMENT_CACHE_SIZE', DEFAULT_LOCAL_SIZE))
+        return _local
+
+def fragment_key(namespace, *parts):
+    """Chave explícita: namespace + hash das partes (ex.: papel, período, versão dos dados)"""
+    digest = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:20]
+    return f"{namespace}:{digest}"
+
+def cached_fragment(namespace, parts, render, ttl=None):
+    """HTML do fragmento: LRU do processo, depois o nível compartilhado, senão render().
+
+    render é chamado sem argumentos e deve retornar o HTML. As partes da chave devem incluir
+    tudo de que o fragmento depende (papel do usuário, período, versão dos dados); uma parte
+    None (versão desconhecida, ex.: cálculo que falhou) renderiza sem cache.
+    """
+    if any(part is None for part in parts):
+        return Markup(render())
+
+    ttl = ttl or current_app.config.get('FRAGMENT_CACHE_TTL', DEFAULT_TTL)
+    key = fragment_key(namespace, *parts)
+    local = _local_cache()
+
+    html = local.get(key)
+    if html is not None:
+        FRAGMENT_REQUESTS.labels(namespace, 'local_hit').inc()
+        return Markup(html)
+
+    shared = current_app.config.get('FRAGMENT_CACHE_SHARED', False)
+    if shared:
+        html = cache_get(SHARED_PREFIX + key)
+        if html is not None:
+            FRAGMENT_REQUESTS.labels(namespace, 'shared_hit').inc()
+            local.set(key, html, ttl)
+            return Markup(html)
+
+    FRAGMENT_REQUESTS.labels(namespace, 'miss').inc()
+    html = str(render())
+    local.set(key, html, ttl)
+    if shared:
+        cache_set(SHARED_PREFIX + key, html, ttl)
+    return Markup(html)
+
+def invalidate_fragments(*namespaces):
+    """Descarta os fragmentos dos namespaces (chamar nas rotas que gravam os dados exibidos).
+
+    O nível compartilhado é limpo para todos; o LRU de outros processos expira pela validade
+    ou deixa de ser usado quando a versão dos dados na chave muda.
+    """
+    local = _local_cache()
+    for namespace in namespaces:
+        local.delete_prefix(f"{namespace}:")
+        if current_app.config.get('FRAGMENT_CACHE_SHARED', False):
+            cache_delete_prefix(f"{SHARED_PREFIX}{namespace}:")
+
+class FragmentCacheExtension(Extension):
+    """Tag {% fragment 'namespace', parte1, parte2 %}...{% endfragment %} para os templates"""
+
+    tags = {'fragment'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endfragment'], drop_needle=True)
+        call = self.call_method('_render', [args[0], nodes.List(args[1:])])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, namespace, parts, caller):
+        return cached_fragment(namespace, parts, caller)
+
+def init_fragment_cache(app):
+    app.jinja_env.add_extension(FragmentCacheExtension)
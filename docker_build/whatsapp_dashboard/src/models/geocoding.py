@@ -0,0 +1,269 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import urllib.parse
+import urllib.request
+from datetime import datetime
+from flask import current_app
+from src.models.database import db, execute_sql
+from src.models.rollups import in_placeholders, chunks
+
+# Endereços resolvidos por rodada do resolvedor em segundo plano - sobrescrito por GEOCODE_BATCH_SIZE
+DEFAULT_BATCH_SIZE = 25
+
+# Falhas temporárias (rede, cota) são tentadas de novo até este limite, com intervalo mínimo
+MAX_ATTEMPTS = 3
+RETRY_AFTER_MINUTES = 10
+
+# "resolving" mais antigo que isto é de um worker que morreu no meio: volta para a fila
+STALE_RESOLVING_MINUTES = 10
+
+# Coordenadas digitadas ou enviadas como localização ("-23.55, -46.63") não vão ao geocodificador
+COORDINATES_PATTERN = re.compile(r'^\s*\(?\s*(-?\d{1,2}(?:\.\d+)?)\s*[,;]\s*(-?\d{1,3}(?:\.\d+)?)\s*\)?\s*$')
+
+class GeocodeCache(db.Model):
+    """Coordenadas por endereço normalizado; um endereço já visto nunca é geocodificado de novo"""
+    __tablename__ = 'geocode_cache'
+
+    address_key = db.Column(db.String(40), primary_key=True)
+    address = db.Column(db.String(500), nullable=False)
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    # pending, resolving, ok, not_found (definitivo) ou error (tentado de novo)
+    status = db.Column(db.String(20), nullable=False, default='pending', index=True)
+    attempts = db.Column(db.SmallInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<GeocodeCache {self.address_key} {self.status}>'
+
+class GeocoderError(Exception):
+    """Falha temporária do geocodificador (rede, cota); o endereço volta para a fila"""
+
+class LocalGeocoder:
+    """Geocodificador sem rede: coordenadas literais e um dicionário de endereços conhecidos.
+
+    Usado em desenvolvimento/testes (GEOCODER_BACKEND=local) e quando não há chave do Google.
+    """
+
+    def __init__(self, known=None):
+        self.known = {normalize_address(address): coords for address, coords in (known or {}).items()}
+
+    def geocode(self, address):
+        return parse_coordinates(address) or self.known.get(normalize_address(address))
+
+class GoogleGeocoder:
+    """Geocoding API do Google Maps (a mesma conta usada pelo bot para calcular rotas)"""
+
+    URL = 'https://maps.googleapis.com/maps/api/geocode/json'
+
+    def __init__(self, api_key, region='br', timeout=5):
+        self.api_key = api_key
+        self.region = region
+        self.timeout = timeout
+
+    def geocode(self, address):
+        query = urllib.parse.urlencode({'address': address, 'region': self.region, 'key': self.api_key})
+        try:
+            with urllib.request.urlopen(f"{self.URL}?{query}", timeout=self.timeout) as response:
+                data = json.loads(response.read().decode('utf-8'))
+        except Exception as e:
+            raise GeocoderError(str(e))
+
+        if data.get('status') == 'ZERO_RESULTS':
+            return None
+        if data.get('status') != 'OK':
+            raise GeocoderError(data.get('error_message') or data.get('status'))
+        location = data['results'][0]['geometry']['location']
+        return (location['lat'], location['lng'])
+
+def _local_backend(config):
+    return LocalGeocoder(config.get('GEOCODER_LOCAL_ADDRESSES'))
+
+def _google_backend(config):
+    return GoogleGeocoder(config['GOOGLE_MAPS_API_KEY'], region=config.get('GEOCODE_REGION', 'br'))
+
+# Backends disponíveis: nome -> fábrica(config). Outro provedor entra com register_geocoder
+GEOCODER_BACKENDS = {
+    'local': _local_backend,
+    'google': _google_backend
+}
+
+def register_geocoder(name, factory):
+    """Registra um backend; factory(config) retorna um objeto com geocode(address) -> (lat, lng) | None"""
+    GEOCODER_BACKENDS[name] = factory
+
+def get_geocoder(config=None):
+    """Backend configurado em GEOCODER_BACKEND (google quando há GOOGLE_MAPS_API_KEY, senão local)"""
+    config = config or current_app.config
+    name = config.get('GEOCODER_BACKEND') or ('google' if config.get('GOOGLE_MAPS_API_KEY') else 'local')
+    if name not in GEOCODER_BACKENDS:
+        raise ValueError(f"Geocodificador desconhecido: {name}")
+    return GEOCODER_BACKENDS[name](config)
+
+def normalize_address(address):
+    """Forma canônica usada como chave: minúsculas, espaços e pontuação final uniformizados"""
+    address = re.sub(r'\s+', ' ', (address or '').strip().lower())
+    address = re.sub(r'\s*,\s*', ', ', address)
+    return address.strip(' ,.;-')
+
+def address_key(address):
+    return hashlib.sha1(normalize_address(address).encode('utf-8')).hexdigest()
+
+def parse_coordinates(text):
+    """(lat, lng) quando o texto já é um par de coordenadas válido"""
+    match = COORDINATES_PATTERN.match(text or '')
+    if not match:
+        return None
+    latitude, longitude = float(match.group(1)), float(match.group(2))
+    if -90 <= latitude <= 90 and -180 <= longitude <= 180:
+        return (latitude, longitude)
+    return None
+
+def lookup_coordinates(addresses, schedule=True):
+    """Coordenadas já conhecidas para os endereços: {texto: (lat, lng) ou None}.
+
+    Uma consulta por chave primária para todos os endereços. Os nunca vistos entram como
+    pendentes e, como as falhas com nova tentativa vencida e as reservas abandonadas, são
+    resolvidos em segundo plano (schedule=True); a página não espera.
+    """
+    coordinates = {}
+    keys = {}
+    for address in addresses:
+        if not address or address in coordinates:
+            continue
+        literal = parse_coordinates(address)
+        coordinates[address] = literal
+        if literal is None and normalize_address(address):
+            keys.setdefault(address_key(address), []).append(address)
+
+    found = set()
+    claimable = False
+    for batch in chunks(sorted(keys), 1000):
+        result = execute_sql(f"""
+            SELECT address_key, latitude, longitude, {CLAIMABLE_SQL} FROM geocode_cache
+            WHERE address_key IN ({in_placeholders(batch)})
+        """, CLAIMABLE_PARAMS + tuple(batch))
+        for key, latitude, longitude, is_claimable in result:
+            found.add(key)
+            claimable = claimable or bool(is_claimable)
+            if latitude is not None and longitude is not None:
+                for address in keys[key]:
+                    coordinates[address] = (latitude, longitude)
+
+    unseen = [(key, keys[key][0]) for key in keys if key not in found]
+    if unseen:
+        _enqueue(unseen)
+    if schedule and (unseen or claimable):
+        schedule_resolution()
+    return coordinates
+
+def _enqueue(entries):
+    """Grava os endereços novos como pendentes (INSERT IGNORE: outro worker pode ter gravado antes)"""
+    try:
+        for batch in chunks(entries, 500):
+            values = ', '.join(["(%s, %s, 'pending', 0, NOW())"] * len(batch))
+            params = []
+            for key, address in batch:
+                params.extend([key, address.strip()[:500]])
+            execute_sql(f"""
+                INSERT IGNORE INTO geocode_cache (address_key, address, status, attempts, updated_at)
+                VALUES {values}
+            """, tuple(params))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Erro ao registrar endereços para geocodificação: {e}")
+
+# Endereços que podem ser reservados: pendentes, falhas temporárias vencidas ou reservas abandonadas
+CLAIMABLE_SQL = """
+    (status = 'pending'
+     OR (status = 'error' AND attempts < %s AND updated_at < DATE_SUB(NOW(), INTERVAL %s MINUTE))
+     OR (status = 'resolving' AND updated_at < DATE_SUB(NOW(), INTERVAL %s MINUTE)))
+"""
+CLAIMABLE_PARAMS = (MAX_ATTEMPTS, RETRY_AFTER_MINUTES, STALE_RESOLVING_MINUTES)
+
+def _claim_pending(limit):
+    """Reserva até limit endereços para este processo (UPDATE condicional: outro worker pode disputar)"""
+    result = execute_sql(f"""
+        SELECT address_key, address FROM geocode_cache
+        WHERE {CLAIMABLE_SQL}
+        ORDER BY updated_at
+        LIMIT %s
+    """, CLAIMABLE_PARAMS + (limit,))
+    candidates = result.fetchall()
+
+    claimed = []
+    for key, address in candidates:
+        updated = execute_sql(f"""
+            UPDATE geocode_cache SET status = 'resolving', updated_at = NOW()
+            WHERE address_key = %s AND {CLAIMABLE_SQL}
+        """, (key,) + CLAIMABLE_PARAMS)
+        if updated.rowcount:
+            claimed.append((key, address))
+    db.session.commit()
+    return claimed
+
+def resolve_pending(limit=None, geocoder=None):
+    """Geocodifica um lote de endereços pendentes; retorna quantos foram processados"""
+    limit = limit or current_app.config.get('GEOCODE_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    geocoder = geocoder or get_geocoder()
+    claimed = _claim_pending(limit)
+
+    for key, address in claimed:
+        try:
+            coords = geocoder.geocode(address)
+        except Exception as e:
+            # Qualquer falha do backend (não só GeocoderError) conta como tentativa: o endereço
+            # não fica preso em 'resolving' nem derruba o resto do lote
+            print(f"Erro ao geocodificar '{address}': {e}")
+            execute_sql("""
+                UPDATE geocode_cache SET status = 'error', attempts = attempts + 1, updated_at = NOW()
+                WHERE address_key = %s
+            """, (key,))
+            continue
+
+        if coords is None:
+            execute_sql("""
+                UPDATE geocode_cache SET status = 'not_found', attempts = attempts + 1, updated_at = NOW()
+                WHERE address_key = %s
+            """, (key,))
+        else:
+            execute_sql("""
+                UPDATE geocode_cache SET status = 'ok', latitude = %s, longitude = %s,
+                       attempts = attempts + 1, updated_at = NOW()
+                WHERE address_key = %s
+            """, (coords[0], coords[1], key))
+
+    db.session.commit()
+    return len(claimed)
+
+_resolver_thread = None
+_resolver_pid = None
+_resolver_lock = threading.Lock()
+
+def _run_resolver(app):
+    global _resolver_thread
+    try:
+        while True:
+            with app.app_context():
+                if not resolve_pending():
+                    break
+    except Exception as e:
+        print(f"Erro no resolvedor de endereços: {e}")
+    finally:
+        with _resolver_lock:
+            _resolver_thread = None
+
+def schedule_resolution():
+    """Inicia (se parado) o resolvedor em segundo plano do processo; ele para quando a fila esvazia"""
+    global _resolver_thread, _resolver_pid
+    with _resolver_lock:
+        if _resolver_thread is not None and _resolver_pid == os.getpid():
+            return
+        _resolver_thread = threading.Thread(target=_run_resolver, args=(current_app._get_current_object(),),
+                                            name='geocoder', daemon=True)
+        _resolver_pid = os.getpid()
+        _resolver_thread.start()
@@ -0,0 +1,131 @@
+import threading
+import time
+from flask import g, session, current_app
+from src.models.database import execute_sql
+from src.models.cache import cache_get_prefix, cache_set
+from src.models.user import User, ROLE_PERMISSIONS, ROLE_NAMES
+
+# Tempo (segundos) em que os dados de identidade guardados na sessão assinada são reaproveitados
+# sem consultar o banco - sobrescrito por IDENTITY_CLAIMS_TTL
+DEFAULT_CLAIMS_TTL = 60
+
+# Invalidações ficam no dashboard_cache (identity:invalidated:<user_id> -> momento da alteração)
+# para valerem em todos os workers; cada processo relê a lista no máximo a cada tantos segundos
+INVALIDATION_PREFIX = 'identity:invalidated:'
+INVALIDATION_POLL_SECONDS = 5
+
+# Visão local das invalidações: user_id -> momento da alteração (deste processo ou lida do cache)
+_invalidated_at = {}
+_polled_at = 0
+_poll_lock = threading.Lock()
+
+class Identity:
+    """Usuário logado montado a partir dos dados da sessão (mesma interface usada por rotas e templates)"""
+
+    is_active = True
+
+    def __init__(self, claims):
+        self.id = claims['user_id']
+        self.username = claims['username']
+        self.email = claims['email']
+        self.full_name = claims['full_name']
+        self.role = claims['role']
+        self.technician_id = claims['technician_id']
+        self.permissions = frozenset(ROLE_PERMISSIONS.get(self.role, []))
+
+    def __repr__(self):
+        return f'<Identity {self.username}>'
+
+    def has_permission(self, permission):
+        """Verifica se o usuário tem uma permissão específica"""
+        return permission in self.permissions
+
+    def get_role_display(self):
+        """Retorna o nome do papel em português"""
+        return ROLE_NAMES.get(self.role, self.role)
+
+def build_claims(user):
+    """Monta os dados de identidade do usuário, incluindo o técnico vinculado"""
+    technician_id = None
+    if user.role == 'technician':
+        result = execute_sql("""
+            SELECT id FROM technicians WHERE whatsapp_number = %s
+        """, (user.username,))
+        technician = result.fetchone()
+        technician_id = technician[0] if technician else None
+
+    return {
+        'user_id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'full_name': user.full_name,
+        'role': user.role,
+        'technician_id': technician_id,
+        'loaded_at': time.time()
+    }
+
+def remember_user(user):
+    """Grava a identidade na sessão (chamado no login)"""
+    session['identity'] = build_claims(user)
+    g.identity = Identity(session['identity'])
+
+def _refresh_invalidations():
+    """Atualiza a visão local com as invalidações feitas por outros workers (uma consulta a cada
+    INVALIDATION_POLL_SECONDS por processo, não por requisição)"""
+    global _polled_at
+    with _poll_lock:
+        if time.monotonic() - _polled_at < INVALIDATION_POLL_SECONDS:
+            return
+        _polled_at = time.monotonic()
+
+    for key, invalidated_at in cache_get_prefix(INVALIDATION_PREFIX).items():
+        user_id = int(key[len(INVALIDATION_PREFIX):])
+        _invalidated_at[user_id] = max(_invalidated_at.get(user_id, 0), invalidated_at)
+
+def _claims_valid(claims, user_id):
+    if not claims or claims.get('user_id') != user_id:
+        return False
+    ttl = current_app.config.get('IDENTITY_CLAIMS_TTL', DEFAULT_CLAIMS_TTL)
+    if time.time() - claims.get('loaded_at', 0) > ttl:
+        return False
+    _refresh_invalidations()
+    return claims['loaded_at'] > _invalidated_at.get(user_id, 0)
+
+def get_current_user():
+    """Retorna a identidade do usuário logado, carregada no máximo uma vez por requisição.
+
+    Os dados ficam na sessão assinada e são reaproveitados entre requisições até expirarem
+    (IDENTITY_CLAIMS_TTL) ou serem invalidados. Retorna None se o usuário foi removido ou desativado.
+    """
+    if 'identity' in g:
+        return g.identity
+
+    user_id = session.get('user_id')
+    if user_id is None:
+        g.identity = None
+        return None
+
+    claims = session.get('identity')
+    if not _claims_valid(claims, user_id):
+        user = User.query.get(user_id)
+        if not user or not user.is_active:
+            session.clear()
+            g.identity = None
+            return None
+        claims = build_claims(user)
+        session['identity'] = claims
+
+    g.identity = Identity(claims)
+    return g.identity
+
+def invalidate_identity(user_id):
+    """Descarta a identidade em cache do usuário em todos os workers (chamar após alterar papel,
+    status ou perfil); os outros processos percebem em até INVALIDATION_POLL_SECONDS"""
+    invalidated_at = time.time()
+    _invalidated_at[user_id] = invalidated_at
+    # Depois de IDENTITY_CLAIMS_TTL nenhuma identidade anterior à alteração continua válida
+    ttl = current_app.config.get('IDENTITY_CLAIMS_TTL', DEFAULT_CLAIMS_TTL)
+    cache_set(f"{INVALIDATION_PREFIX}{user_id}", invalidated_at, ttl + INVALIDATION_POLL_SECONDS)
+    if session.get('user_id') == user_id:
+        session.pop('identity', None)
+        g.pop('identity', None)
@@ -0,0 +1,179 @@
+from datetime import date
+from flask import current_app
+from sqlalchemy import Numeric
+from src.models.database import db, execute_sql
+from src.models.rollups import (get_watermark, set_watermark, claim_refresh, db_now,
+                                in_placeholders, chunks)
+
+ROLLUP_NAME = 'invoice_daily'
+
+# Intervalo mínimo (segundos) entre atualizações incrementais - sobrescrito por INVOICE_ROLLUP_REFRESH
+DEFAULT_REFRESH_INTERVAL = 60
+
+class InvoiceDailyRollup(db.Model):
+    """Faturas agregadas por dia de vencimento e status (mantido a partir de invoices.updated_at)"""
+    __tablename__ = 'invoice_daily_rollup'
+
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    invoice_count = db.Column(db.Integer, nullable=False, default=0)
+    amount_total = db.Column(Numeric(14, 2), nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<InvoiceDailyRollup {self.day} {self.status}>'
+
+class InvoiceRollupDay(db.Model):
+    """Dia de vencimento em que cada fatura está contada no agregado.
+
+    Quando o vencimento muda, invoices só informa o dia novo: o dia antigo vem daqui para
+    também ser recalculado.
+    """
+    __tablename__ = 'invoice_rollup_days'
+
+    invoice_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    day = db.Column(db.Date)
+
+    def __repr__(self):
+        return f'<InvoiceRollupDay {self.invoice_id} {self.day}>'
+
+def _recompute_days(days):
+    """Recalcula por completo os dias informados (idempotente: pode rodar em paralelo)"""
+    for batch in chunks(days):
+        placeholders = in_placeholders(batch)
+        # Zera antes: um status que sumiu do dia (ex.: fatura paga) não deixa contagem antiga
+        execute_sql(f"""
+            UPDATE invoice_daily_rollup SET invoice_count = 0, amount_total = 0
+            WHERE day IN ({placeholders})
+        """, tuple(batch))
+        execute_sql(f"""
+            INSERT INTO invoice_daily_rollup (day, status, invoice_count, amount_total)
+            SELECT due_date, status, COUNT(*), COALESCE(SUM(amount), 0)
+            FROM invoices
+            WHERE due_date IN ({placeholders})
+            GROUP BY due_date, status
+            ON DUPLICATE KEY UPDATE invoice_count = VALUES(invoice_count),
+                                    amount_total = VALUES(amount_total)
+        """, tuple(batch))
+
+def _previous_days(invoice_ids):
+    """Dias em que as faturas estavam contadas antes desta atualização"""
+    days = set()
+    for batch in chunks(invoice_ids):
+        result = execute_sql(f"""
+            SELECT DISTINCT day FROM invoice_rollup_days
+            WHERE invoice_id IN ({in_placeholders(batch)}) AND day IS NOT NULL
+        """, tuple(batch))
+        days.update(row[0] for row in result)
+    return days
+
+def _record_days(invoice_days):
+    """Grava o dia de vencimento atual de cada fatura (invoice_id, due_date)"""
+    for batch in chunks(invoice_days):
+        params = []
+        for invoice_id, day in batch:
+            params.extend([invoice_id, day])
+        execute_sql(f"""
+            INSERT INTO invoice_rollup_days (invoice_id, day)
+            VALUES {', '.join(['(%s, %s)'] * len(batch))}
+            ON DUPLICATE KEY UPDATE day = VALUES(day)
+        """, tuple(params))
+
+def rebuild_invoice_rollup():
+    """Reconstrói o agregado inteiro a partir de invoices; retorna o número de linhas geradas"""
+    watermark = db_now()
+    execute_sql("DELETE FROM invoice_daily_rollup")
+    result = execute_sql("""
+        INSERT INTO invoice_daily_rollup (day, status, invoice_count, amount_total)
+        SELECT due_date, status, COUNT(*), COALESCE(SUM(amount), 0)
+        FROM invoices
+        WHERE due_date IS NOT NULL
+        GROUP BY due_date, status
+    """)
+    execute_sql("DELETE FROM invoice_rollup_days")
+    execute_sql("""
+        INSERT INTO invoice_rollup_days (invoice_id, day)
+        SELECT id, due_date FROM invoices
+    """)
+    set_watermark(ROLLUP_NAME, watermark)
+    db.session.commit()
+    return result.rowcount
+
+def refresh_invoice_rollup(force=False):
+    """Atualização incremental: reprocessa só os dias (atual e anterior) das faturas criadas/alteradas
+    desde a marca d'água.
+
+    Sem force, roda no máximo uma vez por INVOICE_ROLLUP_REFRESH segundos entre todos os
+    workers. Retorna o número de dias recalculados.
+    """
+    watermark = get_watermark(ROLLUP_NAME)
+    if watermark is None:
+        rebuild_invoice_rollup()
+        return -1
+
+    interval = current_app.config.get('INVOICE_ROLLUP_REFRESH', DEFAULT_REFRESH_INTERVAL)
+    if not force and not claim_refresh(ROLLUP_NAME, interval):
+        return 0
+
+    # Marca d'água lida antes da varredura; >= reprocessa o segundo da marca (recalcular é idempotente)
+    new_watermark = db_now()
+    result = execute_sql("""
+        SELECT id, due_date FROM invoices
+        WHERE updated_at >= %s
+    """, (watermark,))
+    invoice_days = [(row[0], row[1]) for row in result]
+
+    # Dia novo e dia anterior: uma fatura que mudou de vencimento sai da contagem do dia antigo.
+    # Faturas excluídas não aparecem em updated_at e só saem do agregado no rebuild
+    days = {day for _, day in invoice_days if day is not None}
+    days.update(_previous_days([invoice_id for invoice_id, _ in invoice_days]))
+
+    _recompute_days(sorted(days))
+    _record_days(invoice_days)
+    set_watermark(ROLLUP_NAME, new_watermark)
+    db.session.commit()
+    return len(days)
+
+def invoice_report(start_date, end_date):
+    """Relatório de faturas com vencimento em [start_date, end_date) lido do agregado diário.
+
+    Retorna revenue_total (pagas), status_stats {status: {count, total}} e daily_revenue
+    {'AAAA-MM-DD': total pago}. Um ano inteiro são algumas centenas de linhas do agregado.
+    """
+    result = execute_sql("""
+        SELECT day, status, invoice_count, amount_total
+        FROM invoice_daily_rollup
+        WHERE day >= %s AND day < %s AND invoice_count > 0
+        ORDER BY day
+    """, (start_date, end_date))
+
+    report = {'revenue_total': 0.0, 'status_stats': {}, 'daily_revenue': {}}
+    for day, status, count, total in result:
+        total = float(total)
+        stats = report['status_stats'].setdefault(status, {'count': 0, 'total': 0.0})
+        stats['count'] += count
+        stats['total'] += total
+        if status == 'paid':
+            report['revenue_total'] += total
+            day_key = day.strftime('%Y-%m-%d')
+            report['daily_revenue'][day_key] = report['daily_revenue'].get(day_key, 0.0) + total
+    return report
+
+def monthly_revenue(months=6):
+    """Receita paga por mês ('AAAA-MM') a partir do mês de (months - 1) meses atrás (gráfico do dashboard)"""
+    today = date.today()
+    year, month = today.year, today.month - (months - 1)
+    while month <= 0:
+        month += 12
+        year -= 1
+
+    result = execute_sql("""
+        SELECT day, amount_total
+        FROM invoice_daily_rollup
+        WHERE status = 'paid' AND day >= %s
+    """, (date(year, month, 1),))
+
+    revenue = {}
+    for day, total in result:
+        key = day.strftime('%Y-%m')
+        revenue[key] = revenue.get(key, 0.0) + float(total)
+    return dict(sorted(revenue.items()))
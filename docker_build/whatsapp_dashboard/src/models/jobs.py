@@ -0,0 +1,372 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from src.models.database import db, execute_sql
+
+# Validade padrão (segundos) do resultado de um job: pedidos iguais nesse intervalo reaproveitam o
+# resultado em vez de refazer a consulta - sobrescrito por JOB_RESULT_TTL
+DEFAULT_RESULT_TTL = 600
+
+# Intervalo (segundos) entre consultas à fila quando não há jobs - sobrescrito por JOB_POLL_INTERVAL
+DEFAULT_POLL_INTERVAL = 2
+
+# Jobs concluídos/falhos são apagados após este número de dias - sobrescrito por JOB_RETENTION_DAYS
+DEFAULT_RETENTION_DAYS = 7
+
+# Sinal de vida do job em execução, renovado por uma thread enquanto o handler roda (segundos)
+HEARTBEAT_SECONDS = 60
+
+# Job "running" sem sinal de vida há este tempo é de um worker que morreu: volta para a fila
+# (até MAX_ATTEMPTS tentativas; depois é marcado como falho)
+STALE_RUNNING_MINUTES = 5
+MAX_ATTEMPTS = 2
+
+# Intervalo mínimo (segundos) entre gravações de progresso do mesmo job
+PROGRESS_INTERVAL = 1.0
+
+# Limpeza da fila feita pelo worker a cada tantos segundos
+PURGE_INTERVAL = 600
+
+class BackgroundJob(db.Model):
+    """Fila de jobs em segundo plano (relatórios longos, operações em lote) e seus resultados"""
+    __tablename__ = 'dashboard_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    params = db.Column(db.Text, nullable=False)
+    # Hash de tipo + parâmetros enquanto o job está na fila, rodando ou com resultado válido:
+    # pedidos iguais caem no mesmo job (NULL libera a chave para um job novo)
+    dedupe_key = db.Column(db.String(40), unique=True)
+    # queued, running, done ou failed
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    progress = db.Column(db.SmallInteger, nullable=False, default=0)
+    message = db.Column(db.String(255))
+    result = db.Column(db.Text(16777215))
+    error = db.Column(db.Text)
+    attempts = db.Column(db.SmallInteger, nullable=False, default=0)
+    worker = db.Column(db.String(100))
+    created_by = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime, index=True)
+    expires_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<BackgroundJob {self.id} {self.kind} {self.status}>'
+
+# Tipos de job: nome -> {'handler', 'permission', 'result_ttl'}. Registrados com @register_job
+JOB_TYPES = {}
+
+def register_job(kind, permission, result_ttl=None):
+    """Registra handler(params, progress) -> resultado (serializável em JSON).
+
+    permission é exigida para consultar o job; result_ttl=None usa JOB_RESULT_TTL e 0 não
+    guarda o resultado para outros pedidos (operações que gravam dados). progress.attempt é a
+    tentativa atual: maior que 1 quando o job foi retomado após a queda de um worker.
+    """
+    def decorator(handler):
+        JOB_TYPES[kind] = {'handler': handler, 'permission': permission, 'result_ttl': result_ttl}
+        return handler
+    return decorator
+
+def job_key(kind, params):
+    """Chave de deduplicação: mesmo tipo e mesmos parâmetros -> mesmo job"""
+    params_json = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha1(f"{kind}:{params_json}".encode('utf-8')).hexdigest()
+
+def _result_ttl(kind):
+    ttl = JOB_TYPES[kind]['result_ttl']
+    return current_app.config.get('JOB_RESULT_TTL', DEFAULT_RESULT_TTL) if ttl is None else ttl
+
+JOB_COLUMNS = """
+    id, kind, params, status, progress, message, result, error, attempts, worker,
+    created_by, created_at, started_at, finished_at, expires_at
+"""
+
+def get_job(job_id):
+    """Job como dict (params e result já decodificados) ou None"""
+    result = execute_sql(f"SELECT {JOB_COLUMNS} FROM dashboard_jobs WHERE id = %s", (job_id,))
+    row = result.fetchone()
+    if not row:
+        return None
+    job = dict(row._mapping)
+    job['params'] = json.loads(job['params'])
+    job['result'] = json.loads(job['result']) if job['result'] is not None else None
+    return job
+
+def enqueue_job(kind, params, user_id=None):
+    """Coloca o job na fila ou retorna o job igual que já está na fila, rodando ou concluído.
+
+    A chave única dedupe_key faz o INSERT IGNORE de pedidos simultâneos cair num único job.
+    Com JOBS_INLINE (desenvolvimento, sem worker) o job roda aqui mesmo antes de retornar.
+    """
+    if kind not in JOB_TYPES:
+        raise ValueError(f"Tipo de job desconhecido: {kind}")
+
+    key = job_key(kind, params)
+    params_json = json.dumps(params, sort_keys=True, default=str)
+    job_id = None
+    for _ in range(3):
+        # Resultado vencido libera a chave para um job novo
+        execute_sql("""
+            UPDATE dashboard_jobs SET dedupe_key = NULL
+            WHERE dedupe_key = %s AND status = 'done' AND expires_at <= NOW()
+        """, (key,))
+        inserted = execute_sql("""
+            INSERT IGNORE INTO dashboard_jobs (kind, params, dedupe_key, status, progress, attempts, created_by, created_at)
+            VALUES (%s, %s, %s, 'queued', 0, 0, %s, NOW())
+        """, (kind, params_json, key, user_id))
+        db.session.commit()
+        if inserted.rowcount:
+            job_id = inserted.lastrowid
+            break
+
+        row = execute_sql("SELECT id FROM dashboard_jobs WHERE dedupe_key = %s", (key,)).fetchone()
+        if row:
+            job_id = row[0]
+            break
+        # O job igual terminou entre o INSERT e o SELECT e liberou a chave: tenta de novo
+
+    if job_id is None:
+        raise RuntimeError(f"Não foi possível enfileirar o job {kind}")
+
+    if current_app.config.get('JOBS_INLINE'):
+        job = claim_job(f"inline:{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}", job_id)
+        if job:
+            run_job(job)
+    return get_job(job_id)
+
+def expire_jobs(*kinds):
+    """Descarta os resultados guardados dos tipos (chamar nas rotas que gravam os dados usados)"""
+    if not kinds:
+        return
+    try:
+        execute_sql(f"""
+            UPDATE dashboard_jobs SET dedupe_key = NULL
+            WHERE status = 'done' AND dedupe_key IS NOT NULL AND kind IN ({', '.join(['%s'] * len(kinds))})
+        """, kinds)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Erro ao expirar jobs {kinds}: {e}")
+
+# Jobs que podem ser reservados: na fila ou abandonados por um worker que morreu
+CLAIMABLE_SQL = """
+    (status = 'queued'
+     OR (status = 'running' AND attempts < %s AND heartbeat_at < DATE_SUB(NOW(), INTERVAL %s MINUTE)))
+"""
+CLAIMABLE_PARAMS = (MAX_ATTEMPTS, STALE_RUNNING_MINUTES)
+
+def claim_job(worker_id, job_id=None):
+    """Reserva o job mais antigo da fila (ou job_id) para este worker; None se não houver.
+
+    UPDATE condicional como em geocoding._claim_pending: entre workers disputando o mesmo job
+    só um recebe rowcount 1.
+    """
+    if job_id is None:
+        result = execute_sql(f"""
+            SELECT id FROM dashboard_jobs WHERE {CLAIMABLE_SQL} ORDER BY id LIMIT 5
+        """, CLAIMABLE_PARAMS)
+        candidates = [row[0] for row in result]
+    else:
+        candidates = [job_id]
+
+    for candidate in candidates:
+        updated = execute_sql(f"""
+            UPDATE dashboard_jobs
+            SET status = 'running', attempts = attempts + 1, worker = %s, progress = 0,
+                started_at = NOW(), heartbeat_at = NOW()
+            WHERE id = %s AND {CLAIMABLE_SQL}
+        """, (worker_id, candidate) + CLAIMABLE_PARAMS)
+        db.session.commit()
+        if updated.rowcount:
+            return get_job(candidate)
+    return None
+
+class _Heartbeat(threading.Thread):
+    """Renova heartbeat_at a cada HEARTBEAT_SECONDS enquanto o handler roda.
+
+    Usa conexão própria (a sessão do handler pertence à outra thread): um passo longo sem
+    progress() não faz o job parecer abandonado e ser executado de novo por outro worker.
+    """
+
+    def __init__(self, engine, job_id, worker_id):
+        super().__init__(name=f'job-heartbeat-{job_id}', daemon=True)
+        self.engine = engine
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(HEARTBEAT_SECONDS):
+            try:
+                with self.engine.begin() as connection:
+                    connection.exec_driver_sql("""
+                        UPDATE dashboard_jobs SET heartbeat_at = NOW()
+                        WHERE id = %s AND worker = %s AND status = 'running'
+                    """, (self.job_id, self.worker_id))
+            except Exception as e:
+                print(f"Erro ao renovar o job {self.job_id}: {e}")
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+def run_job(job):
+    """Executa o job reservado e grava resultado ou erro; retorna True se concluiu.
+
+    Todas as gravações exigem worker = o worker que reservou: se o job tiver sido reservado
+    por outro (este foi dado como morto), o resultado daqui é descartado.
+    """
+    job_type = JOB_TYPES.get(job['kind'])
+    worker_id = job['worker']
+    last_progress = [0.0]
+
+    def progress(percent, message=None):
+        """Grava o andamento (0-100); no máximo uma vez por PROGRESS_INTERVAL"""
+        now = time.monotonic()
+        if now - last_progress[0] < PROGRESS_INTERVAL:
+            return
+        last_progress[0] = now
+        execute_sql("""
+            UPDATE dashboard_jobs SET progress = %s, message = %s, heartbeat_at = NOW()
+            WHERE id = %s AND worker = %s
+        """, (max(0, min(99, int(percent))), (message or '')[:255], job['id'], worker_id))
+        db.session.commit()
+    progress.attempt = job['attempts']
+
+    heartbeat = _Heartbeat(db.engine, job['id'], worker_id)
+    heartbeat.start()
+    try:
+        if job_type is None:
+            raise ValueError(f"Tipo de job desconhecido: {job['kind']}")
+        result = job_type['handler'](job['params'], progress)
+    except Exception as e:
+        heartbeat.stop()
+        db.session.rollback()
+        print(f"Erro no job {job['id']} ({job['kind']}): {e}")
+        execute_sql("""
+            UPDATE dashboard_jobs
+            SET status = 'failed', error = %s, dedupe_key = NULL, finished_at = NOW()
+            WHERE id = %s AND worker = %s AND status = 'running'
+        """, (str(e)[:1000], job['id'], worker_id))
+        db.session.commit()
+        return False
+    heartbeat.stop()
+
+    ttl = _result_ttl(job['kind'])
+    # Sem validade (operações que gravam): a chave é liberada e um pedido igual gera um job novo
+    updated = execute_sql("""
+        UPDATE dashboard_jobs
+        SET status = 'done', progress = 100, message = NULL, result = %s, finished_at = NOW(),
+            expires_at = DATE_ADD(NOW(), INTERVAL %s SECOND),
+            dedupe_key = IF(%s > 0, dedupe_key, NULL)
+        WHERE id = %s AND worker = %s AND status = 'running'
+    """, (json.dumps(result, default=str), int(ttl), int(ttl), job['id'], worker_id))
+    db.session.commit()
+    if not updated.rowcount:
+        print(f"Job {job['id']} ({job['kind']}) foi reservado por outro worker; resultado descartado")
+        return False
+    return True
+
+def purge_jobs(retention_days=None):
+    """Marca como falhos os jobs abandonados sem tentativas restantes e apaga os antigos"""
+    retention_days = retention_days or current_app.config.get('JOB_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+    execute_sql("""
+        UPDATE dashboard_jobs
+        SET status = 'failed', error = 'Worker interrompido durante a execução', dedupe_key = NULL,
+            finished_at = NOW()
+        WHERE status = 'running' AND attempts >= %s
+          AND heartbeat_at < DATE_SUB(NOW(), INTERVAL %s MINUTE)
+    """, (MAX_ATTEMPTS, STALE_RUNNING_MINUTES))
+    deleted = execute_sql("""
+        DELETE FROM dashboard_jobs
+        WHERE status IN ('done', 'failed') AND finished_at < DATE_SUB(NOW(), INTERVAL %s DAY)
+    """, (retention_days,))
+    db.session.commit()
+    return deleted.rowcount
+
+def job_to_dict(job):
+    """Representação JSON para a consulta de andamento"""
+    data = {
+        'id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'progress': job['progress'],
+        'message': job['message'],
+        'error': job['error'],
+        'created_at': job['created_at'].isoformat() if job['created_at'] else None,
+        'finished_at': job['finished_at'].isoformat() if job['finished_at'] else None
+    }
+    if job['status'] == 'done':
+        data['result'] = job['result']
+    return data
+
+def run_worker(app, poll_interval=None):
+    """Laço de um processo worker: reserva e executa jobs até receber SIGTERM/SIGINT.
+
+    O job em andamento termina antes de sair (o docker espera até o stop_grace_period).
+    """
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.append(signum))
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    with app.app_context():
+        # Conexões herdadas do processo pai (fork) não podem ser compartilhadas
+        db.engine.dispose(close=False)
+        poll_interval = poll_interval or app.config.get('JOB_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+
+    last_purge = 0
+    while not stopping:
+        with app.app_context():
+            try:
+                if time.monotonic() - last_purge > PURGE_INTERVAL:
+                    last_purge = time.monotonic()
+                    purge_jobs()
+
+                job = claim_job(worker_id)
+                if job:
+                    run_job(job)
+                    continue
+            except Exception as e:
+                db.session.rollback()
+                print(f"Erro no worker de jobs {worker_id}: {e}")
+            finally:
+                db.session.remove()
+        time.sleep(poll_interval)
+
+def run_worker_pool(app, processes):
+    """Supervisor: mantém processes workers (fork) rodando, recria os que morrerem e repassa o SIGTERM"""
+    context = multiprocessing.get_context('fork')
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.append(signum))
+
+    workers = {}
+    while not stopping:
+        for slot in range(processes):
+            process = workers.get(slot)
+            if process is not None and process.is_alive():
+                continue
+            if process is not None:
+                print(f"Worker de jobs {process.pid} saiu com código {process.exitcode}; recriando")
+            process = context.Process(target=run_worker, args=(app,), name=f'jobs-worker-{slot}')
+            process.start()
+            workers[slot] = process
+        time.sleep(1)
+
+    # Cada worker termina o job em andamento antes de sair
+    for process in workers.values():
+        if process.is_alive():
+            process.terminate()
+    for process in workers.values():
+        process.join()
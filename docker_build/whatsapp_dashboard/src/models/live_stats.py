@@ -0,0 +1,165 @@
+import json
+import os
+import queue
+import random
+import threading
+import time
+from flask import current_app
+from src.models.stats_service import get_overview, overview_alerts
+
+# Intervalo (segundos) entre recálculos do produtor - sobrescrito por LIVE_STATS_INTERVAL
+DEFAULT_LIVE_INTERVAL = 10
+
+# Conexões simultâneas por processo - LIVE_MAX_SUBSCRIBERS. Cada uma ocupa uma das GUNICORN_THREADS
+# do worker enquanto aberta; o padrão usa metade das 8 threads e deixa o resto para as páginas
+DEFAULT_MAX_SUBSCRIBERS = 4
+
+# Tela recusada por lotação volta a tentar depois de tantos segundos (com variação, para não
+# voltarem todas juntas); a nova conexão pode cair em outro worker
+FULL_RETRY_SECONDS = 30
+
+# Tempo máximo (segundos) de uma conexão; o navegador reconecta sozinho - LIVE_STREAM_MAX_SECONDS
+DEFAULT_STREAM_MAX_SECONDS = 300
+
+# Comentário enviado quando não há mudanças: mantém proxies abertos e detecta telas fechadas
+HEARTBEAT_SECONDS = 15
+
+# Eventos pendentes por tela; se encher (tela lenta), ela recebe o estado completo de novo
+SUBSCRIBER_QUEUE_SIZE = 10
+
+def _normalize(data):
+    """Mesma representação vinda do cache ou do cálculo (Decimal, datas) para comparar versões"""
+    return json.loads(json.dumps(data, default=str))
+
+def diff_snapshot(previous, current):
+    """Diferença entre dois estados: chaves alteradas; em dicts, só as subchaves alteradas (None = removida)"""
+    delta = {}
+    for key, value in current.items():
+        old = previous.get(key)
+        if isinstance(value, dict) and isinstance(old, dict):
+            changed = {k: v for k, v in value.items() if old.get(k) != v}
+            changed.update({k: None for k in old if k not in value})
+            if changed:
+                delta[key] = changed
+        elif old != value:
+            delta[key] = value
+    return delta
+
+def retry_later(seconds=FULL_RETRY_SECONDS):
+    """Stream vazio que só agenda a reconexão: o EventSource não tenta de novo após 204 ou 503"""
+    return f"retry: {int(seconds * 1000 * random.uniform(1, 1.5))}\n\n"
+
+def format_event(event, version, data):
+    """Mensagem no formato text/event-stream"""
+    return f"id: {version}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+class LiveStatsHub:
+    """Produtor único por processo para o dashboard ao vivo.
+
+    Uma thread calcula o estado (estatísticas, ordens por status, alertas) a cada intervalo,
+    a partir do overview do cache compartilhado, e repassa só as diferenças para a fila de
+    cada tela conectada. A carga no banco depende do intervalo, não do número de telas; sem
+    telas conectadas a thread termina.
+    """
+
+    def __init__(self, app, interval):
+        self.app = app
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._snapshot = None
+        self._version = 0
+        self._thread = None
+
+    def subscribe(self, max_subscribers):
+        """Fila de eventos da nova tela (já com o estado atual) ou None se o limite foi atingido"""
+        with self._lock:
+            if len(self._subscribers) >= max_subscribers:
+                return None
+            events = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+            if self._snapshot is not None:
+                events.put_nowait(('snapshot', self._version, self._snapshot))
+            self._subscribers.add(events)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='live-stats', daemon=True)
+                self._thread.start()
+        return events
+
+    def unsubscribe(self, events):
+        with self._lock:
+            self._subscribers.discard(events)
+
+    def _compute(self):
+        # url_for dos alertas precisa de um contexto de requisição; ao sair, a sessão do banco é liberada
+        with self.app.test_request_context('/'):
+            overview = get_overview()
+            return _normalize({
+                'stats': overview['stats'],
+                'orders_by_status': overview['orders_by_status'],
+                'alerts': overview_alerts(overview)
+            })
+
+    def _publish(self, snapshot):
+        with self._lock:
+            if self._snapshot is None:
+                event, data = 'snapshot', snapshot
+            else:
+                event, data = 'delta', diff_snapshot(self._snapshot, snapshot)
+                if not data:
+                    return
+            self._version += 1
+            self._snapshot = snapshot
+
+            for events in self._subscribers:
+                try:
+                    events.put_nowait((event, self._version, data))
+                except queue.Full:
+                    # Tela atrasada: descarta o que não foi enviado e manda o estado completo
+                    while not events.empty():
+                        try:
+                            events.get_nowait()
+                        except queue.Empty:
+                            break
+                    events.put_nowait(('snapshot', self._version, snapshot))
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            try:
+                self._publish(self._compute())
+            except Exception as e:
+                print(f"Erro ao calcular dados do dashboard ao vivo: {e}")
+            time.sleep(self.interval)
+
+    def stream(self, events, max_seconds):
+        """Gera a resposta SSE da tela até max_seconds; remove a inscrição ao desconectar"""
+        deadline = time.monotonic() + max_seconds
+        try:
+            # Reconexão do EventSource após o fim programado da conexão
+            yield f"retry: {int(self.interval * 1000)}\n\n"
+            while time.monotonic() < deadline:
+                try:
+                    event, version, data = events.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                yield format_event(event, version, data)
+        finally:
+            self.unsubscribe(events)
+
+_hub = None
+_hub_pid = None
+_hub_lock = threading.Lock()
+
+def get_live_hub():
+    """Hub do processo atual (recriado após fork dos workers do gunicorn)"""
+    global _hub, _hub_pid
+    with _hub_lock:
+        if _hub is None or _hub_pid != os.getpid():
+            interval = current_app.config.get('LIVE_STATS_INTERVAL', DEFAULT_LIVE_INTERVAL)
+            _hub = LiveStatsHub(current_app._get_current_object(), interval)
+            _hub_pid = os.getpid()
+    return _hub
@@ -0,0 +1,253 @@
+from datetime import datetime
+from src.models.database import db, execute_sql
+from src.models.search import ensure_search_indexes, index_exists, SEARCH_INDEXES
+from src.models.client_360 import SECTION_QUERIES, LIST_QUERY as CLIENT_LIST_QUERY, LIST_SORT as CLIENT_LIST_SORT
+from src.models.financial_summary import INVOICE_LIST_QUERY, INVOICE_LIST_SORT
+from src.models.order_bulk import ORDER_LIST_QUERY, ORDER_LIST_SORT
+from src.models.pagination import keyset_query
+from src.models.rollups import RollupState
+from src.models.invoice_rollup import InvoiceDailyRollup, InvoiceRollupDay, rebuild_invoice_rollup
+from src.models.technician_rollup import (TechnicianDailyRollup, TechnicianDurationHistogram,
+                                          rebuild_technician_rollup)
+from src.models.geocoding import GeocodeCache
+from src.models.jobs import BackgroundJob
+
+class SchemaMigration(db.Model):
+    """Migrações já aplicadas pela dashboard nas tabelas do bot (índices, tabelas auxiliares)"""
+    __tablename__ = 'dashboard_schema_migrations'
+
+    version = db.Column(db.String(50), primary_key=True)
+    description = db.Column(db.String(255))
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SchemaMigration {self.version}>'
+
+def add_index(table, index_name, columns, kind='INDEX'):
+    """Cria o índice se ainda não existir (idempotente: migrações podem ser reaplicadas)"""
+    if index_exists(table, index_name, columns):
+        return False
+    execute_sql(f"ALTER TABLE {table} ADD {kind} {index_name} ({', '.join(columns)})")
+    return True
+
+# Tabelas que ganham updated_at automático na migração 0007 (invoices e service_orders já têm)
+CHANGE_MARKER_TABLES = ('clients', 'technicians', 'appointments')
+
+def updated_at_index(table):
+    """Índice em updated_at (marca d'água dos agregados e marcador de mudança dos ETags)"""
+    return (table, f'idx_{table}_updated_at', ('updated_at',))
+
+# Índices em updated_at criados pelas migrações 0004, 0005 e 0007
+UPDATED_AT_INDEXES = [updated_at_index(table) for table in ('invoices', 'service_orders') + CHANGE_MARKER_TABLES]
+
+# Cobre o resumo financeiro: agrupa por status/vencimento e soma amount sem ler as linhas
+INVOICE_SUMMARY_INDEX = ('invoices', 'idx_invoices_status_due_amount', ('status', 'due_date', 'amount'))
+
+# Índices exigidos pelas consultas mais frequentes da dashboard: (tabela, nome, colunas)
+HOT_PATH_INDEXES = [
+    ('service_orders', 'idx_service_orders_technician_created', ('technician_id', 'created_at')),
+    ('service_orders', 'idx_service_orders_status_created', ('status', 'created_at')),
+    ('service_orders', 'idx_service_orders_client_created', ('client_id', 'created_at')),
+    ('service_orders', 'idx_service_orders_created', ('created_at',)),
+    ('service_orders', 'idx_service_orders_completed', ('completed_at',)),
+    ('invoices', 'idx_invoices_client_due', ('client_id', 'due_date')),
+    ('invoices', 'idx_invoices_due_date', ('due_date',)),
+    ('appointments', 'idx_appointments_client_date', ('client_id', 'appointment_date')),
+    ('appointments', 'idx_appointments_created', ('created_at',)),
+    ('clients', 'idx_clients_last_interaction', ('last_interaction_at', 'id')),
+    ('clients', 'idx_clients_created', ('created_at',)),
+    ('service_photos', 'idx_service_photos_order_created', ('service_order_id', 'created_at'))
+]
+
+# Consultas verificadas com EXPLAIN por "flask upgrade --check": (nome, sql, parâmetros de exemplo)
+HOT_QUERIES = [
+    ('clients.detail: agendamentos', SECTION_QUERIES['appointments'], (1,)),
+    ('clients.detail: ordens', SECTION_QUERIES['orders'], (1,)),
+    ('clients.detail: faturas', SECTION_QUERIES['invoices'], (1,)),
+    # Mesmo SQL de paginate_keyset: primeira página e página seguinte (com a condição do cursor)
+    ('clients.list', *keyset_query(CLIENT_LIST_QUERY, [], [], **CLIENT_LIST_SORT)),
+    ('clients.list: próxima página', *keyset_query(CLIENT_LIST_QUERY, [], [],
+                                                  position=('2024-01-01 00:00:00', 1000000),
+                                                  **CLIENT_LIST_SORT)),
+    ('financial.invoices', *keyset_query(INVOICE_LIST_QUERY, [], [], **INVOICE_LIST_SORT)),
+    # Filtros como os de _order_filters: status escolhido e lista do técnico
+    ('service_orders.list: por status', *keyset_query(ORDER_LIST_QUERY, ['so.status = %s'], ['pending'],
+                                                     **ORDER_LIST_SORT)),
+    ('service_orders.list: técnico', *keyset_query(ORDER_LIST_QUERY, ['so.technician_id = %s'], [1],
+                                                  **ORDER_LIST_SORT)),
+    ('service_orders.detail: fotos', """
+        SELECT id, created_at FROM service_photos
+        WHERE service_order_id = %s
+        ORDER BY created_at
+    """, (1,)),
+    ('service_orders.map: ordens ativas', """
+        SELECT so.id FROM service_orders so
+        WHERE so.status IN ('assigned', 'en_route', 'arrived')
+        ORDER BY so.created_at
+    """, ()),
+    ('technicians.detail: ordens', """
+        SELECT so.id, c.name FROM service_orders so
+        JOIN clients c ON so.client_id = c.id
+        WHERE so.technician_id = %s
+        ORDER BY so.created_at DESC LIMIT 10
+    """, (1,)),
+    ('dashboard: delta de clientes', "SELECT COUNT(*) FROM clients WHERE created_at >= CURDATE()", ()),
+    ('dashboard: delta de agendamentos', "SELECT COUNT(*) FROM appointments WHERE created_at >= CURDATE()", ()),
+    ('dashboard: delta de ordens', "SELECT COUNT(*) FROM service_orders WHERE created_at >= CURDATE()", ()),
+    ('dashboard: ordens concluídas', """
+        SELECT COUNT(*) FROM service_orders
+        WHERE completed_at >= CURDATE() AND status = 'completed'
+    """, ())
+]
+
+def column_exists(table, column):
+    result = execute_sql("""
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    return result.fetchone() is not None
+
+def column_definition(table, column):
+    """(DATA_TYPE, COLUMN_TYPE, IS_NULLABLE) da coluna, ex.: ('datetime', 'datetime(3)', 'NO'),
+    ou None se ela não existir"""
+    result = execute_sql("""
+        SELECT DATA_TYPE, COLUMN_TYPE, IS_NULLABLE FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    row = result.fetchone()
+    return tuple(row) if row else None
+
+def _search_indexes():
+    ensure_search_indexes()
+
+def _invoice_summary_index():
+    add_index(*INVOICE_SUMMARY_INDEX)
+
+def _hot_path_indexes():
+    for table, index_name, columns in HOT_PATH_INDEXES:
+        add_index(table, index_name, columns)
+
+def _invoice_daily_rollup():
+    # O bot não registra quando uma fatura muda: ON UPDATE CURRENT_TIMESTAMP marca qualquer
+    # alteração (inclusive as feitas pelo bot) e serve de marca d'água para o agregado
+    if not column_exists('invoices', 'updated_at'):
+        execute_sql("""
+            ALTER TABLE invoices ADD COLUMN updated_at TIMESTAMP NOT NULL
+            DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        """)
+    add_index(*updated_at_index('invoices'))
+
+    RollupState.__table__.create(db.engine, checkfirst=True)
+    InvoiceDailyRollup.__table__.create(db.engine, checkfirst=True)
+    InvoiceRollupDay.__table__.create(db.engine, checkfirst=True)
+    rebuild_invoice_rollup()
+
+def _technician_rollup():
+    # Mesma estratégia das faturas: updated_at automático captura as mudanças de status do bot
+    if not column_exists('service_orders', 'updated_at'):
+        execute_sql("""
+            ALTER TABLE service_orders ADD COLUMN updated_at TIMESTAMP NOT NULL
+            DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        """)
+    add_index(*updated_at_index('service_orders'))
+
+    TechnicianDailyRollup.__table__.create(db.engine, checkfirst=True)
+    TechnicianDurationHistogram.__table__.create(db.engine, checkfirst=True)
+    rebuild_technician_rollup()
+
+def _change_markers():
+    # Marcadores de mudança das páginas com ETag: o bot só às vezes grava clients.updated_at e
+    # technicians/appointments não têm a coluna. ON UPDATE CURRENT_TIMESTAMP cobre qualquer UPDATE
+    for table in CHANGE_MARKER_TABLES:
+        definition = column_definition(table, 'updated_at')
+        if definition and definition[0] in ('timestamp', 'datetime'):
+            # Mantém o tipo (com a precisão), a nulidade e os valores existentes; só passa a ser
+            # atualizada automaticamente
+            data_type, full_type, is_nullable = definition
+            nullability = 'NULL' if is_nullable == 'YES' else 'NOT NULL'
+            # DATETIME(3) exige CURRENT_TIMESTAMP(3): o default usa a mesma precisão da coluna
+            now = 'CURRENT_TIMESTAMP' + full_type[len(data_type):]
+            execute_sql(f"""
+                ALTER TABLE {table} MODIFY COLUMN updated_at {full_type.upper()} {nullability}
+                DEFAULT {now} ON UPDATE {now}
+            """)
+        elif definition is None:
+            execute_sql(f"""
+                ALTER TABLE {table} ADD COLUMN updated_at TIMESTAMP NOT NULL
+                DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            """)
+        add_index(*updated_at_index(table))
+
+def _geocode_cache():
+    GeocodeCache.__table__.create(db.engine, checkfirst=True)
+
+def _background_jobs():
+    BackgroundJob.__table__.create(db.engine, checkfirst=True)
+
+# Migrações em ordem: (versão, descrição, função). Nunca altere uma versão já publicada;
+# acrescente uma nova no fim da lista
+MIGRATIONS = [
+    ('0001_search_indexes', 'Índices FULLTEXT/prefixo usados pela busca', _search_indexes),
+    ('0002_invoice_summary_index', 'Índice de cobertura invoices(status, due_date, amount)', _invoice_summary_index),
+    ('0003_hot_path_indexes', 'Índices das consultas de listas, detalhes e estatísticas', _hot_path_indexes),
+    ('0004_invoice_daily_rollup', 'invoices.updated_at e agregado diário de faturas', _invoice_daily_rollup),
+    ('0005_technician_rollup', 'service_orders.updated_at e agregados de desempenho dos técnicos', _technician_rollup),
+    ('0006_geocode_cache', 'Cache de coordenadas por endereço (mapa)', _geocode_cache),
+    ('0007_change_markers', 'updated_at automático em clients, technicians e appointments (ETag)', _change_markers),
+    ('0008_background_jobs', 'Fila de jobs em segundo plano (relatórios e lotes)', _background_jobs)
+]
+
+def applied_versions():
+    SchemaMigration.__table__.create(db.engine, checkfirst=True)
+    return {row.version for row in SchemaMigration.query.all()}
+
+def pending_migrations():
+    """Migrações ainda não aplicadas, na ordem em que devem rodar"""
+    applied = applied_versions()
+    return [migration for migration in MIGRATIONS if migration[0] not in applied]
+
+def apply_migrations():
+    """Aplica as migrações pendentes em ordem; retorna as versões aplicadas"""
+    applied = []
+    for version, description, migrate in pending_migrations():
+        print(f"Aplicando migração {version}: {description}")
+        migrate()
+        db.session.add(SchemaMigration(version=version, description=description))
+        db.session.commit()
+        applied.append(version)
+    return applied
+
+def registered_indexes():
+    """Todos os índices criados pelas migrações: (tabela, nome, tipo, colunas)"""
+    indexes = list(SEARCH_INDEXES)
+    for table, index_name, columns in [INVOICE_SUMMARY_INDEX] + HOT_PATH_INDEXES + UPDATED_AT_INDEXES:
+        indexes.append((table, index_name, 'INDEX', columns))
+    return indexes
+
+def missing_indexes():
+    """Índices registrados que não existem no banco (ex.: removidos do lado do bot)"""
+    missing = []
+    for table, index_name, index_type, columns in registered_indexes():
+        if not index_exists(table, index_name, columns, fulltext=(index_type == 'FULLTEXT')):
+            missing.append(f"{table}.{index_name} ({', '.join(columns)})")
+    return missing
+
+def check_hot_queries():
+    """Roda EXPLAIN em cada consulta registrada e retorna as varreduras completas de tabela.
+
+    Retorna uma lista de dicts (query, table, rows, extra), um para cada tabela com
+    acesso type=ALL no plano.
+    """
+    problems = []
+    for name, sql, params in HOT_QUERIES:
+        result = execute_sql("EXPLAIN " + sql, params)
+        for row in result:
+            plan = dict(row._mapping)
+            if plan.get('type') == 'ALL':
+                problems.append({
+                    'query': name,
+                    'table': plan.get('table'),
+                    'rows': plan.get('rows'),
+                    'extra': plan.get('Extra')
+                })
+    return problems
@@ -0,0 +1,137 @@
+import re
+from src.models.database import db, execute_sql
+from src.models.rollups import in_placeholders, chunks
+
+# Status usados pelo bot nas ordens de serviço
+ORDER_STATUSES = ('pending', 'assigned', 'en_route', 'arrived', 'in_progress',
+                  'completed', 'client_absent', 'rejected')
+
+# Lista de ordens (service_orders.list e exportação); a mesma consulta e ordenação são analisadas
+# com EXPLAIN pelo "flask upgrade --check"
+ORDERS_FROM = """
+    FROM service_orders so
+    JOIN clients c ON so.client_id = c.id
+    LEFT JOIN technicians t ON so.technician_id = t.id
+"""
+ORDER_LIST_QUERY = """
+    SELECT so.id, so.status, so.created_at, so.completed_at,
+           c.name as client_name, c.address as client_address,
+           t.name as technician_name
+""" + ORDERS_FROM
+ORDER_LIST_SORT = {'sort_column': 'so.created_at', 'id_column': 'so.id'}
+
+# Limite de ordens por ação em lote
+MAX_BULK_ORDERS = 1000
+
+def parse_order_ids(values):
+    """Ids únicos na ordem recebida (aceita lista do formulário ou texto separado por vírgulas)"""
+    if isinstance(values, str):
+        values = [values]
+    ids = []
+    seen = set()
+    for value in values:
+        for part in re.split(r'[\s,;]+', value or ''):
+            if part.isdigit() and int(part) not in seen:
+                seen.add(int(part))
+                ids.append(int(part))
+    return ids
+
+def _load_orders(order_ids):
+    orders = {}
+    for batch in chunks(order_ids, 1000):
+        result = execute_sql(f"""
+            SELECT id, client_id, technician_id, status FROM service_orders
+            WHERE id IN ({in_placeholders(batch)})
+        """, tuple(batch))
+        for row in result:
+            orders[row.id] = row
+    return orders
+
+def bulk_update_orders(current_user, order_ids, status=None, technician_id=None):
+    """Muda status e/ou técnico de várias ordens com um UPDATE por conjunto.
+
+    Aplica as mesmas regras de service_orders.update: técnico só altera ordens atribuídas a
+    ele e nunca reatribui; reatribuir exige edit_all. Retorna (results, client_ids), com
+    results = [{'id', 'ok', 'message'}] na ordem dos ids recebidos.
+    """
+    if status and status not in ORDER_STATUSES:
+        raise ValueError(f"Status inválido: {status}")
+    if not status and not technician_id:
+        raise ValueError('Informe o novo status ou o técnico.')
+    if len(order_ids) > MAX_BULK_ORDERS:
+        raise ValueError(f"Selecione no máximo {MAX_BULK_ORDERS} ordens por vez.")
+
+    is_technician = current_user.role == 'technician'
+    if technician_id:
+        if not current_user.has_permission('edit_all'):
+            raise ValueError('Apenas administradores podem reatribuir ordens.')
+        technician = execute_sql("""
+            SELECT id FROM technicians WHERE id = %s
+        """, (technician_id,)).fetchone()
+        if not technician:
+            raise ValueError('Técnico não encontrado.')
+
+    orders = _load_orders(order_ids)
+    rejected = {}
+    allowed = []
+    for order_id in order_ids:
+        order = orders.get(order_id)
+        if not order:
+            rejected[order_id] = 'Ordem não encontrada'
+        elif is_technician and (not current_user.technician_id or order.technician_id != current_user.technician_id):
+            rejected[order_id] = 'Ordem não atribuída a você'
+        else:
+            allowed.append(order_id)
+
+    # O MySQL avalia o SET da esquerda para a direita: completed_at é calculado com o status antigo,
+    # preservando a data de conclusão de ordens que já estavam concluídas
+    set_clauses = []
+    set_params = []
+    if status == 'completed':
+        set_clauses.append("completed_at = IF(status = 'completed' AND completed_at IS NOT NULL, completed_at, NOW())")
+    if status:
+        set_clauses.append("status = %s")
+        set_params.append(status)
+    if technician_id:
+        set_clauses.append("technician_id = %s")
+        set_params.append(technician_id)
+
+    updated = set()
+    try:
+        for batch in chunks(allowed, 1000):
+            # Relê e trava as ordens que ainda podem ser alteradas: desde a leitura acima a ordem
+            # pode ter sido reatribuída (técnico) ou excluída. Só essas entram no UPDATE e no "Atualizada"
+            where_sql = f"id IN ({in_placeholders(batch)})"
+            where_params = list(batch)
+            if is_technician:
+                where_sql += " AND technician_id = %s"
+                where_params.append(current_user.technician_id)
+            locked = [row[0] for row in execute_sql(f"""
+                SELECT id FROM service_orders WHERE {where_sql} FOR UPDATE
+            """, tuple(where_params))]
+            if not locked:
+                continue
+
+            execute_sql(f"""
+                UPDATE service_orders SET {', '.join(set_clauses)}
+                WHERE id IN ({in_placeholders(locked)})
+            """, tuple(set_params) + tuple(locked))
+            updated.update(locked)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    results = []
+    for order_id in order_ids:
+        if order_id in updated:
+            results.append({'id': order_id, 'ok': True, 'message': 'Atualizada'})
+        elif order_id in rejected:
+            results.append({'id': order_id, 'ok': False, 'message': rejected[order_id]})
+        elif is_technician:
+            results.append({'id': order_id, 'ok': False, 'message': 'Ordem não atribuída a você'})
+        else:
+            results.append({'id': order_id, 'ok': False, 'message': 'Ordem não encontrada'})
+
+    client_ids = sorted({orders[order_id].client_id for order_id in updated})
+    return results, client_ids
@@ -0,0 +1,129 @@
+import base64
+import json
+from src.models.database import execute_sql
+
+# Itens por página nas listagens
+PAGE_SIZE = 20
+
+class KeysetPage:
+    """Página de resultados obtida por cursor (coluna de ordenação + id)"""
+
+    def __init__(self, rows, next_cursor=None, prev_cursor=None):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+def encode_cursor(sort_value, row_id):
+    """Codifica a posição (valor de ordenação, id) em um token seguro para URL"""
+    payload = json.dumps([sort_value, row_id], default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decodifica o token do cursor; retorna None se estiver inválido"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return sort_value, int(row_id)
+    except Exception:
+        return None
+
+def _seek_clause(sort_column, id_column, sort_value, row_id, descending, nullable):
+    """Monta a condição que posiciona a consulta logo após (sort_value, row_id)"""
+    op = '<' if descending else '>'
+
+    if not nullable:
+        return (f"({sort_column} {op} %s OR ({sort_column} = %s AND {id_column} {op} %s))",
+                [sort_value, sort_value, row_id])
+
+    # O MySQL ordena NULL como o menor valor: no fim em DESC, no início em ASC
+    if sort_value is None:
+        if descending:
+            return f"({sort_column} IS NULL AND {id_column} < %s)", [row_id]
+        return f"(({sort_column} IS NULL AND {id_column} > %s) OR {sort_column} IS NOT NULL)", [row_id]
+
+    if descending:
+        return (f"({sort_column} < %s OR ({sort_column} = %s AND {id_column} < %s) OR {sort_column} IS NULL)",
+                [sort_value, sort_value, row_id])
+    return (f"({sort_column} > %s OR ({sort_column} = %s AND {id_column} > %s))",
+            [sort_value, sort_value, row_id])
+
+def keyset_query(query, where_clauses, params, sort_column, id_column, position=None,
+                 order_desc=True, nullable=False, per_page=PAGE_SIZE):
+    """SQL e parâmetros de uma página por cursor (o mesmo que paginate_keyset executa e que o
+    "flask upgrade --check" analisa com EXPLAIN); position = (valor de ordenação, id) ou None"""
+    where_clauses = list(where_clauses)
+    params = list(params)
+
+    if position is not None:
+        clause, clause_params = _seek_clause(sort_column, id_column, position[0], position[1],
+                                             order_desc, nullable)
+        where_clauses.append(clause)
+        params.extend(clause_params)
+
+    if where_clauses:
+        query += " WHERE " + " AND ".join(where_clauses)
+
+    order = 'DESC' if order_desc else 'ASC'
+    query += f" ORDER BY {sort_column} {order}, {id_column} {order} LIMIT %s"
+    params.append(per_page + 1)
+    return query, params
+
+def paginate_keyset(query, where_clauses, params, sort_column, id_column, cursor=None,
+                    direction='next', descending=True, nullable=False, per_page=PAGE_SIZE):
+    """Executa a consulta paginada por cursor - o custo de qualquer página é o mesmo da primeira.
+
+    query deve conter apenas SELECT/FROM/JOIN; filtros vão em where_clauses/params.
+    direction='prev' percorre a ordenação ao contrário a partir do cursor.
+    """
+    position = decode_cursor(cursor)
+    backwards = position is not None and direction == 'prev'
+    order_desc = descending != backwards
+
+    query, params = keyset_query(query, where_clauses, params, sort_column, id_column, position,
+                                 order_desc, nullable, per_page)
+    rows = execute_sql(query, params).fetchall()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    if not rows:
+        return KeysetPage(rows)
+
+    # Colunas da linha são lidas pelo nome sem o alias da tabela (ex.: 'i.due_date' -> 'due_date')
+    sort_attr = sort_column.split('.')[-1]
+    id_attr = id_column.split('.')[-1]
+    first, last = rows[0], rows[-1]
+
+    has_next = True if backwards else has_more
+    has_prev = has_more if backwards else position is not None
+
+    next_cursor = encode_cursor(getattr(last, sort_attr), getattr(last, id_attr)) if has_next else None
+    prev_cursor = encode_cursor(getattr(first, sort_attr), getattr(first, id_attr)) if has_prev else None
+    return KeysetPage(rows, next_cursor, prev_cursor)
+
+def count_rows(from_sql, where_clauses, params):
+    """Contagem exata (usada apenas quando barata ou carregada sob demanda)"""
+    query = "SELECT COUNT(*) " + from_sql
+    if where_clauses:
+        query += " WHERE " + " AND ".join(where_clauses)
+    return execute_sql(query, list(params)).fetchone()[0]
+
+def estimate_table_rows(table):
+    """Estimativa de linhas da tabela pelas estatísticas do InnoDB (sem varrer a tabela)"""
+    result = execute_sql("""
+        SELECT TABLE_ROWS FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,))
+    row = result.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
@@ -0,0 +1,218 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from flask import current_app, send_file
+from src.models.database import execute_sql
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Sem Pillow as miniaturas caem para o arquivo original
+    Image = None
+
+# Lados (px) aceitos para miniaturas; o padrão serve a galeria do detalhe da ordem
+THUMBNAIL_SIZES = (160, 320, 640)
+DEFAULT_THUMBNAIL_SIZE = 320
+THUMBNAIL_QUALITY = 80
+
+# Threads por processo gerando miniaturas - sobrescrito por THUMBNAIL_WORKERS
+DEFAULT_THUMBNAIL_WORKERS = 2
+
+# Tempo máximo (segundos) que a requisição espera a miniatura antes de servir o original
+THUMBNAIL_WAIT_SECONDS = 20
+
+# Fotos têm nome único (tipo + timestamp) e nunca mudam: o navegador pode guardar por um dia
+PHOTO_MAX_AGE = 86400
+
+# Hashes de conteúdo lembrados por (caminho, tamanho, mtime) para não reler o arquivo a cada pedido
+HASH_MEMO_SIZE = 4096
+
+_executor = None
+_executor_pid = None
+_pending = {}
+_pending_lock = threading.Lock()
+_hash_memo = OrderedDict()
+_hash_lock = threading.Lock()
+
+def _get_executor():
+    """Pool de threads do processo (recriado após fork dos workers do gunicorn)"""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        workers = current_app.config.get('THUMBNAIL_WORKERS', DEFAULT_THUMBNAIL_WORKERS)
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnails')
+        _executor_pid = os.getpid()
+    return _executor
+
+def get_photo(photo_id):
+    """Foto com a ordem e o técnico responsável (para a checagem de permissão)"""
+    result = execute_sql("""
+        SELECT sp.id, sp.service_order_id, sp.photo_path, so.technician_id
+        FROM service_photos sp
+        JOIN service_orders so ON sp.service_order_id = so.id
+        WHERE sp.id = %s
+    """, (photo_id,))
+    return result.fetchone()
+
+def get_order_photos(order_id):
+    result = execute_sql("""
+        SELECT id, photo_path FROM service_photos
+        WHERE service_order_id = %s
+        ORDER BY created_at
+    """, (order_id,))
+    return result.fetchall()
+
+def can_view_order_photos(current_user, technician_id):
+    """Mesma regra do detalhe da ordem: view_orders e, para técnico, só as próprias ordens"""
+    if not current_user.has_permission('view_orders'):
+        return False
+    if current_user.role == 'technician' and current_user.technician_id:
+        return current_user.technician_id == technician_id
+    return True
+
+def resolve_photo_path(photo_path):
+    """Caminho absoluto do arquivo gravado pelo bot; None se não existir ou sair da pasta das fotos.
+
+    photo_path é relativo à raiz do bot (uploads/service_photos/<ordem>/<arquivo>); só arquivos
+    dentro de uploads/service_photos são servidos, mesmo que o banco tenha outro caminho.
+    """
+    root = os.path.realpath(current_app.config['PHOTO_UPLOAD_ROOT'])
+    photos_dir = os.path.join(root, 'uploads', 'service_photos')
+    path = os.path.realpath(os.path.join(root, photo_path or ''))
+    if not path.startswith(photos_dir + os.sep) or not os.path.isfile(path):
+        return None
+    return path
+
+def content_hash(path):
+    """SHA-1 do conteúdo (chave do cache de miniaturas e ETag), memorizado por tamanho/mtime"""
+    stat = os.stat(path)
+    memo_key = (path, stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        if memo_key in _hash_memo:
+            _hash_memo.move_to_end(memo_key)
+            return _hash_memo[memo_key]
+
+    digest = hashlib.sha1()
+    with open(path, 'rb') as photo_file:
+        for block in iter(lambda: photo_file.read(1024 * 1024), b''):
+            digest.update(block)
+
+    with _hash_lock:
+        _hash_memo[memo_key] = digest.hexdigest()
+        if len(_hash_memo) > HASH_MEMO_SIZE:
+            _hash_memo.popitem(last=False)
+    return digest.hexdigest()
+
+def _thumbnail_path(cache_dir, digest, size):
+    return os.path.join(cache_dir, digest[:2], f"{digest}_{size}.jpg")
+
+def _render_thumbnail(source, target, size):
+    """Reduz a foto para caber em size x size e grava como JPEG (escrita atômica)"""
+    with Image.open(source) as image:
+        # JPEG: decodifica já reduzido (bem mais rápido que abrir a foto inteira do celular)
+        image.draft('RGB', (size, size))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size))
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                image.save(temp_file, 'JPEG', quality=THUMBNAIL_QUALITY, optimize=True, progressive=True)
+            os.replace(temp_path, target)
+        except Exception:
+            os.unlink(temp_path)
+            raise
+    return target
+
+def _render_pending(future, source, target, size):
+    """Gera a miniatura registrada em _pending e conclui o future (resultado ou exceção)"""
+    try:
+        future.set_result(_render_thumbnail(source, target, size))
+    except Exception as e:
+        future.set_exception(e)
+    finally:
+        with _pending_lock:
+            _pending.pop(target, None)
+
+def ensure_thumbnail(source, size, cache_dir=None, inline=False):
+    """Future com o caminho da miniatura; gera só se ainda não estiver no cache em disco.
+
+    Pedidos simultâneos da mesma miniatura (galeria + prefetch) compartilham a mesma geração.
+    A geração vai para o pool, ou roda na thread atual com inline=True (quem já está no pool).
+    """
+    digest = content_hash(source)
+    target = _thumbnail_path(cache_dir or current_app.config['THUMBNAIL_CACHE_DIR'], digest, size)
+    with _pending_lock:
+        future = _pending.get(target)
+        if future is not None:
+            return digest, future
+        future = Future()
+        if os.path.isfile(target):
+            future.set_result(target)
+            return digest, future
+        _pending[target] = future
+
+    if inline:
+        _render_pending(future, source, target, size)
+    else:
+        _get_executor().submit(_render_pending, future, source, target, size)
+    return digest, future
+
+def parse_thumbnail_size(value):
+    return value if value in THUMBNAIL_SIZES else DEFAULT_THUMBNAIL_SIZE
+
+def send_photo(path):
+    """Envia o original com ETag/Last-Modified, 304 e Range; o gunicorn usa sendfile (sem cópia)"""
+    response = send_file(path, conditional=True, etag=True, max_age=PHOTO_MAX_AGE)
+    # Conteúdo com checagem de permissão: só o navegador guarda, nunca um proxy compartilhado
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
+def send_thumbnail(path, size):
+    """Miniatura do cache (gerada se preciso); sem Pillow ou se a geração falhar, envia o original"""
+    if Image is None:
+        return send_photo(path)
+
+    try:
+        digest, future = ensure_thumbnail(path, size)
+        thumbnail = future.result(timeout=THUMBNAIL_WAIT_SECONDS)
+    except Exception as e:
+        print(f"Erro ao gerar miniatura de {path}: {e}")
+        return send_photo(path)
+
+    response = send_file(thumbnail, mimetype='image/jpeg', conditional=True,
+                         etag=f"{digest}-{size}", max_age=PHOTO_MAX_AGE)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
+def _warm_thumbnail(source, size, cache_dir):
+    """Gera a miniatura no pool via ensure_thumbnail (leitura do original e hash também fora da
+    requisição). Se a galeria já estiver gerando a mesma miniatura, não espera: aguardar outra
+    tarefa do mesmo pool poderia travá-lo"""
+    try:
+        _, future = ensure_thumbnail(source, size, cache_dir=cache_dir, inline=True)
+        if future.done() and future.exception():
+            raise future.exception()
+    except Exception as e:
+        print(f"Erro ao gerar miniatura de {source}: {e}")
+
+def prefetch_thumbnails(photo_paths, size):
+    """Enfileira as miniaturas da galeria no pool sem esperar; retorna quantas foram enfileiradas"""
+    if Image is None:
+        return 0
+
+    cache_dir = current_app.config['THUMBNAIL_CACHE_DIR']
+    executor = _get_executor()
+    queued = 0
+    for photo_path in photo_paths:
+        path = resolve_photo_path(photo_path)
+        if path:
+            executor.submit(_warm_thumbnail, path, size, cache_dir)
+            queued += 1
+    return queued
@@ -0,0 +1,87 @@
+from datetime import date
+from decimal import Decimal
+from src.models.database import db, execute_sql
+from src.models.jobs import register_job, expire_jobs
+from src.models.rollups import get_watermark
+from src.models.invoice_rollup import refresh_invoice_rollup, invoice_report, ROLLUP_NAME as INVOICE_ROLLUP_NAME
+from src.models.technician_rollup import refresh_technician_rollup, technician_performance, empty_performance
+from src.models.batch_invoicing import create_invoices
+from src.models.stats_service import invalidate_overview
+from src.models.client_360 import invalidate_client_360
+
+# Jobs executados pelo worker (flask jobs-worker) no lugar da requisição. Os parâmetros chegam
+# como JSON: datas em AAAA-MM-DD e valores monetários como texto
+
+@register_job('financial_report', permission='view_reports')
+def financial_report_job(params, progress):
+    """Relatório financeiro de [start_date, end_date) e do período anterior equivalente"""
+    progress(10, 'Atualizando o agregado de faturas')
+    refresh_invoice_rollup()
+
+    progress(40, 'Somando o período')
+    report = invoice_report(date.fromisoformat(params['start_date']), date.fromisoformat(params['end_date']))
+
+    progress(70, 'Somando o período anterior')
+    previous = invoice_report(date.fromisoformat(params['previous_start']),
+                              date.fromisoformat(params['previous_end']))
+
+    watermark = get_watermark(INVOICE_ROLLUP_NAME)
+    return {
+        'report': report,
+        'previous': previous,
+        'report_version': watermark.isoformat() if watermark else None
+    }
+
+@register_job('technician_performance', permission='view_reports')
+def technician_performance_job(params, progress):
+    """Performance de todos os técnicos desde start_date, ordenada por ordens concluídas"""
+    progress(10, 'Atualizando os agregados dos técnicos')
+    refresh_technician_rollup()
+
+    progress(50, 'Somando o período')
+    by_technician = technician_performance(date.fromisoformat(params['start_date']))
+
+    technicians_result = execute_sql("""
+        SELECT id, name FROM technicians ORDER BY name
+    """)
+    performance = []
+    for technician in technicians_result:
+        row = {'id': technician.id, 'name': technician.name}
+        row.update(by_technician.get(technician.id, empty_performance()))
+        performance.append(row)
+    performance.sort(key=lambda row: row['completed_orders'], reverse=True)
+    return {'performance': performance}
+
+def serialize_invoice_rows(rows):
+    """Linhas de batch_invoicing (Decimal, date) em parâmetros JSON para o job"""
+    return [dict(row,
+                 amount=str(row['amount']) if row['amount'] is not None else None,
+                 due_date=row['due_date'].isoformat() if row['due_date'] is not None else None)
+            for row in rows]
+
+@register_job('batch_invoices', permission='edit_all', result_ttl=0)
+def batch_invoices_job(params, progress):
+    """Faturamento em lote; invalida os caches que exibem faturas quando algo foi gravado"""
+    rows = [dict(row,
+                 amount=Decimal(row['amount']) if row['amount'] is not None else None,
+                 due_date=date.fromisoformat(row['due_date']) if row['due_date'] is not None else None)
+            for row in params['rows']]
+
+    progress(10, f"Gravando {len(rows)} faturas")
+    # Job retomado após a queda de um worker: a tentativa anterior pode ter gravado o lote
+    result = create_invoices(rows, skip_existing=params['skip_existing'], skip_saved=progress.attempt > 1)
+
+    if result['created']:
+        # As faturas já estão gravadas: falhas daqui em diante não podem marcar o job como falho
+        # (a tela diria que nenhuma fatura foi gravada)
+        try:
+            progress(80, 'Atualizando relatórios')
+            invalidate_overview()
+            invalidate_client_360(*result['client_ids'])
+            refresh_invoice_rollup(force=True)
+            expire_jobs('financial_report')
+        except Exception as e:
+            # A marca d'água não avançou: a próxima atualização incremental inclui estas faturas
+            db.session.rollback()
+            print(f"Erro ao atualizar relatórios após o lote de faturas: {e}")
+    return result
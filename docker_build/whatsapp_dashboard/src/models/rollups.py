@@ -0,0 +1,53 @@
+from src.models.database import db, execute_sql
+
+class RollupState(db.Model):
+    """Marca d'água e horário da última atualização de cada tabela de agregados"""
+    __tablename__ = 'dashboard_rollup_state'
+
+    name = db.Column(db.String(50), primary_key=True)
+    # Horário do banco do início da última atualização: linhas alteradas a partir dele são reprocessadas
+    watermark = db.Column(db.DateTime, nullable=False)
+    refreshed_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<RollupState {self.name}>'
+
+def db_now():
+    """Horário atual no relógio do banco (o mesmo usado por created_at/updated_at)"""
+    return execute_sql("SELECT NOW()").fetchone()[0]
+
+def get_watermark(name):
+    """Marca d'água do agregado ou None se ele ainda não foi construído"""
+    result = execute_sql("""
+        SELECT watermark FROM dashboard_rollup_state WHERE name = %s
+    """, (name,))
+    row = result.fetchone()
+    return row[0] if row else None
+
+def set_watermark(name, watermark):
+    """Grava a marca d'água (não faz commit - a atualização do agregado decide)"""
+    execute_sql("""
+        INSERT INTO dashboard_rollup_state (name, watermark, refreshed_at)
+        VALUES (%s, %s, NOW())
+        ON DUPLICATE KEY UPDATE watermark = VALUES(watermark), refreshed_at = VALUES(refreshed_at)
+    """, (name, watermark))
+
+def claim_refresh(name, interval):
+    """Reserva a atualização incremental para este worker se a última tiver mais de interval segundos.
+
+    O UPDATE condicional é atômico: entre vários workers só um recebe True por intervalo.
+    """
+    result = execute_sql("""
+        UPDATE dashboard_rollup_state SET refreshed_at = NOW()
+        WHERE name = %s AND refreshed_at < DATE_SUB(NOW(), INTERVAL %s SECOND)
+    """, (name, int(interval)))
+    db.session.commit()
+    return result.rowcount == 1
+
+def in_placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+def chunks(values, size=500):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
@@ -0,0 +1,181 @@
+import re
+from src.models.database import db, execute_sql
+
+# Tamanho mínimo de palavra indexada pelo FULLTEXT do InnoDB (innodb_ft_min_token_size)
+MIN_TOKEN_SIZE = 3
+
+# Mínimo de dígitos para tratar o termo como número de telefone
+MIN_PHONE_DIGITS = 4
+
+# Código do país usado pelo bot nos números do WhatsApp
+DEFAULT_COUNTRY_CODE = '55'
+
+# Resultados retornados pelos campos de autocompletar (padrão e máximo aceito via ?limit=)
+TYPEAHEAD_LIMIT = 10
+MAX_TYPEAHEAD_LIMIT = 50
+
+# Condição sempre falsa: termo preenchido que não gera nenhuma condição não encontra nada
+NO_MATCH = '1=0'
+
+# Campos pesquisáveis por entidade: colunas do índice FULLTEXT, coluna para prefixo
+# de nome (palavras curtas) e coluna de telefone (prefixo normalizado)
+SEARCH_FIELDS = {
+    'clients': {
+        'fulltext': ('name', 'address'),
+        'prefix': 'name',
+        'phone': 'whatsapp_number'
+    },
+    'invoices': {
+        'fulltext': ('description',),
+        'prefix': None,
+        'phone': None
+    },
+    'technicians': {
+        'fulltext': ('name',),
+        'prefix': 'name',
+        'phone': 'whatsapp_number'
+    }
+}
+
+# Índices exigidos pela busca: (tabela, nome do índice, tipo, colunas)
+SEARCH_INDEXES = [
+    ('clients', 'ft_clients_search', 'FULLTEXT', ('name', 'address')),
+    ('clients', 'idx_clients_name', 'INDEX', ('name',)),
+    ('clients', 'idx_clients_whatsapp_number', 'INDEX', ('whatsapp_number',)),
+    ('invoices', 'ft_invoices_description', 'FULLTEXT', ('description',)),
+    ('technicians', 'ft_technicians_name', 'FULLTEXT', ('name',)),
+    ('technicians', 'idx_technicians_name', 'INDEX', ('name',)),
+    ('technicians', 'idx_technicians_whatsapp_number', 'INDEX', ('whatsapp_number',))
+]
+
+def tokenize(term):
+    """Quebra o termo em palavras, descartando operadores do modo booleano"""
+    return re.findall(r'\w+', term or '', re.UNICODE)
+
+def phone_prefixes(term):
+    """Prefixos normalizados para busca por telefone (apenas dígitos, com e sem código do país)"""
+    digits = re.sub(r'\D', '', term or '')
+    if len(digits) < MIN_PHONE_DIGITS or len(digits) < len(re.sub(r'\s', '', term)) / 2:
+        return []
+
+    # Remove zeros do prefixo de operadora/tronco (ex.: 011 9999-0000); o que sobra ainda precisa
+    # ter dígitos suficientes (só zeros viraria LIKE '%' e casaria todos os telefones)
+    digits = digits.lstrip('0')
+    if len(digits) < MIN_PHONE_DIGITS:
+        return []
+    prefixes = [digits]
+    if not digits.startswith(DEFAULT_COUNTRY_CODE):
+        prefixes.append(DEFAULT_COUNTRY_CODE + digits)
+    return prefixes
+
+def _entity_subquery(entity, term):
+    """Monta SELECT id da entidade usando apenas condições indexadas"""
+    fields = SEARCH_FIELDS[entity]
+    conditions = []
+    params = []
+
+    prefixes = phone_prefixes(term) if fields['phone'] else []
+    if prefixes:
+        for prefix in prefixes:
+            conditions.append(f"{fields['phone']} LIKE %s")
+            params.append(prefix + '%')
+    else:
+        words = tokenize(term)
+        long_words = [w for w in words if len(w) >= MIN_TOKEN_SIZE]
+
+        if long_words:
+            # Todas as palavras obrigatórias, cada uma como prefixo (casa nomes parciais)
+            columns = ', '.join(fields['fulltext'])
+            conditions.append(f"MATCH({columns}) AGAINST (%s IN BOOLEAN MODE)")
+            params.append(' '.join(f'+{w}*' for w in long_words))
+        elif words and fields['prefix']:
+            # Palavras curtas não entram no FULLTEXT: prefixo do nome via índice B-tree
+            conditions.append(f"{fields['prefix']} LIKE %s")
+            params.append(words[0] + '%')
+
+    if not conditions:
+        return None, []
+    return f"SELECT id FROM {entity} WHERE " + " OR ".join(conditions), params
+
+def search_filter(term, targets):
+    """Filtro de busca indexada para usar no WHERE das listagens.
+
+    targets é uma lista de (coluna de id na consulta, entidade), por exemplo
+    [('i.client_id', 'clients'), ('i.id', 'invoices')]. Retorna (sql, params); termo vazio
+    retorna (None, []) e termo preenchido que não gera nenhuma condição (ex.: só pontuação)
+    retorna NO_MATCH, para a listagem não voltar inteira.
+    """
+    parts = []
+    params = []
+    for column, entity in targets:
+        subquery, sub_params = _entity_subquery(entity, term)
+        if subquery:
+            parts.append(f"{column} IN ({subquery})")
+            params.extend(sub_params)
+
+    if not parts:
+        return (NO_MATCH if term and term.strip() else None), []
+    return "(" + " OR ".join(parts) + ")", params
+
+def index_exists(table, index_name, columns, fulltext=False):
+    """Verifica se já existe o índice pelo nome ou um índice equivalente.
+
+    Um índice B-tree é equivalente quando suas primeiras colunas são as pedidas (ex.: um
+    índice (client_id, due_date) já atende a um pedido por (client_id)); FULLTEXT só é
+    equivalente a outro FULLTEXT com as mesmas colunas.
+    """
+    result = execute_sql("""
+        SELECT INDEX_NAME, INDEX_TYPE, GROUP_CONCAT(COLUMN_NAME ORDER BY SEQ_IN_INDEX)
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        GROUP BY INDEX_NAME, INDEX_TYPE
+    """, (table,))
+    for name, index_type, index_columns in result:
+        if name == index_name:
+            return True
+        index_columns = index_columns.split(',')
+        if fulltext:
+            if index_type == 'FULLTEXT' and index_columns == list(columns):
+                return True
+        elif index_type != 'FULLTEXT' and index_columns[:len(columns)] == list(columns):
+            return True
+    return False
+
+def ensure_search_indexes():
+    """Cria (se ainda não existirem) os índices usados pela busca; retorna os índices criados"""
+    created = []
+    for table, index_name, index_type, columns in SEARCH_INDEXES:
+        if index_exists(table, index_name, columns, fulltext=(index_type == 'FULLTEXT')):
+            continue
+        kind = 'FULLTEXT INDEX' if index_type == 'FULLTEXT' else 'INDEX'
+        execute_sql(f"ALTER TABLE {table} ADD {kind} {index_name} ({', '.join(columns)})")
+        created.append(f"{table}.{index_name}")
+    db.session.commit()
+    return created
+
+def typeahead(entity, term, columns, where_clauses=None, params=None, order_by='name', limit=TYPEAHEAD_LIMIT):
+    """Primeiros resultados da busca indexada para campos de autocompletar.
+
+    Sem termo, só retorna linhas quando há filtro fixo (where_clauses); assim um campo
+    vazio nunca lista a tabela inteira. Retorna uma lista de dicts com as colunas pedidas.
+    """
+    where_clauses = list(where_clauses or [])
+    params = list(params or [])
+
+    if term and term.strip():
+        search_sql, search_params = search_filter(term, [('id', entity)])
+        if search_sql == NO_MATCH:
+            return []
+        where_clauses.append(search_sql)
+        params.extend(search_params)
+    elif not where_clauses:
+        return []
+
+    limit = max(1, min(int(limit), MAX_TYPEAHEAD_LIMIT))
+    result = execute_sql(f"""
+        SELECT {', '.join(columns)} FROM {entity}
+        WHERE {' AND '.join(where_clauses)}
+        ORDER BY {order_by}
+        LIMIT {limit}
+    """, tuple(params))
+    return [dict(row._mapping) for row in result]
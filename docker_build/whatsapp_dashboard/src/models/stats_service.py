@@ -0,0 +1,138 @@
+from datetime import datetime
+from flask import current_app, url_for
+from src.models.database import db, execute_sql
+from src.models.cache import cache_get, cache_set, cache_delete
+from src.models.dashboard_stats import DashboardStats
+from src.models.financial_summary import get_financial_summary
+from src.models.invoice_rollup import refresh_invoice_rollup, monthly_revenue
+from src.models.fragment_cache import invalidate_fragments
+
+OVERVIEW_CACHE_KEY = 'dashboard:overview'
+
+# Validade padrão do cache do dashboard (segundos) - sobrescrita por STATS_CACHE_TTL
+DEFAULT_CACHE_TTL = 60
+
+# Tipos de atendimento dos clientes: não há índice para o GROUP BY e o gráfico muda devagar,
+# então a contagem fica guardada por mais tempo que o overview (segundos)
+INTERACTIONS_CACHE_KEY = 'dashboard:interactions'
+INTERACTIONS_CACHE_TTL = 3600
+
+def empty_overview():
+    """Estrutura vazia usada quando o cálculo falha"""
+    return {
+        'orders_by_status': {},
+        'revenue_by_month': {},
+        'interactions_by_type': {},
+        'overdue_count': 0,
+        'urgent_count': 0,
+        'financial': None,
+        'computed_at': None
+    }
+
+def get_interactions_by_type():
+    """Clientes por tipo do último atendimento (cache próprio de INTERACTIONS_CACHE_TTL)"""
+    interactions = cache_get(INTERACTIONS_CACHE_KEY)
+    if interactions is not None:
+        return interactions
+
+    result = execute_sql("""
+        SELECT last_interaction_type, COUNT(*) as count
+        FROM clients
+        WHERE last_interaction_type IS NOT NULL
+        GROUP BY last_interaction_type
+    """)
+    interactions = {interaction_type: count for interaction_type, count in result}
+    cache_set(INTERACTIONS_CACHE_KEY, interactions, INTERACTIONS_CACHE_TTL)
+    return interactions
+
+def compute_overview():
+    """Calcula o que os snapshots diários não fornecem: distribuições, alertas e gráficos.
+
+    Os totais (clientes, ordens, agendamentos...) vêm de DashboardStats.get_current_stats
+    (snapshot + delta do dia); aqui não há contagens de tabela inteira.
+    """
+    overview = empty_overview()
+
+    # Ordens de serviço: distribuição por status + ordens urgentes numa só passada
+    # (lida do índice (status, created_at), sem acessar as linhas)
+    result = execute_sql("""
+        SELECT status,
+               COUNT(*) as count,
+               SUM(CASE WHEN status IN ('assigned', 'en_route')
+                         AND created_at < DATE_SUB(NOW(), INTERVAL 24 HOUR) THEN 1 ELSE 0 END) as urgent
+        FROM service_orders
+        GROUP BY status
+    """)
+    for row in result:
+        overview['orders_by_status'][row[0]] = row[1]
+        overview['urgent_count'] += int(row[2] or 0)
+
+    # Faturas: pendentes, vencidas e receita total (resumo financeiro, uma passada)
+    financial = get_financial_summary()
+    overview['overdue_count'] = financial['overdue_count']
+    overview['financial'] = financial
+
+    # Receita mensal: poucas centenas de linhas do agregado diário
+    refresh_invoice_rollup()
+    overview['revenue_by_month'] = monthly_revenue(6)
+
+    overview['interactions_by_type'] = get_interactions_by_type()
+    return overview
+
+def get_overview():
+    """Retorna os dados do dashboard a partir do cache compartilhado, recalculando quando expirado"""
+    overview = cache_get(OVERVIEW_CACHE_KEY)
+    if overview is not None:
+        return overview
+
+    try:
+        overview = compute_overview()
+    except Exception as e:
+        # Não guarda em cache um resultado de erro
+        print(f"Erro ao calcular dados do dashboard: {e}")
+        db.session.rollback()
+        overview = empty_overview()
+        overview['stats'] = DashboardStats.get_current_stats()
+        overview['stats_history'] = DashboardStats.get_history(30)
+        return overview
+
+    # Números principais e histórico vêm dos snapshots diários (consultas indexadas);
+    # os de faturas reaproveitam o resumo financeiro já calculado
+    overview['stats'] = DashboardStats.get_current_stats(overview['financial'])
+    overview['stats_history'] = DashboardStats.get_history(30)
+
+    # Versão dos dados: chave dos fragmentos de template que exibem este overview
+    overview['computed_at'] = datetime.utcnow().isoformat()
+
+    ttl = current_app.config.get('STATS_CACHE_TTL', DEFAULT_CACHE_TTL)
+    cache_set(OVERVIEW_CACHE_KEY, overview, ttl)
+    return overview
+
+def overview_alerts(overview):
+    """Alertas do dashboard a partir dos contadores do overview (precisa de contexto de requisição)"""
+    alerts = []
+
+    # Boletos vencidos
+    overdue_count = overview['overdue_count']
+    if overdue_count > 0:
+        alerts.append({
+            'type': 'danger',
+            'message': f'{overdue_count} boletos vencidos pendentes de pagamento',
+            'link': url_for('financial.invoices')
+        })
+
+    # Ordens urgentes
+    urgent_count = overview['urgent_count']
+    if urgent_count > 0:
+        alerts.append({
+            'type': 'warning',
+            'message': f'{urgent_count} ordens de serviço urgentes pendentes',
+            'link': url_for('service_orders.list')
+        })
+
+    return alerts
+
+def invalidate_overview():
+    """Descarta o cache do dashboard (chamar após gravar em invoices ou service_orders)"""
+    cache_delete(OVERVIEW_CACHE_KEY)
+    invalidate_fragments('dashboard')
@@ -0,0 +1,225 @@
+from datetime import timedelta
+from flask import current_app
+from src.models.database import db, execute_sql
+from src.models.rollups import get_watermark, set_watermark, claim_refresh, db_now, chunks
+
+ROLLUP_NAME = 'technician_daily'
+
+# Intervalo mínimo (segundos) entre atualizações incrementais - sobrescrito por TECHNICIAN_ROLLUP_REFRESH
+DEFAULT_REFRESH_INTERVAL = 60
+
+# Limites superiores (minutos) das faixas do histograma de tempo de conclusão; a última
+# faixa (índice len(DURATION_BUCKETS)) guarda tudo acima de uma semana
+DURATION_BUCKETS = [15, 30, 45, 60, 90, 120, 180, 240, 360, 480, 720, 1440, 2880, 4320, 10080]
+
+COMPLETION_MINUTES = """
+    CASE WHEN status = 'completed' AND created_at IS NOT NULL AND completed_at IS NOT NULL
+         THEN TIMESTAMPDIFF(MINUTE, created_at, completed_at) END
+"""
+
+class TechnicianDailyRollup(db.Model):
+    """Ordens por técnico e dia de criação: atribuídas, concluídas e minutos de conclusão"""
+    __tablename__ = 'technician_daily_rollup'
+
+    technician_id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, primary_key=True, index=True)
+    assigned_count = db.Column(db.Integer, nullable=False, default=0)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
+    # Ordens concluídas com horário de conclusão (base da média) e soma dos minutos
+    timed_count = db.Column(db.Integer, nullable=False, default=0)
+    completion_minutes = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<TechnicianDailyRollup {self.technician_id} {self.day}>'
+
+class TechnicianDurationHistogram(db.Model):
+    """Histograma do tempo de conclusão por técnico e dia (faixas de DURATION_BUCKETS)"""
+    __tablename__ = 'technician_duration_histogram'
+
+    technician_id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, primary_key=True, index=True)
+    bucket = db.Column(db.SmallInteger, primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<TechnicianDurationHistogram {self.technician_id} {self.day} {self.bucket}>'
+
+def _bucket_expression():
+    """CASE que converte os minutos de conclusão no índice da faixa do histograma"""
+    cases = ' '.join(f"WHEN minutes < {limit} THEN {index}" for index, limit in enumerate(DURATION_BUCKETS))
+    return f"CASE {cases} ELSE {len(DURATION_BUCKETS)} END"
+
+def _day_ranges(days):
+    """Filtro por faixas de created_at (usa o índice) para um conjunto de dias"""
+    conditions = ' OR '.join(['(created_at >= %s AND created_at < %s)'] * len(days))
+    params = []
+    for day in days:
+        params.extend([day, day + timedelta(days=1)])
+    return f"({conditions})", params
+
+def _recompute_days(days):
+    """Recalcula os dias informados para todos os técnicos (cobre reatribuições dentro do dia)"""
+    for batch in chunks(sorted(days), 100):
+        ranges, params = _day_ranges(batch)
+        placeholders = ', '.join(['%s'] * len(batch))
+
+        # Zera antes de regravar: técnico que perdeu todas as ordens do dia fica com zero
+        execute_sql(f"""
+            UPDATE technician_daily_rollup
+            SET assigned_count = 0, completed_count = 0, timed_count = 0, completion_minutes = 0
+            WHERE day IN ({placeholders})
+        """, tuple(batch))
+        execute_sql(f"""
+            UPDATE technician_duration_histogram SET order_count = 0
+            WHERE day IN ({placeholders})
+        """, tuple(batch))
+
+        execute_sql(f"""
+            INSERT INTO technician_daily_rollup
+                (technician_id, day, assigned_count, completed_count, timed_count, completion_minutes)
+            SELECT technician_id, DATE(created_at), COUNT(*),
+                   SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END),
+                   COUNT({COMPLETION_MINUTES}),
+                   COALESCE(SUM({COMPLETION_MINUTES}), 0)
+            FROM service_orders
+            WHERE technician_id IS NOT NULL AND {ranges}
+            GROUP BY technician_id, DATE(created_at)
+            ON DUPLICATE KEY UPDATE assigned_count = VALUES(assigned_count),
+                                    completed_count = VALUES(completed_count),
+                                    timed_count = VALUES(timed_count),
+                                    completion_minutes = VALUES(completion_minutes)
+        """, tuple(params))
+
+        execute_sql(f"""
+            INSERT INTO technician_duration_histogram (technician_id, day, bucket, order_count)
+            SELECT technician_id, day, {_bucket_expression()} as bucket, COUNT(*)
+            FROM (
+                SELECT technician_id, DATE(created_at) as day, {COMPLETION_MINUTES} as minutes
+                FROM service_orders
+                WHERE technician_id IS NOT NULL AND {ranges}
+            ) durations
+            WHERE minutes IS NOT NULL
+            GROUP BY technician_id, day, bucket
+            ON DUPLICATE KEY UPDATE order_count = VALUES(order_count)
+        """, tuple(params))
+
+def rebuild_technician_rollup():
+    """Reconstrói os agregados de técnicos a partir de service_orders; retorna os dias processados"""
+    watermark = db_now()
+    execute_sql("DELETE FROM technician_daily_rollup")
+    execute_sql("DELETE FROM technician_duration_histogram")
+    result = execute_sql("""
+        SELECT DISTINCT DATE(created_at) FROM service_orders
+        WHERE technician_id IS NOT NULL AND created_at IS NOT NULL
+    """)
+    days = [row[0] for row in result]
+    _recompute_days(days)
+    set_watermark(ROLLUP_NAME, watermark)
+    db.session.commit()
+    return len(days)
+
+def refresh_technician_rollup(force=False):
+    """Reprocessa os dias das ordens criadas/alteradas (status, técnico, conclusão) desde a marca d'água"""
+    watermark = get_watermark(ROLLUP_NAME)
+    if watermark is None:
+        rebuild_technician_rollup()
+        return -1
+
+    interval = current_app.config.get('TECHNICIAN_ROLLUP_REFRESH', DEFAULT_REFRESH_INTERVAL)
+    if not force and not claim_refresh(ROLLUP_NAME, interval):
+        return 0
+
+    new_watermark = db_now()
+    result = execute_sql("""
+        SELECT DISTINCT DATE(created_at) FROM service_orders
+        WHERE updated_at >= %s AND created_at IS NOT NULL
+    """, (watermark,))
+    days = [row[0] for row in result]
+
+    _recompute_days(days)
+    set_watermark(ROLLUP_NAME, new_watermark)
+    db.session.commit()
+    return len(days)
+
+def technician_rollup_version(**kwargs):
+    """Marca d'água dos agregados (versão dos dados exibidos; aceita os argumentos da view)"""
+    return get_watermark(ROLLUP_NAME)
+
+def histogram_percentile(counts, fraction):
+    """Percentil (minutos) estimado por interpolação linear dentro da faixa do histograma"""
+    total = sum(counts.values())
+    if not total:
+        return None
+
+    target = fraction * total
+    cumulative = 0
+    for bucket in range(len(DURATION_BUCKETS) + 1):
+        count = counts.get(bucket, 0)
+        if count and cumulative + count >= target:
+            lower = DURATION_BUCKETS[bucket - 1] if bucket > 0 else 0
+            if bucket == len(DURATION_BUCKETS):
+                # Faixa aberta (acima de uma semana): o limite inferior é a melhor estimativa
+                return float(lower)
+            upper = DURATION_BUCKETS[bucket]
+            return lower + (upper - lower) * (target - cumulative) / count
+        cumulative += count
+    return None
+
+def technician_performance(start_date=None, technician_id=None):
+    """Desempenho por técnico a partir dos agregados (independe do volume de ordens).
+
+    Retorna {technician_id: {total_orders, completed_orders, avg_completion_time, p50, p90}}
+    para ordens criadas a partir de start_date (ou todo o histórico).
+    """
+    where_clauses = []
+    params = []
+    if start_date:
+        where_clauses.append("day >= %s")
+        params.append(start_date)
+    if technician_id:
+        where_clauses.append("technician_id = %s")
+        params.append(technician_id)
+    where_sql = f"WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
+
+    performance = {}
+    result = execute_sql(f"""
+        SELECT technician_id, SUM(assigned_count), SUM(completed_count),
+               SUM(timed_count), SUM(completion_minutes)
+        FROM technician_daily_rollup
+        {where_sql}
+        GROUP BY technician_id
+    """, tuple(params))
+    for tech_id, assigned, completed, timed, minutes in result:
+        performance[tech_id] = {
+            'total_orders': int(assigned or 0),
+            'completed_orders': int(completed or 0),
+            'avg_completion_time': float(minutes) / int(timed) if timed else None,
+            'p50_completion_time': None,
+            'p90_completion_time': None
+        }
+
+    histograms = {}
+    result = execute_sql(f"""
+        SELECT technician_id, bucket, SUM(order_count)
+        FROM technician_duration_histogram
+        {where_sql}
+        GROUP BY technician_id, bucket
+    """, tuple(params))
+    for tech_id, bucket, count in result:
+        histograms.setdefault(tech_id, {})[bucket] = int(count or 0)
+
+    for tech_id, counts in histograms.items():
+        if tech_id in performance:
+            performance[tech_id]['p50_completion_time'] = histogram_percentile(counts, 0.5)
+            performance[tech_id]['p90_completion_time'] = histogram_percentile(counts, 0.9)
+
+    return performance
+
+def empty_performance():
+    return {
+        'total_orders': 0,
+        'completed_orders': 0,
+        'avg_completion_time': None,
+        'p50_completion_time': None,
+        'p90_completion_time': None
+    }
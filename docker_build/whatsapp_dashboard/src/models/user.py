@@ -2,6 +2,20 @@ from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from src.models.database import db
 
+# Permissões por papel
+ROLE_PERMISSIONS = {
+    'admin': ['view_all', 'edit_all', 'delete_all', 'manage_users', 'view_reports'],
+    'attendant': ['view_clients', 'edit_clients', 'view_orders', 'edit_orders', 'view_financial'],
+    'technician': ['view_orders', 'edit_own_orders', 'view_routes']
+}
+
+# Nome do papel em português
+ROLE_NAMES = {
+    'admin': 'Administrador',
+    'attendant': 'Atendente',
+    'technician': 'Técnico'
+}
+
 class User(db.Model):
     __tablename__ = 'dashboard_users'
     
@@ -20,18 +34,8 @@ class User(db.Model):
     
     def has_permission(self, permission):
         """Verifica se o usuário tem uma permissão específica"""
-        permissions = {
-            'admin': ['view_all', 'edit_all', 'delete_all', 'manage_users', 'view_reports'],
-            'attendant': ['view_clients', 'edit_clients', 'view_orders', 'edit_orders', 'view_financial'],
-            'technician': ['view_orders', 'edit_own_orders', 'view_routes']
-        }
-        return permission in permissions.get(self.role, [])
+        return permission in ROLE_PERMISSIONS.get(self.role, [])
     
     def get_role_display(self):
         """Retorna o nome do papel em português"""
-        roles = {
-            'admin': 'Administrador',
-            'attendant': 'Atendente',
-            'technician': 'Técnico'
-        }
-        return roles.get(self.role, self.role)
+        return ROLE_NAMES.get(self.role, self.role)
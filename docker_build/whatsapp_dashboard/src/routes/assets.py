@@ -0,0 +1,59 @@
+import mimetypes
+import os
+from flask import Blueprint, current_app, request, send_file, url_for, abort
+from src.models.assets import DIST_DIR, ENCODING_SUFFIXES, load_manifest
+
+assets_bp = Blueprint('assets', __name__)
+
+# Arquivos versionados nunca mudam de conteúdo (o hash está no nome): cache de um ano, sem revalidação
+ASSET_MAX_AGE = 31536000
+
+def _assets():
+    return current_app.extensions['assets']
+
+def asset_url(filename, **values):
+    """Mesmo uso de url_for('static', filename=...): aponta para a versão com hash quando existe.
+
+    Sem build (desenvolvimento) ou para arquivos fora do manifesto, cai no static padrão do Flask.
+    """
+    entry = _assets()['manifest'].get(filename)
+    if entry is None:
+        return url_for('static', filename=filename, **values)
+    return url_for('assets.asset', filename=entry['path'], **values)
+
+def _choose_encoding(encodings):
+    """Melhor variante pré-comprimida aceita pelo navegador (br, depois gzip) ou None"""
+    for encoding, suffix in ENCODING_SUFFIXES:
+        if encoding in encodings and request.accept_encodings[encoding]:
+            return encoding, suffix
+    return None, ''
+
+@assets_bp.route('/<path:filename>')
+def asset(filename):
+    """Serve um arquivo versionado, pré-comprimido conforme Accept-Encoding, com cache imutável"""
+    entry = _assets()['by_path'].get(filename)
+    if entry is None:
+        abort(404)
+
+    encoding, suffix = _choose_encoding(entry['encodings'])
+    path = os.path.join(current_app.static_folder, DIST_DIR, entry['path']) + suffix
+    mimetype = mimetypes.guess_type(entry['path'])[0] or 'application/octet-stream'
+
+    response = send_file(path, mimetype=mimetype, conditional=True,
+                         etag=f"{entry['path']}-{encoding or 'identity'}", max_age=ASSET_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    # Proxies guardam uma cópia por codificação; a variante sem compressão vale para quem não aceita
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+def init_assets(app):
+    """Carrega o manifesto do build e registra asset_url nos templates"""
+    manifest = load_manifest(app.static_folder)
+    app.extensions['assets'] = {
+        'manifest': manifest,
+        'by_path': {entry['path']: entry for entry in manifest.values()}
+    }
+    app.jinja_env.globals['asset_url'] = asset_url
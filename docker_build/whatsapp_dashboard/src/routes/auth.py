@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
 from werkzeug.security import check_password_hash, generate_password_hash
 from src.models.user import User
+from src.models.identity import get_current_user, remember_user, invalidate_identity
 from src.models.database import db
 from datetime import datetime
 
@@ -19,6 +20,7 @@ def login():
                 session['user_id'] = user.id
                 session['username'] = user.username
                 session['role'] = user.role
+                remember_user(user)
                 
                 # Atualizar último login
                 user.last_login = datetime.utcnow()
@@ -44,7 +46,7 @@ def users():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    current_user = User.query.get(session['user_id'])
+    current_user = get_current_user()
     if not current_user.has_permission('manage_users'):
         flash('Acesso negado.', 'error')
         return redirect(url_for('dashboard.main'))
@@ -57,7 +59,7 @@ def new_user():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    current_user = User.query.get(session['user_id'])
+    current_user = get_current_user()
     if not current_user.has_permission('manage_users'):
         flash('Acesso negado.', 'error')
         return redirect(url_for('dashboard.main'))
@@ -100,7 +102,7 @@ def toggle_user(user_id):
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    current_user = User.query.get(session['user_id'])
+    current_user = get_current_user()
     if not current_user.has_permission('manage_users'):
         flash('Acesso negado.', 'error')
         return redirect(url_for('dashboard.main'))
@@ -108,6 +110,7 @@ def toggle_user(user_id):
     user = User.query.get_or_404(user_id)
     user.is_active = not user.is_active
     db.session.commit()
+    invalidate_identity(user.id)
     
     status = 'ativado' if user.is_active else 'desativado'
     flash(f'Usuário {user.username} {status} com sucesso!', 'success')
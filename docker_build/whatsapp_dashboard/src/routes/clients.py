@@ -1,121 +1,145 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
 from src.models.user import User
-from src.models.database import db
+from src.models.identity import get_current_user
+from src.models.database import db, execute_sql
+from src.models.search import search_filter, typeahead, TYPEAHEAD_LIMIT
+from src.models.pagination import paginate_keyset, count_rows, estimate_table_rows
+from src.models.client_360 import (get_client_360, client_360_version, invalidate_client_360, SECTIONS,
+                                   LIST_QUERY, LIST_SORT)
+from src.models.export import csv_response, export_query
+from src.models.conditional import conditional_get
 from datetime import datetime
 
 clients_bp = Blueprint('clients', __name__)
 
+def _client_filters(search):
+    """Filtros da lista de clientes (compartilhados com a exportação)"""
+    where_clauses = []
+    params = []
+    
+    if search:
+        # Busca indexada (FULLTEXT em nome/endereço ou prefixo do telefone)
+        search_sql, search_params = search_filter(search, [('id', 'clients')])
+        if search_sql:
+            where_clauses.append(search_sql)
+            params.extend(search_params)
+    
+    return where_clauses, params
+
 @clients_bp.route('/')
+@conditional_get('clients')
 def list():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    current_user = User.query.get(session['user_id'])
+    current_user = get_current_user()
     if not current_user.has_permission('view_clients'):
         flash('Acesso negado.', 'error')
         return redirect(url_for('dashboard.main'))
     
-    # Buscar clientes com paginação
-    page = request.args.get('page', 1, type=int)
+    # Buscar clientes com paginação por cursor (last_interaction_at + id)
+    cursor = request.args.get('cursor')
+    direction = request.args.get('dir', 'next')
     search = request.args.get('search', '')
     
+    where_clauses, params = _client_filters(search)
+    
+    # Total exato sob demanda (a página carrega via ?count=1 quando há filtro)
+    if request.args.get('count'):
+        try:
+            total = count_rows("FROM clients", where_clauses, params)
+        except Exception as e:
+            print(f"Erro ao contar clientes: {e}")
+            total = None
+        return jsonify({'total': total})
+    
     try:
-        if search:
-            result = db.session.execute("""
-                SELECT id, name, whatsapp_number, address, last_interaction_type, 
-                       last_interaction_at, created_at
-                FROM clients 
-                WHERE name LIKE %s OR whatsapp_number LIKE %s
-                ORDER BY last_interaction_at DESC
-                LIMIT %s OFFSET %s
-            """, (f'%{search}%', f'%{search}%', 20, (page-1)*20))
-        else:
-            result = db.session.execute("""
-                SELECT id, name, whatsapp_number, address, last_interaction_type, 
-                       last_interaction_at, created_at
-                FROM clients 
-                ORDER BY last_interaction_at DESC
-                LIMIT %s OFFSET %s
-            """, (20, (page-1)*20))
-        
-        clients = result.fetchall()
+        result = paginate_keyset(LIST_QUERY, where_clauses, params,
+                                 cursor=cursor, direction=direction, **LIST_SORT)
         
-        # Contar total para paginação
-        if search:
-            count_result = db.session.execute("""
-                SELECT COUNT(*) FROM clients 
-                WHERE name LIKE %s OR whatsapp_number LIKE %s
-            """, (f'%{search}%', f'%{search}%'))
-        else:
-            count_result = db.session.execute("SELECT COUNT(*) FROM clients")
+        clients = result.rows
+        next_cursor = result.next_cursor
+        prev_cursor = result.prev_cursor
         
-        total = count_result.fetchone()[0]
+        # Sem filtro o total vem das estatísticas da tabela (estimado); com filtro é carregado depois
+        total = None if search else estimate_table_rows('clients')
         
     except Exception as e:
         print(f"Erro ao buscar clientes: {e}")
         clients = []
+        next_cursor = prev_cursor = None
         total = 0
     
     return render_template('clients/list.html', 
                           clients=clients, 
-                          page=page, 
+                          next_cursor=next_cursor,
+                          prev_cursor=prev_cursor,
                           total=total, 
+                          total_is_estimate=not search,
                           search=search)
 
+@clients_bp.route('/export')
+def export():
+    """Exporta em CSV (streaming) os clientes com o mesmo filtro da lista"""
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    
+    current_user = get_current_user()
+    if not current_user.has_permission('view_clients'):
+        flash('Acesso negado.', 'error')
+        return redirect(url_for('dashboard.main'))
+    
+    where_clauses, params = _client_filters(request.args.get('search', ''))
+    sql = export_query("""
+        SELECT id, name, whatsapp_number, address, last_interaction_type,
+               last_interaction_at, created_at
+    """, "FROM clients", where_clauses, "last_interaction_at DESC, id DESC")
+    
+    return csv_response('clientes',
+                        ['ID', 'Nome', 'WhatsApp', 'Endereço', 'Último atendimento',
+                         'Data do último atendimento', 'Cadastro'],
+                        sql, params)
+
+@clients_bp.route('/lookup')
+def lookup():
+    """Autocompletar de clientes para os formulários (fatura, ordem de serviço)"""
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    
+    current_user = get_current_user()
+    if not (current_user.has_permission('edit_all') or current_user.has_permission('edit_orders')):
+        return jsonify({'error': 'Acesso negado.'}), 403
+    
+    try:
+        clients = typeahead('clients', request.args.get('q', ''),
+                            ['id', 'name', 'whatsapp_number', 'address'],
+                            limit=request.args.get('limit', TYPEAHEAD_LIMIT, type=int))
+    except Exception as e:
+        print(f"Erro ao buscar clientes para autocompletar: {e}")
+        return jsonify({'error': 'Erro ao buscar clientes.'}), 500
+    
+    return jsonify({'results': clients})
+
 @clients_bp.route('/<int:client_id>')
+@conditional_get('clients', 'appointments', 'service_orders', 'invoices', version=client_360_version)
 def detail(client_id):
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    current_user = User.query.get(session['user_id'])
+    current_user = get_current_user()
     if not current_user.has_permission('view_clients'):
         flash('Acesso negado.', 'error')
         return redirect(url_for('dashboard.main'))
     
     try:
-        # Buscar dados do cliente
-        result = db.session.execute("""
-            SELECT id, name, whatsapp_number, address, last_interaction_type, 
-                   last_interaction_at, created_at
-            FROM clients 
-            WHERE id = %s
-        """, (client_id,))
+        # Visão consolidada: seções buscadas em paralelo e guardadas no cache compartilhado
+        view = get_client_360(client_id)
         
-        client = result.fetchone()
+        client = view['client']
         if not client:
             flash('Cliente não encontrado.', 'error')
             return redirect(url_for('clients.list'))
         
-        # Buscar agendamentos do cliente
-        appointments_result = db.session.execute("""
-            SELECT id, specialty, appointment_date, status, created_at
-            FROM appointments 
-            WHERE client_id = %s
-            ORDER BY appointment_date DESC
-            LIMIT 10
-        """, (client_id,))
-        appointments = appointments_result.fetchall()
-        
-        # Buscar ordens de serviço do cliente
-        orders_result = db.session.execute("""
-            SELECT id, status, created_at, completed_at
-            FROM service_orders 
-            WHERE client_id = %s
-            ORDER BY created_at DESC
-            LIMIT 10
-        """, (client_id,))
-        orders = orders_result.fetchall()
-        
-        # Buscar faturas do cliente
-        invoices_result = db.session.execute("""
-            SELECT id, amount, due_date, status, description
-            FROM invoices 
-            WHERE client_id = %s
-            ORDER BY due_date DESC
-            LIMIT 10
-        """, (client_id,))
-        invoices = invoices_result.fetchall()
-        
     except Exception as e:
         print(f"Erro ao buscar detalhes do cliente: {e}")
         flash('Erro ao carregar dados do cliente.', 'error')
@@ -123,16 +147,38 @@ def detail(client_id):
     
     return render_template('clients/detail.html', 
                           client=client,
-                          appointments=appointments,
-                          orders=orders,
-                          invoices=invoices)
+                          appointments=view['appointments'],
+                          orders=view['orders'],
+                          invoices=view['invoices'],
+                          sections_url=url_for('clients.sections', client_id=client_id))
+
+@clients_bp.route('/<int:client_id>/sections')
+@conditional_get('clients', 'appointments', 'service_orders', 'invoices', version=client_360_version)
+def sections(client_id):
+    """Seções da visão do cliente em JSON (?only=orders,invoices) para carga progressiva na página"""
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    
+    current_user = get_current_user()
+    if not current_user.has_permission('view_clients'):
+        return jsonify({'error': 'Acesso negado.'}), 403
+    
+    requested = [name for name in request.args.get('only', '').split(',') if name in SECTIONS]
+    
+    try:
+        view = get_client_360(client_id, requested or SECTIONS)
+    except Exception as e:
+        print(f"Erro ao buscar seções do cliente: {e}")
+        return jsonify({'error': 'Erro ao carregar dados do cliente.'}), 500
+    
+    return jsonify(view)
 
 @clients_bp.route('/<int:client_id>/edit', methods=['GET', 'POST'])
 def edit(client_id):
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    current_user = User.query.get(session['user_id'])
+    current_user = get_current_user()
     if not current_user.has_permission('edit_clients'):
         flash('Acesso negado.', 'error')
         return redirect(url_for('dashboard.main'))
@@ -142,13 +188,14 @@ def edit(client_id):
             name = request.form['name']
             address = request.form['address']
             
-            db.session.execute("""
+            execute_sql("""
                 UPDATE clients 
                 SET name = %s, address = %s
                 WHERE id = %s
             """, (name, address, client_id))
             
             db.session.commit()
+            invalidate_client_360(client_id)
             flash('Cliente atualizado com sucesso!', 'success')
             return redirect(url_for('clients.detail', client_id=client_id))
             
@@ -158,7 +205,7 @@ def edit(client_id):
     
     # Buscar dados do cliente para edição
     try:
-        result = db.session.execute("""
+        result = execute_sql("""
             SELECT id, name, whatsapp_number, address
             FROM clients 
             WHERE id = %s
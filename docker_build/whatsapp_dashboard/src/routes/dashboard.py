@@ -1,7 +1,11 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify, Response, current_app
 from src.models.dashboard_stats import DashboardStats
+from src.models.stats_service import get_overview, overview_alerts
+from src.models.live_stats import get_live_hub, retry_later, DEFAULT_MAX_SUBSCRIBERS, DEFAULT_STREAM_MAX_SECONDS
 from src.models.user import User
+from src.models.identity import invalidate_identity
 from src.models.database import db
+from werkzeug.security import generate_password_hash
 from datetime import datetime, timedelta
 
 dashboard_bp = Blueprint('dashboard', __name__)
@@ -11,92 +15,43 @@ def main():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    # Obter estatísticas atuais
-    stats = DashboardStats.get_current_stats()
-    
-    # Obter dados para gráficos
-    # Ordens de serviço por status
-    try:
-        result = db.session.execute("""
-            SELECT status, COUNT(*) as count 
-            FROM service_orders 
-            GROUP BY status
-        """)
-        orders_by_status = {row[0]: row[1] for row in result}
-    except:
-        orders_by_status = {}
-    
-    # Faturamento dos últimos 6 meses
-    try:
-        result = db.session.execute("""
-            SELECT DATE_FORMAT(due_date, '%Y-%m') as month, SUM(amount) as total 
-            FROM invoices 
-            WHERE status = 'paid' 
-            AND due_date >= DATE_SUB(CURDATE(), INTERVAL 6 MONTH)
-            GROUP BY DATE_FORMAT(due_date, '%Y-%m')
-            ORDER BY month
-        """)
-        revenue_by_month = {row[0]: float(row[1]) for row in result}
-    except:
-        revenue_by_month = {}
-    
-    # Atendimentos por tipo
-    try:
-        result = db.session.execute("""
-            SELECT last_interaction_type, COUNT(*) as count 
-            FROM clients 
-            WHERE last_interaction_type IS NOT NULL
-            GROUP BY last_interaction_type
-        """)
-        interactions_by_type = {row[0]: row[1] for row in result}
-    except:
-        interactions_by_type = {}
+    # Estatísticas, gráficos e contadores de alerta vêm do cache compartilhado
+    overview = get_overview()
     
     # Alertas recentes
-    alerts = []
+    alerts = overview_alerts(overview)
     
-    # Boletos vencidos
-    try:
-        result = db.session.execute("""
-            SELECT COUNT(*) as count 
-            FROM invoices 
-            WHERE status = 'open' 
-            AND due_date < CURDATE()
-        """)
-        overdue_count = result.fetchone()[0]
-        if overdue_count > 0:
-            alerts.append({
-                'type': 'danger',
-                'message': f'{overdue_count} boletos vencidos pendentes de pagamento',
-                'link': url_for('financial.invoices')
-            })
-    except:
-        pass
+    return render_template('dashboard/main.html', 
+                          stats=overview['stats'], 
+                          stats_history=overview['stats_history'],
+                          orders_by_status=overview['orders_by_status'],
+                          revenue_by_month=overview['revenue_by_month'],
+                          interactions_by_type=overview['interactions_by_type'],
+                          alerts=alerts,
+                          data_version=overview.get('computed_at'),
+                          live_url=url_for('dashboard.live'))
+
+@dashboard_bp.route('/live')
+def live():
+    """Canal SSE do dashboard: estado inicial e depois só as diferenças, do produtor único do processo"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Não autenticado.'}), 401
     
-    # Ordens urgentes
-    try:
-        result = db.session.execute("""
-            SELECT COUNT(*) as count 
-            FROM service_orders 
-            WHERE status IN ('assigned', 'en_route') 
-            AND created_at < DATE_SUB(NOW(), INTERVAL 24 HOUR)
-        """)
-        urgent_count = result.fetchone()[0]
-        if urgent_count > 0:
-            alerts.append({
-                'type': 'warning',
-                'message': f'{urgent_count} ordens de serviço urgentes pendentes',
-                'link': url_for('service_orders.list')
-            })
-    except:
-        pass
+    hub = get_live_hub()
+    events = hub.subscribe(current_app.config.get('LIVE_MAX_SUBSCRIBERS', DEFAULT_MAX_SUBSCRIBERS))
+    if events is None:
+        # Sem threads livres para mais uma conexão: responde 200 só com "retry" e fecha, para o
+        # navegador tentar de novo mais tarde (EventSource desiste de vez após 204 ou 503)
+        body = retry_later()
+    else:
+        max_seconds = current_app.config.get('LIVE_STREAM_MAX_SECONDS', DEFAULT_STREAM_MAX_SECONDS)
+        body = hub.stream(events, max_seconds)
     
-    return render_template('dashboard/main.html', 
-                          stats=stats, 
-                          orders_by_status=orders_by_status,
-                          revenue_by_month=revenue_by_month,
-                          interactions_by_type=interactions_by_type,
-                          alerts=alerts)
+    response = Response(body, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-store'
+    # Não deixa um proxy reverso (nginx) acumular os eventos
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @dashboard_bp.route('/profile')
 def profile():
@@ -122,6 +77,7 @@ def update_profile():
             user.password_hash = generate_password_hash(request.form['password'])
         
         db.session.commit()
+        invalidate_identity(user.id)
         flash('Perfil atualizado com sucesso!', 'success')
     
     return redirect(url_for('dashboard.profile'))
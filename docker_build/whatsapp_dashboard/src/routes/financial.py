@@ -1,7 +1,20 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify, make_response
 from src.models.user import User
-from src.models.database import db
-from datetime import datetime
+from src.models.identity import get_current_user
+from src.models.database import db, execute_sql
+from src.models.search import search_filter
+from src.models.pagination import paginate_keyset, count_rows, estimate_table_rows
+from src.models.stats_service import invalidate_overview
+from src.models.client_360 import invalidate_client_360
+from src.models.financial_summary import (get_financial_summary, empty_summary, INVOICES_FROM,
+                                          INVOICE_LIST_QUERY, INVOICE_LIST_SORT)
+from src.models.invoice_rollup import refresh_invoice_rollup
+from src.models.export import csv_response, export_query
+from src.models.batch_invoicing import rows_from_csv, rows_from_selection
+from src.models.jobs import enqueue_job, expire_jobs, get_job, job_to_dict
+from src.models.report_jobs import serialize_invoice_rows
+from src.models.conditional import conditional_get
+from datetime import datetime, date, timedelta
 
 financial_bp = Blueprint('financial', __name__)
 
@@ -10,52 +23,21 @@ def main():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    current_user = User.query.get(session['user_id'])
+    current_user = get_current_user()
     if not current_user.has_permission('view_financial'):
         flash('Acesso negado.', 'error')
         return redirect(url_for('dashboard.main'))
     
-    # Resumo financeiro
+    # Resumo financeiro (pendentes, pagas em 30 dias e vencidas) numa única passada
     try:
-        # Total de faturas pendentes
-        pending_result = db.session.execute("""
-            SELECT COUNT(*) as count, SUM(amount) as total
-            FROM invoices 
-            WHERE status = 'open'
-        """)
-        pending = pending_result.fetchone()
-        pending_count = pending[0] if pending else 0
-        pending_total = float(pending[1]) if pending and pending[1] else 0
-        
-        # Total de faturas pagas (últimos 30 dias)
-        paid_result = db.session.execute("""
-            SELECT COUNT(*) as count, SUM(amount) as total
-            FROM invoices 
-            WHERE status = 'paid'
-            AND due_date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
-        """)
-        paid = paid_result.fetchone()
-        paid_count = paid[0] if paid else 0
-        paid_total = float(paid[1]) if paid and paid[1] else 0
-        
-        # Total de faturas vencidas
-        overdue_result = db.session.execute("""
-            SELECT COUNT(*) as count, SUM(amount) as total
-            FROM invoices 
-            WHERE status = 'open'
-            AND due_date < CURDATE()
-        """)
-        overdue = overdue_result.fetchone()
-        overdue_count = overdue[0] if overdue else 0
-        overdue_total = float(overdue[1]) if overdue and overdue[1] else 0
-        
+        summary = get_financial_summary()
     except Exception as e:
         print(f"Erro ao buscar resumo financeiro: {e}")
-        pending_count = pending_total = paid_count = paid_total = overdue_count = overdue_total = 0
+        summary = empty_summary()
     
     # Buscar configuração PIX
     try:
-        pix_result = db.session.execute("""
+        pix_result = execute_sql("""
             SELECT value FROM settings WHERE name = 'pix_key'
         """)
         pix_key = pix_result.fetchone()
@@ -64,92 +46,114 @@ def main():
         pix_key = 'Não configurado'
     
     return render_template('financial/main.html',
-                          pending_count=pending_count,
-                          pending_total=pending_total,
-                          paid_count=paid_count,
-                          paid_total=paid_total,
-                          overdue_count=overdue_count,
-                          overdue_total=overdue_total,
+                          pending_count=summary['pending_count'],
+                          pending_total=summary['pending_total'],
+                          paid_count=summary['paid_count'],
+                          paid_total=summary['paid_total'],
+                          overdue_count=summary['overdue_count'],
+                          overdue_total=summary['overdue_total'],
                           pix_key=pix_key)
 
+def _invoice_filters(status, search):
+    """Filtros da lista de faturas (compartilhados com a exportação)"""
+    where_clauses = []
+    params = []
+    
+    if status != 'all':
+        where_clauses.append("i.status = %s")
+        params.append(status)
+    
+    if search:
+        # Busca indexada no cliente (nome/telefone) ou na descrição da fatura
+        search_sql, search_params = search_filter(search, [('i.client_id', 'clients'), ('i.id', 'invoices')])
+        if search_sql:
+            where_clauses.append(search_sql)
+            params.extend(search_params)
+    
+    return where_clauses, params
+
 @financial_bp.route('/invoices')
+@conditional_get('invoices', 'clients')
 def invoices():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    current_user = User.query.get(session['user_id'])
+    current_user = get_current_user()
     if not current_user.has_permission('view_financial'):
         flash('Acesso negado.', 'error')
         return redirect(url_for('dashboard.main'))
     
     # Filtros
     status = request.args.get('status', 'all')
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
+    direction = request.args.get('dir', 'next')
     search = request.args.get('search', '')
     
+    where_clauses, params = _invoice_filters(status, search)
+    
+    # Total exato sob demanda (a página carrega via ?count=1 quando há filtro)
+    if request.args.get('count'):
+        try:
+            total = count_rows(INVOICES_FROM, where_clauses, params)
+        except Exception as e:
+            print(f"Erro ao contar faturas: {e}")
+            total = None
+        return jsonify({'total': total})
+    
     try:
-        # Construir query base
-        query = """
-            SELECT i.id, i.amount, i.due_date, i.status, i.description, 
-                   c.name as client_name, c.whatsapp_number
-            FROM invoices i
-            JOIN clients c ON i.client_id = c.id
-        """
-        
-        # Adicionar filtros
-        where_clauses = []
-        params = []
-        
-        if status != 'all':
-            where_clauses.append("i.status = %s")
-            params.append(status)
-        
-        if search:
-            where_clauses.append("(c.name LIKE %s OR c.whatsapp_number LIKE %s OR i.description LIKE %s)")
-            params.extend([f'%{search}%', f'%{search}%', f'%{search}%'])
-        
-        if where_clauses:
-            query += " WHERE " + " AND ".join(where_clauses)
-        
-        # Adicionar ordenação e paginação
-        query += " ORDER BY i.due_date DESC LIMIT %s OFFSET %s"
-        params.extend([20, (page-1)*20])
-        
-        # Executar query
-        result = db.session.execute(query, params)
-        invoices = result.fetchall()
+        # Paginação por cursor (due_date + id)
+        result = paginate_keyset(INVOICE_LIST_QUERY, where_clauses, params,
+                                 cursor=cursor, direction=direction, **INVOICE_LIST_SORT)
         
-        # Contar total para paginação
-        count_query = """
-            SELECT COUNT(*) 
-            FROM invoices i
-            JOIN clients c ON i.client_id = c.id
-        """
+        invoices = result.rows
+        next_cursor = result.next_cursor
+        prev_cursor = result.prev_cursor
         
-        if where_clauses:
-            count_query += " WHERE " + " AND ".join(where_clauses)
-        
-        count_result = db.session.execute(count_query, params[:-2] if params else [])
-        total = count_result.fetchone()[0]
+        # Sem filtro o total vem das estatísticas da tabela (estimado); com filtro é carregado depois
+        total = None if where_clauses else estimate_table_rows('invoices')
         
     except Exception as e:
         print(f"Erro ao buscar faturas: {e}")
         invoices = []
+        next_cursor = prev_cursor = None
         total = 0
     
     return render_template('financial/invoices.html',
                           invoices=invoices,
                           status=status,
-                          page=page,
+                          next_cursor=next_cursor,
+                          prev_cursor=prev_cursor,
                           total=total,
+                          total_is_estimate=not where_clauses,
                           search=search)
 
+@financial_bp.route('/invoices/export')
+def export_invoices():
+    """Exporta em CSV (streaming) as faturas com os mesmos filtros da lista"""
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    
+    current_user = get_current_user()
+    if not current_user.has_permission('view_financial'):
+        flash('Acesso negado.', 'error')
+        return redirect(url_for('dashboard.main'))
+    
+    where_clauses, params = _invoice_filters(request.args.get('status', 'all'),
+                                             request.args.get('search', ''))
+    sql = export_query("""
+        SELECT i.id, c.name, c.whatsapp_number, i.description, i.amount, i.due_date, i.status
+    """, INVOICES_FROM, where_clauses, "i.due_date DESC, i.id DESC")
+    
+    return csv_response('faturas',
+                        ['ID', 'Cliente', 'WhatsApp', 'Descrição', 'Valor', 'Vencimento', 'Status'],
+                        sql, params)
+
 @financial_bp.route('/invoices/new', methods=['GET', 'POST'])
 def new_invoice():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    current_user = User.query.get(session['user_id'])
+    current_user = get_current_user()
     if not current_user.has_permission('edit_all'):
         flash('Acesso negado.', 'error')
         return redirect(url_for('dashboard.main'))
@@ -162,7 +166,7 @@ def new_invoice():
             description = request.form['description']
             
             # Validar cliente
-            client_result = db.session.execute("""
+            client_result = execute_sql("""
                 SELECT id FROM clients WHERE id = %s
             """, (client_id,))
             
@@ -171,36 +175,117 @@ def new_invoice():
                 return redirect(url_for('financial.new_invoice'))
             
             # Inserir fatura
-            db.session.execute("""
+            execute_sql("""
                 INSERT INTO invoices (client_id, amount, due_date, status, description, created_at)
                 VALUES (%s, %s, %s, 'open', %s, NOW())
             """, (client_id, amount, due_date, description))
             
             db.session.commit()
-            flash('Fatura criada com sucesso!', 'success')
-            return redirect(url_for('financial.invoices'))
             
         except Exception as e:
             print(f"Erro ao criar fatura: {e}")
             flash('Erro ao criar fatura.', 'error')
+        else:
+            # A fatura já está gravada: falhas daqui em diante não podem virar "Erro ao criar fatura"
+            invalidate_overview()
+            invalidate_client_360(client_id)
+            try:
+                refresh_invoice_rollup(force=True)
+            except Exception as e:
+                # A marca d'água não avançou: a próxima atualização incremental inclui esta fatura
+                print(f"Erro ao atualizar o agregado de faturas: {e}")
+            expire_jobs('financial_report')
+            flash('Fatura criada com sucesso!', 'success')
+            return redirect(url_for('financial.invoices'))
     
-    # Buscar clientes para o formulário
-    try:
-        clients_result = db.session.execute("""
-            SELECT id, name, whatsapp_number FROM clients ORDER BY name
-        """)
-        clients = clients_result.fetchall()
-    except:
-        clients = []
+    # O cliente é escolhido pelo autocompletar (clients.lookup); aqui só o já selecionado
+    selected_client = None
+    client_id = request.values.get('client_id', type=int)
+    if client_id:
+        try:
+            selected_client = execute_sql("""
+                SELECT id, name, whatsapp_number FROM clients WHERE id = %s
+            """, (client_id,)).fetchone()
+        except Exception as e:
+            print(f"Erro ao buscar cliente selecionado: {e}")
+    
+    return render_template('financial/new_invoice.html',
+                          selected_client=selected_client,
+                          client_lookup_url=url_for('clients.lookup'))
+
+@financial_bp.route('/invoices/batch', methods=['GET', 'POST'])
+def batch_invoices():
+    """Faturamento em lote: CSV (client_id, amount, due_date[, description]) ou clientes selecionados"""
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    
+    current_user = get_current_user()
+    if not current_user.has_permission('edit_all'):
+        flash('Acesso negado.', 'error')
+        return redirect(url_for('dashboard.main'))
+    
+    job = None
+    if request.method == 'GET' and request.args.get('job', type=int):
+        # Volta da página de andamento: mostra o resultado do lote já processado
+        try:
+            job = get_job(request.args.get('job', type=int))
+            if job and job['kind'] != 'batch_invoices':
+                job = None
+        except Exception as e:
+            print(f"Erro ao consultar lote de faturas: {e}")
+    
+    if request.method == 'POST':
+        try:
+            csv_file = request.files.get('csv_file')
+            if csv_file and csv_file.filename:
+                rows = rows_from_csv(csv_file.read().decode('utf-8-sig', errors='replace'))
+            else:
+                client_ids = request.form.getlist('client_ids')
+                if len(client_ids) == 1:
+                    client_ids = client_ids[0]
+                rows = rows_from_selection(client_ids,
+                                           request.form.get('amount'),
+                                           request.form.get('due_date'),
+                                           request.form.get('description', ''))
+            
+            if not rows:
+                flash('Nenhuma fatura informada.', 'error')
+            else:
+                # Gravação e atualização dos agregados no worker; a página acompanha pelo job
+                job = enqueue_job('batch_invoices', {
+                    'rows': serialize_invoice_rows(rows),
+                    'skip_existing': not request.form.get('allow_duplicates')
+                }, current_user.id)
+                if job['status'] == 'done':
+                    result = job['result']
+                    if result['created']:
+                        flash(f"{result['created']} faturas criadas com sucesso!", 'success')
+                    if result['errors']:
+                        flash(f"{len(result['errors'])} linhas não foram importadas.", 'error')
+                elif job['status'] == 'failed':
+                    flash('Erro ao criar faturas em lote. Nenhuma fatura foi gravada.', 'error')
+                else:
+                    flash(f"Lote com {len(rows)} linhas enviado para processamento.", 'success')
+            
+        except ValueError as e:
+            flash(str(e), 'error')
+        except Exception as e:
+            print(f"Erro ao criar faturas em lote: {e}")
+            flash('Erro ao criar faturas em lote. Nenhuma fatura foi gravada.', 'error')
     
-    return render_template('financial/new_invoice.html', clients=clients)
+    return render_template('financial/batch_invoices.html',
+                          result=job['result'] if job and job['status'] == 'done' else None,
+                          job=job,
+                          job_url=url_for('jobs.status', job_id=job['id']) if job else None,
+                          job_done_url=url_for('financial.batch_invoices', job=job['id']) if job else None,
+                          client_lookup_url=url_for('clients.lookup'))
 
 @financial_bp.route('/pix', methods=['GET', 'POST'])
 def pix_settings():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    current_user = User.query.get(session['user_id'])
+    current_user = get_current_user()
     if not current_user.has_permission('edit_all'):
         flash('Acesso negado.', 'error')
         return redirect(url_for('dashboard.main'))
@@ -210,18 +295,18 @@ def pix_settings():
             pix_key = request.form['pix_key']
             
             # Verificar se configuração já existe
-            exists_result = db.session.execute("""
+            exists_result = execute_sql("""
                 SELECT id FROM settings WHERE name = 'pix_key'
             """)
             
             if exists_result.fetchone():
                 # Atualizar
-                db.session.execute("""
+                execute_sql("""
                     UPDATE settings SET value = %s WHERE name = 'pix_key'
                 """, (pix_key,))
             else:
                 # Inserir
-                db.session.execute("""
+                execute_sql("""
                     INSERT INTO settings (name, value) VALUES ('pix_key', %s)
                 """, (pix_key,))
             
@@ -234,7 +319,7 @@ def pix_settings():
     
     # Buscar configuração atual
     try:
-        pix_result = db.session.execute("""
+        pix_result = execute_sql("""
             SELECT value FROM settings WHERE name = 'pix_key'
         """)
         pix_key = pix_result.fetchone()
@@ -249,72 +334,99 @@ def reports():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    current_user = User.query.get(session['user_id'])
+    current_user = get_current_user()
     if not current_user.has_permission('view_reports'):
         flash('Acesso negado.', 'error')
         return redirect(url_for('dashboard.main'))
     
     # Período do relatório
     period = request.args.get('period', 'month')
+    start_date, end_date, previous_start, previous_end = report_period(
+        period, request.args.get('start'), request.args.get('end'))
     
-    # Definir datas com base no período
-    today = datetime.now().date()
-    if period == 'month':
-        start_date = datetime(today.year, today.month, 1).date()
-        if today.month == 12:
-            end_date = datetime(today.year + 1, 1, 1).date()
-        else:
-            end_date = datetime(today.year, today.month + 1, 1).date()
-    elif period == 'year':
-        start_date = datetime(today.year, 1, 1).date()
-        end_date = datetime(today.year + 1, 1, 1).date()
-    else:  # week
-        # Início da semana (segunda-feira)
-        start_date = today - timedelta(days=today.weekday())
-        # Fim da semana (domingo)
-        end_date = start_date + timedelta(days=7)
-    
+    # Um ano inteiro não roda mais na requisição: o worker calcula e pedidos iguais
+    # (mesmo período) entram no mesmo job ou reaproveitam o resultado guardado
     try:
-        # Faturamento no período
-        revenue_result = db.session.execute("""
-            SELECT SUM(amount) as total
-            FROM invoices 
-            WHERE status = 'paid'
-            AND due_date >= %s AND due_date < %s
-        """, (start_date, end_date))
-        revenue = revenue_result.fetchone()
-        revenue_total = float(revenue[0]) if revenue and revenue[0] else 0
-        
-        # Faturas por status no período
-        status_result = db.session.execute("""
-            SELECT status, COUNT(*) as count, SUM(amount) as total
-            FROM invoices 
-            WHERE due_date >= %s AND due_date < %s
-            GROUP BY status
-        """, (start_date, end_date))
-        status_stats = {row[0]: {'count': row[1], 'total': float(row[2])} for row in status_result}
-        
-        # Faturamento por dia no período
-        daily_result = db.session.execute("""
-            SELECT DATE(due_date) as day, SUM(amount) as total
-            FROM invoices 
-            WHERE status = 'paid'
-            AND due_date >= %s AND due_date < %s
-            GROUP BY DATE(due_date)
-            ORDER BY day
-        """, (start_date, end_date))
-        daily_revenue = {row[0].strftime('%Y-%m-%d'): float(row[1]) for row in daily_result}
-        
+        job = enqueue_job('financial_report', {
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'previous_start': previous_start.isoformat(),
+            'previous_end': previous_end.isoformat()
+        }, current_user.id)
     except Exception as e:
-        print(f"Erro ao gerar relatório financeiro: {e}")
-        revenue_total = 0
-        status_stats = {}
-        daily_revenue = {}
+        print(f"Erro ao enfileirar relatório financeiro: {e}")
+        job = None
+    
+    if job and job['status'] == 'done':
+        report = job['result']['report']
+        previous = job['result']['previous']
+        report_version = job['result']['report_version']
+    else:
+        report = {'revenue_total': 0, 'status_stats': {}, 'daily_revenue': {}}
+        previous = {'revenue_total': 0, 'status_stats': {}, 'daily_revenue': {}}
+        report_version = None
+    
+    if request.accept_mimetypes.best == 'application/json':
+        if job is None:
+            return jsonify({'error': 'Erro ao gerar relatório financeiro.'}), 500
+        return jsonify(job_to_dict(job)), 200 if job['status'] == 'done' else 202
+    
+    # Variação em relação ao período anterior (None quando não havia receita para comparar)
+    if previous['revenue_total']:
+        revenue_change = (report['revenue_total'] - previous['revenue_total']) / previous['revenue_total'] * 100
+    else:
+        revenue_change = None
     
-    return render_template('financial/reports.html',
+    response = make_response(render_template('financial/reports.html',
                           period=period,
                           start_date=start_date,
                           end_date=end_date,
-                          revenue_total=revenue_total,
-                          status_stats=status_stats,
-                          daily_revenue=daily_revenue)
+                          revenue_total=report['revenue_total'],
+                          status_stats=report['status_stats'],
+                          daily_revenue=report['daily_revenue'],
+                          previous_start=previous_start,
+                          previous_end=previous_end,
+                          previous_revenue_total=previous['revenue_total'],
+                          previous_status_stats=previous['status_stats'],
+                          revenue_change=revenue_change,
+                          report_version=report_version,
+                          job=job,
+                          job_url=url_for('jobs.status', job_id=job['id']) if job else None))
+    if not job or job['status'] != 'done':
+        # Página de "processando": não pode ser guardada, o resultado chega no próximo carregamento
+        response.headers['Cache-Control'] = 'no-store'
+    return response
+
+def report_period(period, start=None, end=None):
+    """Datas [início, fim) do período e do período anterior equivalente.
+
+    period: week, month, year ou custom (start/end em AAAA-MM-DD, fim inclusivo). O período
+    anterior é a semana/mês/ano anterior ou, no custom, o intervalo de mesmo tamanho logo antes.
+    """
+    today = datetime.now().date()
+    
+    if period == 'custom':
+        try:
+            start_date = datetime.strptime(start, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end, '%Y-%m-%d').date() + timedelta(days=1)
+            if end_date > start_date:
+                length = end_date - start_date
+                return start_date, end_date, start_date - length, start_date
+        except (TypeError, ValueError):
+            pass
+        period = 'month'
+    
+    if period == 'year':
+        start_date = date(today.year, 1, 1)
+        return start_date, date(today.year + 1, 1, 1), date(today.year - 1, 1, 1), start_date
+    
+    if period == 'week':
+        # Semana de segunda a domingo
+        start_date = today - timedelta(days=today.weekday())
+        return start_date, start_date + timedelta(days=7), start_date - timedelta(days=7), start_date
+    
+    # month
+    start_date = date(today.year, today.month, 1)
+    end_date = date(today.year + 1, 1, 1) if today.month == 12 else date(today.year, today.month + 1, 1)
+    previous_start = date(today.year - 1, 12, 1) if today.month == 1 else date(today.year, today.month - 1, 1)
+    return start_date, end_date, previous_start, start_date
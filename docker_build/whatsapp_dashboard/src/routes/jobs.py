@@ -0,0 +1,31 @@
+from flask import Blueprint, session, jsonify
+from src.models.identity import get_current_user
+from src.models.jobs import JOB_TYPES, get_job, job_to_dict
+import src.models.report_jobs  # registra os tipos de job
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/<int:job_id>')
+def status(job_id):
+    """Andamento do job (consultado pela página a cada poucos segundos) e o resultado quando concluído"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Não autenticado.'}), 401
+
+    try:
+        job = get_job(job_id)
+    except Exception as e:
+        print(f"Erro ao consultar job {job_id}: {e}")
+        return jsonify({'error': 'Erro ao consultar o job.'}), 500
+
+    if job is None:
+        return jsonify({'error': 'Job não encontrado.'}), 404
+
+    # Resultados são compartilhados entre pedidos iguais: o acesso segue a permissão do tipo de job
+    current_user = get_current_user()
+    job_type = JOB_TYPES.get(job['kind'])
+    if job_type is None or not current_user.has_permission(job_type['permission']):
+        return jsonify({'error': 'Acesso negado.'}), 403
+
+    response = jsonify(job_to_dict(job))
+    response.headers['Cache-Control'] = 'no-store'
+    return response
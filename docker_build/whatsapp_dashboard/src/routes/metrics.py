@@ -0,0 +1,186 @@
+import os
+import re
+import time
+import logging
+import threading
+from flask import Blueprint, Response, request, g, has_request_context, current_app, abort
+from flask import before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from prometheus_client import (Histogram, Counter, Gauge, CollectorRegistry, generate_latest,
+                               CONTENT_TYPE_LATEST, REGISTRY)
+
+metrics_bp = Blueprint('metrics', __name__)
+
+slow_query_logger = logging.getLogger('dashboard.slow_query')
+
+# Limite padrão (ms) para registrar uma consulta no log de consultas lentas - sobrescrito por SLOW_QUERY_MS
+DEFAULT_SLOW_QUERY_MS = 500
+
+REQUEST_SECONDS = Histogram(
+    'dashboard_request_duration_seconds', 'Tempo total da requisição',
+    ['endpoint', 'method'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+REQUEST_QUERIES = Histogram(
+    'dashboard_request_queries', 'Consultas SQL por requisição',
+    ['endpoint'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 20, 30, 50, 100))
+REQUEST_DB_SECONDS = Histogram(
+    'dashboard_request_db_seconds', 'Tempo total no banco por requisição',
+    ['endpoint'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+REQUEST_SLOWEST_QUERY_SECONDS = Histogram(
+    'dashboard_request_slowest_query_seconds', 'Consulta mais lenta de cada requisição',
+    ['endpoint'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+# Texto da consulta mais lenta de cada rota. Literais e listas de IN viram "?", então o número de
+# valores do rótulo fica limitado às consultas escritas no código; "max" agrega entre os workers
+SLOWEST_STATEMENT_SECONDS = Gauge(
+    'dashboard_slowest_statement_seconds', 'Maior duração de cada consulta que foi a mais lenta da requisição',
+    ['endpoint', 'statement'],
+    multiprocess_mode='max')
+REQUEST_ROWS = Histogram(
+    'dashboard_request_rows_fetched', 'Linhas retornadas pelo banco por requisição',
+    ['endpoint'],
+    buckets=(0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000))
+TEMPLATE_SECONDS = Histogram(
+    'dashboard_template_render_seconds', 'Tempo de renderização de templates por requisição',
+    ['endpoint'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1))
+DB_ERRORS = Counter(
+    'dashboard_db_errors_total', 'Erros de banco (inclusive os tratados pelas rotas)',
+    ['endpoint'])
+
+# Tamanho máximo do texto da consulta no rótulo
+STATEMENT_LABEL_CHARS = 200
+
+# Cursor sem buffer (SSCursor das exportações em streaming) ainda não sabe quantas linhas virão e
+# informa -1 como inteiro sem sinal: essas consultas ficam fora da contagem de linhas
+UNKNOWN_ROWCOUNT = 2 ** 64 - 1
+
+_listeners_installed = False
+_slowest_seen = {}
+_slowest_lock = threading.Lock()
+
+def normalize_statement(statement):
+    """SQL sem literais nem tamanho de listas (forma estável para usar como rótulo)"""
+    statement = ' '.join(statement.split())
+    statement = re.sub(r"'(?:[^'\\]|\\.|'')*'", '?', statement)
+    statement = re.sub(r'\b\d+(?:\.\d+)?\b', '?', statement)
+    statement = statement.replace('%s', '?')
+    statement = re.sub(r'\?(?:\s*,\s*\?)+', '?, ...', statement)
+    # VALUES com várias linhas: (?, ...), (?, ...) -> (?, ...), ...
+    statement = re.sub(r'(\((?:[^()]|\([^()]*\))*\))(?:\s*,\s*\1)+', r'\1, ...', statement)
+    return statement[:STATEMENT_LABEL_CHARS]
+
+def _record_slowest_statement(endpoint, statement, seconds):
+    """Atualiza o gauge só quando a duração supera a maior já vista neste processo"""
+    key = (endpoint, normalize_statement(statement))
+    with _slowest_lock:
+        if seconds <= _slowest_seen.get(key, 0):
+            return
+        _slowest_seen[key] = seconds
+    SLOWEST_STATEMENT_SECONDS.labels(endpoint=endpoint, statement=key[1]).set(seconds)
+
+def _request_stats():
+    """Acumulador da requisição atual (None fora de requisições, ex.: comandos de linha)"""
+    if not has_request_context():
+        return None
+    return g.get('_sql_stats')
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    stats = _request_stats()
+
+    if stats is not None:
+        stats['queries'] += 1
+        stats['db_time'] += elapsed
+        rowcount = cursor.rowcount
+        if rowcount and 0 < rowcount < UNKNOWN_ROWCOUNT and cursor.description is not None:
+            stats['rows'] += rowcount
+        if elapsed > stats['slowest']:
+            stats['slowest'] = elapsed
+            stats['slowest_statement'] = statement
+
+    threshold = stats['slow_ms'] if stats is not None else DEFAULT_SLOW_QUERY_MS
+    if elapsed * 1000 >= threshold:
+        endpoint = request.endpoint if has_request_context() else 'cli'
+        slow_query_logger.warning("Consulta lenta (%.0f ms) em %s: %s",
+                                  elapsed * 1000, endpoint, ' '.join(statement.split()))
+
+def _handle_error(exception_context):
+    endpoint = (request.endpoint or 'unknown') if has_request_context() else 'cli'
+    DB_ERRORS.labels(endpoint=endpoint).inc()
+
+def _before_render(sender, template, context, **extra):
+    g._render_start = time.perf_counter()
+
+def _after_render(sender, template, context, **extra):
+    start = g.pop('_render_start', None)
+    stats = _request_stats()
+    if start is not None and stats is not None:
+        stats['render_time'] += time.perf_counter() - start
+
+def init_metrics(app):
+    """Instala os hooks do engine SQLAlchemy e do ciclo de requisição"""
+    global _listeners_installed
+
+    if not _listeners_installed:
+        # Listeners no nível da classe Engine: valem para qualquer engine criado pelo Flask-SQLAlchemy
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        _listeners_installed = True
+
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    @app.before_request
+    def start_request_metrics():
+        g._sql_stats = {
+            'start': time.perf_counter(),
+            'queries': 0,
+            'db_time': 0.0,
+            'slowest': 0.0,
+            'slowest_statement': None,
+            'rows': 0,
+            'render_time': 0.0,
+            'slow_ms': app.config.get('SLOW_QUERY_MS', DEFAULT_SLOW_QUERY_MS)
+        }
+
+    @app.teardown_request
+    def finish_request_metrics(exception=None):
+        stats = g.pop('_sql_stats', None)
+        if stats is None or request.endpoint in (None, 'metrics.metrics', 'static'):
+            return
+
+        endpoint = request.endpoint
+        REQUEST_SECONDS.labels(endpoint=endpoint, method=request.method).observe(
+            time.perf_counter() - stats['start'])
+        REQUEST_QUERIES.labels(endpoint=endpoint).observe(stats['queries'])
+        REQUEST_DB_SECONDS.labels(endpoint=endpoint).observe(stats['db_time'])
+        REQUEST_SLOWEST_QUERY_SECONDS.labels(endpoint=endpoint).observe(stats['slowest'])
+        if stats['slowest_statement']:
+            _record_slowest_statement(endpoint, stats['slowest_statement'], stats['slowest'])
+        REQUEST_ROWS.labels(endpoint=endpoint).observe(stats['rows'])
+        TEMPLATE_SECONDS.labels(endpoint=endpoint).observe(stats['render_time'])
+
+@metrics_bp.route('/metrics')
+def metrics():
+    # Token opcional para expor /metrics apenas ao coletor
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        abort(403)
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        # Vários workers do gunicorn: agrega os arquivos de todos os processos
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
@@ -1,109 +1,138 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
 from src.models.user import User
-from src.models.database import db
+from src.models.identity import get_current_user
+from src.models.database import db, execute_sql
+from src.models.search import search_filter
+from src.models.pagination import paginate_keyset, count_rows, estimate_table_rows
+from src.models.stats_service import invalidate_overview
+from src.models.client_360 import invalidate_client_360
+from src.models.technician_rollup import refresh_technician_rollup
+from src.models.export import csv_response, export_query
+from src.models.order_bulk import (parse_order_ids, bulk_update_orders, ORDERS_FROM, ORDER_LIST_QUERY,
+                                   ORDER_LIST_SORT)
+from src.models.geocoding import lookup_coordinates
+from src.models.dispatch import suggest_technicians, invalidate_technician_index
+from src.models.photos import (get_photo, get_order_photos, can_view_order_photos, resolve_photo_path,
+                               send_photo, send_thumbnail, prefetch_thumbnails, parse_thumbnail_size,
+                               DEFAULT_THUMBNAIL_SIZE)
+from src.models.conditional import conditional_get
 from datetime import datetime, timedelta
 
 service_orders_bp = Blueprint('service_orders', __name__)
 
+def _order_filters(current_user, status, search):
+    """Filtros da lista de ordens (compartilhados com a exportação)"""
+    where_clauses = []
+    params = []
+    
+    if status != 'all':
+        where_clauses.append("so.status = %s")
+        params.append(status)
+    
+    # Se for técnico, mostrar apenas suas ordens (id do técnico vem da identidade da sessão)
+    if current_user.role == 'technician' and current_user.technician_id:
+        where_clauses.append("so.technician_id = %s")
+        params.append(current_user.technician_id)
+    
+    if search:
+        # Busca indexada no cliente (nome/endereço/telefone) ou no técnico
+        search_sql, search_params = search_filter(search, [('so.client_id', 'clients'), ('so.technician_id', 'technicians')])
+        if search_sql:
+            where_clauses.append(search_sql)
+            params.extend(search_params)
+    
+    return where_clauses, params
+
 @service_orders_bp.route('/')
+@conditional_get('service_orders', 'clients', 'technicians')
 def list():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    current_user = User.query.get(session['user_id'])
+    current_user = get_current_user()
     if not current_user.has_permission('view_orders'):
         flash('Acesso negado.', 'error')
         return redirect(url_for('dashboard.main'))
     
     # Filtros
     status = request.args.get('status', 'all')
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
+    direction = request.args.get('dir', 'next')
     search = request.args.get('search', '')
     
     try:
-        # Construir query base
-        query = """
-            SELECT so.id, so.status, so.created_at, so.completed_at, 
-                   c.name as client_name, c.address as client_address,
-                   t.name as technician_name
-            FROM service_orders so
-            JOIN clients c ON so.client_id = c.id
-            LEFT JOIN technicians t ON so.technician_id = t.id
-        """
-        
-        # Adicionar filtros
-        where_clauses = []
-        params = []
-        
-        if status != 'all':
-            where_clauses.append("so.status = %s")
-            params.append(status)
-        
-        # Se for técnico, mostrar apenas suas ordens
-        if current_user.role == 'technician':
-            technician_result = db.session.execute("""
-                SELECT id FROM technicians WHERE whatsapp_number = %s
-            """, (current_user.username,))
-            technician = technician_result.fetchone()
-            
-            if technician:
-                where_clauses.append("so.technician_id = %s")
-                params.append(technician[0])
-        
-        if search:
-            where_clauses.append("(c.name LIKE %s OR c.address LIKE %s OR t.name LIKE %s)")
-            params.extend([f'%{search}%', f'%{search}%', f'%{search}%'])
+        where_clauses, params = _order_filters(current_user, status, search)
         
-        if where_clauses:
-            query += " WHERE " + " AND ".join(where_clauses)
+        # Total exato sob demanda (a página carrega via ?count=1 quando há filtro)
+        if request.args.get('count'):
+            return jsonify({'total': count_rows(ORDERS_FROM, where_clauses, params)})
         
-        # Adicionar ordenação e paginação
-        query += " ORDER BY so.created_at DESC LIMIT %s OFFSET %s"
-        params.extend([20, (page-1)*20])
-        
-        # Executar query
-        result = db.session.execute(query, params)
-        orders = result.fetchall()
-        
-        # Contar total para paginação
-        count_query = """
-            SELECT COUNT(*) 
-            FROM service_orders so
-            JOIN clients c ON so.client_id = c.id
-            LEFT JOIN technicians t ON so.technician_id = t.id
-        """
+        # Paginação por cursor (created_at + id)
+        result = paginate_keyset(ORDER_LIST_QUERY, where_clauses, params,
+                                 cursor=cursor, direction=direction, **ORDER_LIST_SORT)
         
-        if where_clauses:
-            count_query += " WHERE " + " AND ".join(where_clauses)
+        orders = result.rows
+        next_cursor = result.next_cursor
+        prev_cursor = result.prev_cursor
         
-        count_result = db.session.execute(count_query, params[:-2] if params else [])
-        total = count_result.fetchone()[0]
+        # Sem filtro o total vem das estatísticas da tabela (estimado); com filtro é carregado depois
+        total = None if where_clauses else estimate_table_rows('service_orders')
         
     except Exception as e:
         print(f"Erro ao buscar ordens de serviço: {e}")
+        if request.args.get('count'):
+            return jsonify({'total': None})
         orders = []
+        next_cursor = prev_cursor = None
+        where_clauses = []
         total = 0
     
     return render_template('service_orders/list.html',
                           orders=orders,
                           status=status,
-                          page=page,
+                          next_cursor=next_cursor,
+                          prev_cursor=prev_cursor,
                           total=total,
+                          total_is_estimate=not where_clauses,
                           search=search)
 
+@service_orders_bp.route('/export')
+def export():
+    """Exporta em CSV (streaming) as ordens com os mesmos filtros da lista"""
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    
+    current_user = get_current_user()
+    if not current_user.has_permission('view_orders'):
+        flash('Acesso negado.', 'error')
+        return redirect(url_for('dashboard.main'))
+    
+    where_clauses, params = _order_filters(current_user, request.args.get('status', 'all'),
+                                           request.args.get('search', ''))
+    sql = export_query("""
+        SELECT so.id, so.status, so.created_at, so.completed_at,
+               c.name, c.whatsapp_number, c.address, t.name, so.notes
+    """, ORDERS_FROM, where_clauses, "so.created_at DESC, so.id DESC")
+    
+    return csv_response('ordens',
+                        ['ID', 'Status', 'Criada em', 'Concluída em', 'Cliente', 'WhatsApp',
+                         'Endereço', 'Técnico', 'Observações'],
+                        sql, params)
+
 @service_orders_bp.route('/<int:order_id>')
+@conditional_get('service_orders', 'clients', 'technicians', 'service_photos')
 def detail(order_id):
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    current_user = User.query.get(session['user_id'])
+    current_user = get_current_user()
     if not current_user.has_permission('view_orders'):
         flash('Acesso negado.', 'error')
         return redirect(url_for('dashboard.main'))
     
     try:
         # Buscar dados da ordem de serviço
-        result = db.session.execute("""
+        result = execute_sql("""
             SELECT so.id, so.status, so.created_at, so.completed_at, so.notes,
                    c.id as client_id, c.name as client_name, c.whatsapp_number as client_whatsapp,
                    c.address as client_address,
@@ -123,30 +152,30 @@ def detail(order_id):
         
         # Verificar permissão para técnico
         if current_user.role == 'technician':
-            technician_result = db.session.execute("""
-                SELECT id FROM technicians WHERE whatsapp_number = %s
-            """, (current_user.username,))
-            technician = technician_result.fetchone()
-            
-            if technician and technician[0] != order.technician_id:
+            if current_user.technician_id and current_user.technician_id != order.technician_id:
                 flash('Acesso negado. Esta ordem não está atribuída a você.', 'error')
                 return redirect(url_for('service_orders.list'))
         
-        # Buscar fotos da ordem de serviço
-        photos_result = db.session.execute("""
-            SELECT id, type, photo_url, created_at
+        # Buscar fotos da ordem de serviço (colunas gravadas pelo bot: photo_type, photo_path)
+        photos_result = execute_sql("""
+            SELECT id, photo_type as type, photo_path, created_at
             FROM service_photos
             WHERE service_order_id = %s
             ORDER BY created_at
         """, (order_id,))
-        photos = photos_result.fetchall()
+        photos = [dict(row._mapping) for row in photos_result]
+        
+        # A galeria usa miniaturas (já enfileiradas aqui); o original só ao abrir a foto
+        prefetch_thumbnails([photo['photo_path'] for photo in photos], DEFAULT_THUMBNAIL_SIZE)
         
         # Agrupar fotos por tipo
         photos_by_type = {}
         for photo in photos:
-            if photo.type not in photos_by_type:
-                photos_by_type[photo.type] = []
-            photos_by_type[photo.type].append(photo)
+            photo['photo_url'] = url_for('service_orders.photo', photo_id=photo['id'])
+            photo['thumbnail_url'] = url_for('service_orders.photo_thumbnail', photo_id=photo['id'])
+            if photo['type'] not in photos_by_type:
+                photos_by_type[photo['type']] = []
+            photos_by_type[photo['type']].append(photo)
         
     except Exception as e:
         print(f"Erro ao buscar detalhes da ordem de serviço: {e}")
@@ -157,12 +186,77 @@ def detail(order_id):
                           order=order,
                           photos_by_type=photos_by_type)
 
+def _photo_file(photo_id):
+    """Arquivo da foto se o usuário pode ver a ordem; senão a resposta de erro"""
+    current_user = get_current_user()
+    photo = get_photo(photo_id)
+    if not photo:
+        return None, ('Foto não encontrada.', 404)
+    if not can_view_order_photos(current_user, photo.technician_id):
+        return None, ('Acesso negado.', 403)
+    
+    path = resolve_photo_path(photo.photo_path)
+    if not path:
+        return None, ('Arquivo da foto não encontrado.', 404)
+    return path, None
+
+@service_orders_bp.route('/photos/<int:photo_id>')
+def photo(photo_id):
+    """Foto original com ETag/304 e Range (envio direto do arquivo)"""
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    
+    path, error = _photo_file(photo_id)
+    if error:
+        return error
+    return send_photo(path)
+
+@service_orders_bp.route('/photos/<int:photo_id>/thumbnail')
+def photo_thumbnail(photo_id):
+    """Miniatura (?size=160|320|640) gerada sob demanda e guardada em disco pelo hash do conteúdo"""
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    
+    path, error = _photo_file(photo_id)
+    if error:
+        return error
+    return send_thumbnail(path, parse_thumbnail_size(request.args.get('size', type=int)))
+
+@service_orders_bp.route('/<int:order_id>/photos/prefetch', methods=['POST'])
+def prefetch_photos(order_id):
+    """Gera em segundo plano as miniaturas da galeria da ordem; retorna as URLs"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Não autenticado.'}), 401
+    
+    current_user = get_current_user()
+    try:
+        order = execute_sql("""
+            SELECT id, technician_id FROM service_orders WHERE id = %s
+        """, (order_id,)).fetchone()
+        if not order:
+            return jsonify({'error': 'Ordem de serviço não encontrada.'}), 404
+        if not can_view_order_photos(current_user, order.technician_id):
+            return jsonify({'error': 'Acesso negado.'}), 403
+        
+        size = parse_thumbnail_size(request.args.get('size', type=int))
+        photos = get_order_photos(order_id)
+        queued = prefetch_thumbnails([photo.photo_path for photo in photos], size)
+    except Exception as e:
+        print(f"Erro ao preparar miniaturas: {e}")
+        return jsonify({'error': 'Erro ao preparar miniaturas.'}), 500
+    
+    return jsonify({
+        'queued': queued,
+        'thumbnails': {photo.id: url_for('service_orders.photo_thumbnail', photo_id=photo.id, size=size)
+                       for photo in photos}
+    })
+
 @service_orders_bp.route('/new', methods=['GET', 'POST'])
 def new():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    current_user = User.query.get(session['user_id'])
+    current_user = get_current_user()
     if not current_user.has_permission('edit_orders'):
         flash('Acesso negado.', 'error')
         return redirect(url_for('dashboard.main'))
@@ -174,7 +268,7 @@ def new():
             notes = request.form.get('notes', '')
             
             # Validar cliente
-            client_result = db.session.execute("""
+            client_result = execute_sql("""
                 SELECT id FROM clients WHERE id = %s
             """, (client_id,))
             
@@ -184,7 +278,7 @@ def new():
             
             # Validar técnico se fornecido
             if technician_id:
-                technician_result = db.session.execute("""
+                technician_result = execute_sql("""
                     SELECT id FROM technicians WHERE id = %s
                 """, (technician_id,))
                 
@@ -194,19 +288,22 @@ def new():
             
             # Inserir ordem de serviço
             if technician_id:
-                db.session.execute("""
+                execute_sql("""
                     INSERT INTO service_orders 
                     (client_id, technician_id, status, notes, created_at)
                     VALUES (%s, %s, 'assigned', %s, NOW())
                 """, (client_id, technician_id, notes))
             else:
-                db.session.execute("""
+                execute_sql("""
                     INSERT INTO service_orders 
                     (client_id, status, notes, created_at)
                     VALUES (%s, 'pending', %s, NOW())
                 """, (client_id, notes))
             
             db.session.commit()
+            invalidate_overview()
+            invalidate_client_360(client_id)
+            invalidate_technician_index()
             flash('Ordem de serviço criada com sucesso!', 'success')
             return redirect(url_for('service_orders.list'))
             
@@ -214,45 +311,79 @@ def new():
             print(f"Erro ao criar ordem de serviço: {e}")
             flash('Erro ao criar ordem de serviço.', 'error')
     
-    # Buscar clientes e técnicos para o formulário
+    # Cliente e técnico são escolhidos pelo autocompletar (clients.lookup / technicians.lookup);
+    # aqui só os já selecionados (ex.: formulário reexibido ou aberto a partir do cliente)
+    selected_client = None
+    selected_technician = None
+    client_id = request.values.get('client_id', type=int)
+    technician_id = request.values.get('technician_id', type=int)
     try:
-        clients_result = db.session.execute("""
-            SELECT id, name, whatsapp_number, address FROM clients ORDER BY name
-        """)
-        clients = clients_result.fetchall()
-        
-        technicians_result = db.session.execute("""
-            SELECT id, name, status FROM technicians 
-            WHERE status = 'available' OR status = 'busy'
-            ORDER BY name
-        """)
-        technicians = technicians_result.fetchall()
+        if client_id:
+            selected_client = execute_sql("""
+                SELECT id, name, whatsapp_number, address FROM clients WHERE id = %s
+            """, (client_id,)).fetchone()
+        if technician_id:
+            selected_technician = execute_sql("""
+                SELECT id, name, status FROM technicians WHERE id = %s
+            """, (technician_id,)).fetchone()
     except Exception as e:
         print(f"Erro ao buscar dados para formulário: {e}")
-        clients = []
-        technicians = []
     
     return render_template('service_orders/new.html', 
-                          clients=clients,
-                          technicians=technicians)
+                          selected_client=selected_client,
+                          selected_technician=selected_technician,
+                          client_lookup_url=url_for('clients.lookup'),
+                          technician_lookup_url=url_for('technicians.lookup'),
+                          suggest_url=url_for('service_orders.suggest'))
+
+@service_orders_bp.route('/suggest-technicians')
+def suggest():
+    """Técnicos mais próximos do endereço do cliente (?client_id=), ponderados pela carga atual"""
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    
+    current_user = get_current_user()
+    if not (current_user.has_permission('edit_all') or current_user.has_permission('edit_orders')):
+        return jsonify({'error': 'Acesso negado.'}), 403
+    
+    client_id = request.args.get('client_id', type=int)
+    limit = max(1, min(request.args.get('limit', 5, type=int), 20))
+    if not client_id:
+        return jsonify({'error': 'Informe o cliente.'}), 400
+    
+    try:
+        client = execute_sql("""
+            SELECT id, address FROM clients WHERE id = %s
+        """, (client_id,)).fetchone()
+        if not client:
+            return jsonify({'error': 'Cliente não encontrado.'}), 404
+        
+        # Endereço ainda não geocodificado: entra na fila e a tela usa o autocompletar comum
+        coords = lookup_coordinates([client.address]).get(client.address)
+        if not coords:
+            return jsonify({'located': False, 'results': []})
+        
+        results = suggest_technicians(coords[0], coords[1], limit)
+    except Exception as e:
+        print(f"Erro ao sugerir técnicos: {e}")
+        return jsonify({'error': 'Erro ao sugerir técnicos.'}), 500
+    
+    return jsonify({'located': True, 'results': results})
 
 @service_orders_bp.route('/<int:order_id>/update', methods=['POST'])
 def update(order_id):
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    current_user = User.query.get(session['user_id'])
+    current_user = get_current_user()
     
     # Verificar permissão
     if current_user.role == 'technician':
-        technician_result = db.session.execute("""
-            SELECT t.id 
-            FROM technicians t
-            JOIN service_orders so ON t.id = so.technician_id
-            WHERE t.whatsapp_number = %s AND so.id = %s
-        """, (current_user.username, order_id))
+        order_result = execute_sql("""
+            SELECT id FROM service_orders WHERE id = %s AND technician_id = %s
+        """, (order_id, current_user.technician_id))
         
-        if not technician_result.fetchone():
+        if not current_user.technician_id or not order_result.fetchone():
             flash('Acesso negado. Esta ordem não está atribuída a você.', 'error')
             return redirect(url_for('service_orders.list'))
     elif not current_user.has_permission('edit_orders'):
@@ -289,39 +420,129 @@ def update(order_id):
                 query = f"UPDATE service_orders SET {', '.join(update_fields)} WHERE id = %s"
                 params.append(order_id)
                 
-                db.session.execute(query, params)
+                execute_sql(query, params)
+                # A ordem aparece na visão consolidada do cliente
+                client_row = execute_sql(
+                    "SELECT client_id FROM service_orders WHERE id = %s", (order_id,)
+                ).fetchone()
                 db.session.commit()
-                
-                flash('Ordem de serviço atualizada com sucesso!', 'success')
             
         except Exception as e:
             print(f"Erro ao atualizar ordem de serviço: {e}")
             flash('Erro ao atualizar ordem de serviço.', 'error')
+        else:
+            if update_fields:
+                # A ordem já está gravada: falhas daqui em diante não podem virar "Erro ao atualizar"
+                invalidate_overview()
+                if client_row:
+                    invalidate_client_360(client_row[0])
+                
+                # Mudança de status/técnico entra no desempenho e nas sugestões sem esperar o intervalo
+                try:
+                    refresh_technician_rollup(force=True)
+                except Exception as e:
+                    # A marca d'água não avançou: a próxima atualização incremental inclui esta ordem
+                    db.session.rollback()
+                    print(f"Erro ao atualizar o desempenho dos técnicos: {e}")
+                invalidate_technician_index()
+                
+                flash('Ordem de serviço atualizada com sucesso!', 'success')
     
     return redirect(url_for('service_orders.detail', order_id=order_id))
 
+@service_orders_bp.route('/bulk-update', methods=['POST'])
+def bulk_update():
+    """Muda status e/ou técnico de várias ordens da lista (order_ids) de uma vez.
+
+    Responde JSON com o resultado de cada id quando chamado via fetch (Accept: application/json);
+    pelo formulário, resume o resultado em mensagens e volta para a lista.
+    """
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    
+    current_user = get_current_user()
+    wants_json = request.accept_mimetypes.best == 'application/json' or request.is_json
+    data = (request.get_json(silent=True) or {}) if request.is_json else request.form
+    
+    # Mesmas regras de update: técnico altera as próprias ordens, demais perfis precisam de edit_orders
+    if current_user.role != 'technician' and not current_user.has_permission('edit_orders'):
+        if wants_json:
+            return jsonify({'error': 'Acesso negado.'}), 403
+        flash('Acesso negado.', 'error')
+        return redirect(url_for('dashboard.main'))
+    
+    if request.is_json:
+        order_ids = parse_order_ids([str(value) for value in data.get('order_ids', [])])
+    else:
+        order_ids = parse_order_ids(request.form.getlist('order_ids'))
+    status = data.get('status') or None
+    technician_id = data.get('technician_id') or None
+    
+    try:
+        if not order_ids:
+            raise ValueError('Nenhuma ordem selecionada.')
+        
+        results, client_ids = bulk_update_orders(current_user, order_ids,
+                                                 status=status, technician_id=technician_id)
+        
+    except ValueError as e:
+        if wants_json:
+            return jsonify({'error': str(e)}), 400
+        flash(str(e), 'error')
+        return redirect(url_for('service_orders.list'))
+    except Exception as e:
+        print(f"Erro ao atualizar ordens em lote: {e}")
+        if wants_json:
+            return jsonify({'error': 'Erro ao atualizar ordens. Nenhuma ordem foi alterada.'}), 500
+        flash('Erro ao atualizar ordens. Nenhuma ordem foi alterada.', 'error')
+        return redirect(url_for('service_orders.list'))
+    
+    if client_ids:
+        # As ordens já estão gravadas: falhas daqui em diante não podem virar "Nenhuma ordem foi alterada"
+        invalidate_overview()
+        invalidate_client_360(*client_ids)
+        try:
+            refresh_technician_rollup(force=True)
+        except Exception as e:
+            # A marca d'água não avançou: a próxima atualização incremental inclui estas ordens
+            db.session.rollback()
+            print(f"Erro ao atualizar o desempenho dos técnicos: {e}")
+        invalidate_technician_index()
+    
+    updated = sum(1 for result in results if result['ok'])
+    failed = [result for result in results if not result['ok']]
+    if wants_json:
+        return jsonify({'updated': updated, 'failed': len(failed), 'results': results})
+    
+    if updated:
+        flash(f"{updated} ordens de serviço atualizadas com sucesso!", 'success')
+    if failed:
+        flash(f"{len(failed)} ordens não foram alteradas: " +
+              ', '.join(f"#{result['id']} ({result['message']})" for result in failed[:20]), 'error')
+    return redirect(url_for('service_orders.list'))
+
 @service_orders_bp.route('/map')
 def map_view():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    current_user = User.query.get(session['user_id'])
+    current_user = get_current_user()
     if not current_user.has_permission('view_all'):
         flash('Acesso negado.', 'error')
         return redirect(url_for('dashboard.main'))
     
     try:
-        # Buscar técnicos ativos com localização
-        technicians_result = db.session.execute("""
-            SELECT id, name, status, last_location, last_active
+        # Buscar técnicos ativos com localização (o bot grava current_location em texto livre)
+        technicians_result = execute_sql("""
+            SELECT id, name, status, COALESCE(current_location, last_location) as last_location, last_active
             FROM technicians 
-            WHERE status != 'offline' AND last_location IS NOT NULL
+            WHERE status != 'offline' AND (current_location IS NOT NULL OR last_location IS NOT NULL)
             ORDER BY name
         """)
-        technicians = technicians_result.fetchall()
+        technicians = [dict(row._mapping) for row in technicians_result]
         
         # Buscar ordens de serviço ativas
-        orders_result = db.session.execute("""
+        orders_result = execute_sql("""
             SELECT so.id, so.status, c.address, t.name as technician_name
             FROM service_orders so
             JOIN clients c ON so.client_id = c.id
@@ -329,13 +550,25 @@ def map_view():
             WHERE so.status IN ('assigned', 'en_route', 'arrived')
             ORDER BY so.created_at
         """)
-        orders = orders_result.fetchall()
+        orders = [dict(row._mapping) for row in orders_result]
+        
+        # Coordenadas do cache de geocodificação (uma consulta); endereços novos são resolvidos
+        # em segundo plano e aparecem no mapa na próxima abertura
+        coordinates = lookup_coordinates([tech['last_location'] for tech in technicians] +
+                                         [order['address'] for order in orders])
+        for tech in technicians:
+            tech['latitude'], tech['longitude'] = coordinates.get(tech['last_location']) or (None, None)
+        for order in orders:
+            order['latitude'], order['longitude'] = coordinates.get(order['address']) or (None, None)
+        missing_locations = sum(1 for coords in coordinates.values() if coords is None)
         
     except Exception as e:
         print(f"Erro ao buscar dados para mapa: {e}")
         technicians = []
         orders = []
+        missing_locations = 0
     
     return render_template('service_orders/map.html',
                           technicians=technicians,
-                          orders=orders)
+                          orders=orders,
+                          missing_locations=missing_locations)
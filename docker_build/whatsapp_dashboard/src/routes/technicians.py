@@ -1,78 +1,104 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify, make_response
 from src.models.user import User
-from src.models.database import db
-from datetime import datetime
+from src.models.identity import get_current_user
+from src.models.database import db, execute_sql
+from src.models.pagination import paginate_keyset, count_rows
+from src.models.search import typeahead, TYPEAHEAD_LIMIT
+from src.models.technician_rollup import (refresh_technician_rollup, technician_performance, empty_performance,
+                                          technician_rollup_version)
+from src.models.jobs import enqueue_job, job_to_dict
+from src.models.conditional import conditional_get
+from datetime import datetime, timedelta
 
 technicians_bp = Blueprint('technicians', __name__)
 
 @technicians_bp.route('/')
+@conditional_get('technicians')
 def list():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    current_user = User.query.get(session['user_id'])
+    current_user = get_current_user()
     if not current_user.has_permission('view_all'):
         flash('Acesso negado.', 'error')
         return redirect(url_for('dashboard.main'))
     
-    # Buscar técnicos com paginação
-    page = request.args.get('page', 1, type=int)
+    # Buscar técnicos com paginação por cursor (name + id)
+    cursor = request.args.get('cursor')
+    direction = request.args.get('dir', 'next')
     search = request.args.get('search', '')
     
+    where_clauses = []
+    params = []
+    
+    if search:
+        where_clauses.append("(name LIKE %s OR whatsapp_number LIKE %s)")
+        params.extend([f'%{search}%', f'%{search}%'])
+    
     try:
-        if search:
-            result = db.session.execute("""
-                SELECT id, name, whatsapp_number, status, last_location, last_active
-                FROM technicians 
-                WHERE name LIKE %s OR whatsapp_number LIKE %s
-                ORDER BY name
-                LIMIT %s OFFSET %s
-            """, (f'%{search}%', f'%{search}%', 20, (page-1)*20))
-        else:
-            result = db.session.execute("""
-                SELECT id, name, whatsapp_number, status, last_location, last_active
-                FROM technicians 
-                ORDER BY name
-                LIMIT %s OFFSET %s
-            """, (20, (page-1)*20))
-        
-        technicians = result.fetchall()
+        result = paginate_keyset("""
+            SELECT id, name, whatsapp_number, status, last_location, last_active
+            FROM technicians
+        """, where_clauses, params,
+            sort_column='name', id_column='id',
+            cursor=cursor, direction=direction, descending=False)
         
-        # Contar total para paginação
-        if search:
-            count_result = db.session.execute("""
-                SELECT COUNT(*) FROM technicians 
-                WHERE name LIKE %s OR whatsapp_number LIKE %s
-            """, (f'%{search}%', f'%{search}%'))
-        else:
-            count_result = db.session.execute("SELECT COUNT(*) FROM technicians")
+        technicians = result.rows
+        next_cursor = result.next_cursor
+        prev_cursor = result.prev_cursor
         
-        total = count_result.fetchone()[0]
+        # A tabela de técnicos é pequena: contagem exata é barata
+        total = count_rows("FROM technicians", where_clauses, params)
         
     except Exception as e:
         print(f"Erro ao buscar técnicos: {e}")
         technicians = []
+        next_cursor = prev_cursor = None
         total = 0
     
     return render_template('technicians/list.html', 
                           technicians=technicians, 
-                          page=page, 
+                          next_cursor=next_cursor,
+                          prev_cursor=prev_cursor,
                           total=total, 
                           search=search)
 
+@technicians_bp.route('/lookup')
+def lookup():
+    """Autocompletar de técnicos em serviço (disponíveis primeiro) para o formulário de ordens"""
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    
+    current_user = get_current_user()
+    if not (current_user.has_permission('edit_all') or current_user.has_permission('edit_orders')):
+        return jsonify({'error': 'Acesso negado.'}), 403
+    
+    try:
+        technicians = typeahead('technicians', request.args.get('q', ''),
+                                ['id', 'name', 'whatsapp_number', 'status'],
+                                where_clauses=["status IN ('available', 'busy')"],
+                                order_by="status = 'available' DESC, name",
+                                limit=request.args.get('limit', TYPEAHEAD_LIMIT, type=int))
+    except Exception as e:
+        print(f"Erro ao buscar técnicos para autocompletar: {e}")
+        return jsonify({'error': 'Erro ao buscar técnicos.'}), 500
+    
+    return jsonify({'results': technicians})
+
 @technicians_bp.route('/<int:technician_id>')
+@conditional_get('technicians', 'service_orders', 'clients', version=technician_rollup_version)
 def detail(technician_id):
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    current_user = User.query.get(session['user_id'])
+    current_user = get_current_user()
     if not current_user.has_permission('view_all'):
         flash('Acesso negado.', 'error')
         return redirect(url_for('dashboard.main'))
     
     try:
         # Buscar dados do técnico
-        result = db.session.execute("""
+        result = execute_sql("""
             SELECT id, name, whatsapp_number, status, last_location, last_active
             FROM technicians 
             WHERE id = %s
@@ -84,7 +110,7 @@ def detail(technician_id):
             return redirect(url_for('technicians.list'))
         
         # Buscar ordens de serviço do técnico
-        orders_result = db.session.execute("""
+        orders_result = execute_sql("""
             SELECT so.id, so.status, so.created_at, so.completed_at, c.name as client_name
             FROM service_orders so
             JOIN clients c ON so.client_id = c.id
@@ -94,18 +120,9 @@ def detail(technician_id):
         """, (technician_id,))
         orders = orders_result.fetchall()
         
-        # Estatísticas do técnico
-        stats_result = db.session.execute("""
-            SELECT 
-                COUNT(*) as total_orders,
-                SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed_orders,
-                AVG(CASE WHEN status = 'completed' AND created_at IS NOT NULL AND completed_at IS NOT NULL 
-                    THEN TIMESTAMPDIFF(MINUTE, created_at, completed_at) 
-                    ELSE NULL END) as avg_completion_time
-            FROM service_orders
-            WHERE technician_id = %s
-        """, (technician_id,))
-        stats = stats_result.fetchone()
+        # Estatísticas do técnico (agregados diários: total, concluídas, média e percentis)
+        refresh_technician_rollup()
+        stats = technician_performance(technician_id=technician_id).get(technician_id, empty_performance())
         
     except Exception as e:
         print(f"Erro ao buscar detalhes do técnico: {e}")
@@ -122,7 +139,7 @@ def new():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    current_user = User.query.get(session['user_id'])
+    current_user = get_current_user()
     if not current_user.has_permission('edit_all'):
         flash('Acesso negado.', 'error')
         return redirect(url_for('dashboard.main'))
@@ -133,7 +150,7 @@ def new():
             whatsapp_number = request.form['whatsapp_number']
             
             # Verificar se técnico já existe
-            exists_result = db.session.execute("""
+            exists_result = execute_sql("""
                 SELECT id FROM technicians WHERE whatsapp_number = %s
             """, (whatsapp_number,))
             
@@ -142,7 +159,7 @@ def new():
                 return render_template('technicians/new.html')
             
             # Inserir técnico
-            db.session.execute("""
+            execute_sql("""
                 INSERT INTO technicians (name, whatsapp_number, status, created_at)
                 VALUES (%s, %s, 'offline', NOW())
             """, (name, whatsapp_number))
@@ -162,7 +179,7 @@ def edit(technician_id):
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    current_user = User.query.get(session['user_id'])
+    current_user = get_current_user()
     if not current_user.has_permission('edit_all'):
         flash('Acesso negado.', 'error')
         return redirect(url_for('dashboard.main'))
@@ -172,7 +189,7 @@ def edit(technician_id):
             name = request.form['name']
             status = request.form['status']
             
-            db.session.execute("""
+            execute_sql("""
                 UPDATE technicians 
                 SET name = %s, status = %s
                 WHERE id = %s
@@ -188,7 +205,7 @@ def edit(technician_id):
     
     # Buscar dados do técnico para edição
     try:
-        result = db.session.execute("""
+        result = execute_sql("""
             SELECT id, name, whatsapp_number, status
             FROM technicians 
             WHERE id = %s
@@ -207,11 +224,12 @@ def edit(technician_id):
     return render_template('technicians/edit.html', technician=technician)
 
 @technicians_bp.route('/performance')
+# Sem conditional_get: o corpo vem do resultado do job, não das tabelas lidas agora
 def performance():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    current_user = User.query.get(session['user_id'])
+    current_user = get_current_user()
     if not current_user.has_permission('view_reports'):
         flash('Acesso negado.', 'error')
         return redirect(url_for('dashboard.main'))
@@ -229,29 +247,27 @@ def performance():
         # Início da semana (segunda-feira)
         start_date = today - timedelta(days=today.weekday())
     
+    # Calculado pelo worker; pedidos do mesmo período entram no mesmo job
     try:
-        # Performance dos técnicos no período
-        performance_result = db.session.execute("""
-            SELECT 
-                t.id, t.name, 
-                COUNT(so.id) as total_orders,
-                SUM(CASE WHEN so.status = 'completed' THEN 1 ELSE 0 END) as completed_orders,
-                AVG(CASE WHEN so.status = 'completed' AND so.created_at IS NOT NULL AND so.completed_at IS NOT NULL 
-                    THEN TIMESTAMPDIFF(MINUTE, so.created_at, so.completed_at) 
-                    ELSE NULL END) as avg_completion_time
-            FROM technicians t
-            LEFT JOIN service_orders so ON t.id = so.technician_id AND so.created_at >= %s
-            GROUP BY t.id, t.name
-            ORDER BY completed_orders DESC
-        """, (start_date,))
-        
-        performance = performance_result.fetchall()
-        
+        job = enqueue_job('technician_performance', {'start_date': start_date.isoformat()}, current_user.id)
     except Exception as e:
-        print(f"Erro ao gerar relatório de performance: {e}")
-        performance = []
+        print(f"Erro ao enfileirar relatório de performance: {e}")
+        job = None
+    
+    if request.accept_mimetypes.best == 'application/json':
+        if job is None:
+            return jsonify({'error': 'Erro ao gerar relatório de performance.'}), 500
+        return jsonify(job_to_dict(job)), 200 if job['status'] == 'done' else 202
+    
+    performance = job['result']['performance'] if job and job['status'] == 'done' else []
     
-    return render_template('technicians/performance.html',
+    response = make_response(render_template('technicians/performance.html',
                           period=period,
                           start_date=start_date,
-                          performance=performance)
+                          performance=performance,
+                          job=job,
+                          job_url=url_for('jobs.status', job_id=job['id']) if job else None))
+    if not job or job['status'] != 'done':
+        # Página de "processando": sem cache nem ETag, o resultado chega no próximo carregamento
+        response.headers['Cache-Control'] = 'no-store'
+    return response
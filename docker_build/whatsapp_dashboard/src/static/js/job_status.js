@@ -0,0 +1,64 @@
+/*
+ * Andamento de jobs em segundo plano (relatórios longos, faturamento em lote).
+ *
+ * Uso:
+ *   <div data-job-url="{{ job_url }}" data-job-status="{{ job.status }}" [data-job-done-url="..."]>
+ *     <div class="progress-bar" data-job-progress></div>
+ *     <span data-job-message></span>
+ *   </div>
+ *
+ * Consulta /jobs/<id> a cada poucos segundos; quando o job conclui, recarrega a página (o
+ * resultado já está guardado e é exibido direto) ou abre data-job-done-url (páginas geradas por
+ * POST, como o lote de faturas). Em falha, mostra o erro e para.
+ */
+(function () {
+    var POLL_MS = 2000;
+
+    function update(container, job) {
+        var bar = container.querySelector('[data-job-progress]');
+        if (bar) {
+            bar.style.width = job.progress + '%';
+            bar.textContent = job.progress + '%';
+        }
+        var message = container.querySelector('[data-job-message]');
+        if (message) {
+            message.textContent = job.status === 'failed' ? (job.error || 'Erro ao processar.') : (job.message || '');
+        }
+    }
+
+    function poll(container) {
+        fetch(container.getAttribute('data-job-url'), {
+            headers: {'Accept': 'application/json'},
+            credentials: 'same-origin'
+        }).then(function (response) {
+            return response.ok ? response.json() : null;
+        }).then(function (job) {
+            if (!job) {
+                return;
+            }
+            update(container, job);
+            if (job.status === 'done') {
+                var doneUrl = container.getAttribute('data-job-done-url');
+                if (doneUrl) {
+                    window.location.href = doneUrl;
+                } else {
+                    window.location.reload();
+                }
+            } else if (job.status !== 'failed') {
+                setTimeout(function () { poll(container); }, POLL_MS);
+            }
+        }).catch(function () {
+            setTimeout(function () { poll(container); }, POLL_MS * 5);
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        var containers = document.querySelectorAll('[data-job-url]');
+        Array.prototype.forEach.call(containers, function (container) {
+            var status = container.getAttribute('data-job-status');
+            if (status === 'queued' || status === 'running') {
+                poll(container);
+            }
+        });
+    });
+})();
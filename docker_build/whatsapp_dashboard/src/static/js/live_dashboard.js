@@ -0,0 +1,75 @@
+/*
+ * Dashboard ao vivo: recebe o estado pelo canal SSE (/dashboard/live) em vez de recarregar a página.
+ *
+ * Uso:
+ *   <body data-live-url="{{ live_url }}">
+ *   <div data-live-stat="pending_orders">{{ stats.pending_orders }}</div>
+ *   <div data-live-alerts>...</div>
+ *
+ * Eventos: "snapshot" traz o estado completo; "delta" só as chaves alteradas (em objetos,
+ * só as subchaves; null = removida). O navegador reconecta sozinho quando a conexão termina.
+ * Gráficos e outros componentes escutam "live-dashboard:update" (detail = estado completo).
+ */
+(function () {
+    var state = {};
+
+    function merge(delta) {
+        Object.keys(delta).forEach(function (key) {
+            var value = delta[key];
+            if (value && typeof value === 'object' && !Array.isArray(value) &&
+                    state[key] && typeof state[key] === 'object' && !Array.isArray(state[key])) {
+                Object.keys(value).forEach(function (subkey) {
+                    if (value[subkey] === null) {
+                        delete state[key][subkey];
+                    } else {
+                        state[key][subkey] = value[subkey];
+                    }
+                });
+            } else {
+                state[key] = value;
+            }
+        });
+    }
+
+    function renderAlerts(container, alerts) {
+        container.innerHTML = '';
+        (alerts || []).forEach(function (alert) {
+            var link = document.createElement('a');
+            link.className = 'alert alert-' + alert.type + ' d-block mb-2';
+            link.href = alert.link;
+            link.textContent = alert.message;
+            container.appendChild(link);
+        });
+    }
+
+    function render() {
+        var stats = state.stats || {};
+        document.querySelectorAll('[data-live-stat]').forEach(function (element) {
+            var value = stats[element.dataset.liveStat];
+            if (value !== undefined) {
+                element.textContent = value;
+            }
+        });
+        document.querySelectorAll('[data-live-alerts]').forEach(function (container) {
+            renderAlerts(container, state.alerts);
+        });
+        document.dispatchEvent(new CustomEvent('live-dashboard:update', {detail: state}));
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        var url = document.body.dataset.liveUrl;
+        if (!url || !window.EventSource) {
+            return;
+        }
+
+        var source = new EventSource(url);
+        source.addEventListener('snapshot', function (event) {
+            state = JSON.parse(event.data);
+            render();
+        });
+        source.addEventListener('delta', function (event) {
+            merge(JSON.parse(event.data));
+            render();
+        });
+    });
+})();
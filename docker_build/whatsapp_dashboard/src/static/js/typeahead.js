@@ -0,0 +1,106 @@
+/*
+ * Autocompletar para escolher cliente/técnico nos formulários sem carregar a tabela inteira.
+ *
+ * Uso:
+ *   <input type="hidden" name="client_id" id="client_id" value="{{ selected_client.id if selected_client }}">
+ *   <input type="text" class="form-control" data-typeahead="{{ client_lookup_url }}"
+ *          data-typeahead-target="client_id" value="{{ selected_client.name if selected_client }}">
+ *
+ * O endpoint recebe ?q=<texto> e responde {"results": [{"id": ..., "name": ..., ...}]}.
+ */
+(function () {
+    var DEBOUNCE_MS = 200;
+
+    function describe(item) {
+        var extra = item.whatsapp_number || item.status || '';
+        return extra ? item.name + ' - ' + extra : item.name;
+    }
+
+    function setup(input) {
+        var target = document.getElementById(input.dataset.typeaheadTarget);
+        var menu = document.createElement('div');
+        var timer = null;
+        var lastQuery = null;
+        var controller = null;
+
+        menu.className = 'dropdown-menu w-100';
+        input.parentNode.style.position = 'relative';
+        input.parentNode.appendChild(menu);
+        input.setAttribute('autocomplete', 'off');
+
+        function close() {
+            menu.classList.remove('show');
+        }
+
+        function render(results) {
+            menu.innerHTML = '';
+            if (!results.length && !lastQuery) {
+                close();
+                return;
+            }
+            if (!results.length) {
+                var empty = document.createElement('span');
+                empty.className = 'dropdown-item-text text-muted';
+                empty.textContent = 'Nenhum resultado';
+                menu.appendChild(empty);
+            }
+            results.forEach(function (item) {
+                var option = document.createElement('button');
+                option.type = 'button';
+                option.className = 'dropdown-item';
+                option.textContent = describe(item);
+                option.addEventListener('mousedown', function (event) {
+                    event.preventDefault();
+                    target.value = item.id;
+                    input.value = item.name;
+                    close();
+                    input.dispatchEvent(new CustomEvent('typeahead:select', { detail: item }));
+                });
+                menu.appendChild(option);
+            });
+            menu.classList.add('show');
+        }
+
+        function search(force) {
+            var query = input.value.trim();
+            if (!force && query === lastQuery) {
+                return;
+            }
+            lastQuery = query;
+
+            // Cancela a busca anterior para não exibir resultados fora de ordem
+            if (controller) {
+                controller.abort();
+            }
+            controller = new AbortController();
+
+            var url = input.dataset.typeahead + '?q=' + encodeURIComponent(query);
+            fetch(url, { credentials: 'same-origin', signal: controller.signal })
+                .then(function (response) { return response.json(); })
+                .then(function (data) { render(data.results || []); })
+                .catch(function (error) {
+                    if (error.name !== 'AbortError') {
+                        close();
+                    }
+                });
+        }
+
+        input.addEventListener('input', function () {
+            // Texto alterado: a seleção anterior deixa de valer
+            target.value = '';
+            clearTimeout(timer);
+            timer = setTimeout(search, DEBOUNCE_MS);
+        });
+        input.addEventListener('focus', function () { search(true); });
+        input.addEventListener('blur', close);
+        input.addEventListener('keydown', function (event) {
+            if (event.key === 'Escape') {
+                close();
+            }
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('input[data-typeahead]').forEach(setup);
+    });
+})();
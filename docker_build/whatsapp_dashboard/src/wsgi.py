@@ -0,0 +1,8 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from src.main import create_app
+
+# Ponto de entrada WSGI para produção: gunicorn -c gunicorn.conf.py src.wsgi:app
+app = create_app()
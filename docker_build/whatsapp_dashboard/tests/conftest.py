@@ -0,0 +1,56 @@
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import create_app
+from src.models.database import db
+
+# Traduções do SQL do MySQL usado pelos módulos para o SQLite dos testes
+SQLITE_REWRITES = (
+    (re.compile(r'DATE_(SUB|ADD)\(NOW\(\), INTERVAL %s (\w+)\)'),
+     lambda m: f"datetime('now', '{'-' if m.group(1) == 'SUB' else '+'}' || %s || ' {m.group(2).lower()}s')"),
+    (re.compile(r'NOW\(\)'), "datetime('now')"),
+    (re.compile(r'INSERT IGNORE'), 'INSERT OR IGNORE'),
+    (re.compile(r'\bIF\('), 'IIF('),
+    (re.compile(r'\s+FOR UPDATE'), ''),
+)
+
+def sqlite_execute_sql(sql, params=None, connection=None):
+    """execute_sql sobre o SQLite: traduz o dialeto e o paramstyle (%s -> ?)"""
+    for pattern, replacement in SQLITE_REWRITES:
+        sql = pattern.sub(replacement, sql)
+    connection = connection or db.session.connection()
+    return connection.exec_driver_sql(sql.replace('%s', '?'), tuple(params or ()))
+
+@pytest.fixture
+def app():
+    """App com SQLite em memória (só para o que não depende de SQL do MySQL)"""
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SQLALCHEMY_ENGINE_OPTIONS': {}, 'TESTING': True})
+    with app.app_context():
+        yield app
+
+@pytest.fixture
+def mysql_app():
+    """App no MariaDB/MySQL de teste indicado em DASHBOARD_TEST_DATABASE_URI (pulado sem ele)"""
+    uri = os.environ.get('DASHBOARD_TEST_DATABASE_URI')
+    if not uri:
+        pytest.skip('DASHBOARD_TEST_DATABASE_URI não definido')
+    app = create_app({'SQLALCHEMY_DATABASE_URI': uri, 'TESTING': True})
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+@pytest.fixture
+def sqlite_sql(app, monkeypatch):
+    """Cria as tabelas no SQLite e troca o execute_sql dos módulos indicados pela tradução"""
+    db.create_all()
+
+    def install(*modules):
+        for module in modules:
+            monkeypatch.setattr(module, 'execute_sql', sqlite_execute_sql)
+    return install
@@ -0,0 +1,90 @@
+import gzip
+import os
+
+import pytest
+
+from src.models import assets
+from src.models.assets import DIST_DIR, build_assets, fingerprint_name, load_manifest
+from src.routes.assets import asset_url, init_assets
+
+CSS = b'.card { margin: 0; padding: 8px; }\n' * 40
+
+@pytest.fixture
+def static_dir(tmp_path):
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'app.css').write_bytes(CSS)
+    (tmp_path / 'js').mkdir()
+    (tmp_path / 'js' / 'small.js').write_bytes(b'console.log(1);\n')
+    (tmp_path / 'logo.png').write_bytes(b'\x89PNG' + bytes(range(256)) * 4)
+    (tmp_path / 'index.html').write_bytes(b'<html></html>')
+    return tmp_path
+
+def test_fingerprint_name():
+    assert fingerprint_name('js/app.js', 'abc123') == 'js/app.abc123.js'
+
+def test_build_assets(static_dir):
+    manifest = build_assets(str(static_dir))
+
+    assert set(manifest) == {'css/app.css', 'js/small.js', 'logo.png'}
+    css = manifest['css/app.css']
+    assert css['path'].startswith('css/app.') and css['path'].endswith('.css')
+    assert css['size'] == len(CSS)
+    expected = ['br', 'gzip'] if assets.brotli else ['gzip']
+    assert css['encodings'] == expected
+
+    dist = static_dir / DIST_DIR
+    assert (dist / css['path']).read_bytes() == CSS
+    assert gzip.decompress((dist / (css['path'] + '.gz')).read_bytes()) == CSS
+    # Pequenos demais ou já comprimidos: só o arquivo original
+    assert manifest['js/small.js']['encodings'] == []
+    assert manifest['logo.png']['encodings'] == []
+    assert load_manifest(str(static_dir)) == manifest
+
+def test_rebuild_drops_old_versions(static_dir):
+    old_path = build_assets(str(static_dir))['css/app.css']['path']
+    (static_dir / 'css' / 'app.css').write_bytes(CSS + b'.new {}\n')
+    new_path = build_assets(str(static_dir))['css/app.css']['path']
+    assert new_path != old_path
+    assert not os.path.exists(static_dir / DIST_DIR / old_path)
+
+def test_load_manifest_without_build(tmp_path):
+    assert load_manifest(str(tmp_path)) == {}
+
+@pytest.fixture
+def built_app(app, static_dir):
+    app.static_folder = str(static_dir)
+    build_assets(app.static_folder)
+    init_assets(app)
+    return app
+
+def test_asset_url_points_to_fingerprinted_file(built_app):
+    path = built_app.extensions['assets']['manifest']['css/app.css']['path']
+    with built_app.test_request_context():
+        assert asset_url('css/app.css') == f'/assets/{path}'
+        assert asset_url('css/missing.css') == '/static/css/missing.css'
+
+def test_asset_serves_gzip_variant_when_accepted(built_app):
+    path = built_app.extensions['assets']['manifest']['css/app.css']['path']
+    client = built_app.test_client()
+
+    compressed = client.get(f'/assets/{path}', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.status_code == 200
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == CSS
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert 'immutable' in compressed.headers['Cache-Control']
+
+    plain = client.get(f'/assets/{path}', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.data == CSS
+    assert plain.headers['ETag'] != compressed.headers['ETag']
+
+def test_asset_prefers_brotli(built_app):
+    if not assets.brotli:
+        pytest.skip('pacote Brotli não instalado')
+    path = built_app.extensions['assets']['manifest']['css/app.css']['path']
+    response = built_app.test_client().get(f'/assets/{path}', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+
+def test_unknown_asset_is_404(built_app):
+    assert built_app.test_client().get('/assets/css/app.css').status_code == 404
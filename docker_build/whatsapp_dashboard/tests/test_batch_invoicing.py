@@ -0,0 +1,80 @@
+import sqlite3
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from src.main import create_app
+from src.models import batch_invoicing, cache, jobs, report_jobs
+from src.models.batch_invoicing import create_invoices, rows_from_selection
+from src.models.database import db
+from src.models.report_jobs import batch_invoices_job, serialize_invoice_rows
+
+# Valores e datas voltam do SQLite como Decimal e date, como no MySQL
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_converter('DECIMAL', lambda value: Decimal(value.decode()))
+
+@pytest.fixture
+def app():
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True,
+                      'SQLALCHEMY_ENGINE_OPTIONS': {'connect_args': {'detect_types': sqlite3.PARSE_DECLTYPES}}})
+    with app.app_context():
+        yield app
+
+@pytest.fixture
+def invoices(sqlite_sql):
+    sqlite_sql(batch_invoicing, cache, jobs)
+    connection = db.session.connection()
+    connection.exec_driver_sql("CREATE TABLE clients (id INTEGER PRIMARY KEY)")
+    connection.exec_driver_sql("INSERT INTO clients (id) VALUES (1), (2)")
+    connection.exec_driver_sql("""
+        CREATE TABLE invoices (id INTEGER PRIMARY KEY AUTOINCREMENT, client_id INTEGER, amount DECIMAL,
+                               due_date DATE, status TEXT, description TEXT, created_at TEXT)
+    """)
+    db.session.commit()
+
+def selection(amount='150,00'):
+    return rows_from_selection('1, 2', amount, '10/05/2024', 'Mensalidade')
+
+def invoice_count():
+    return db.session.connection().exec_driver_sql("SELECT COUNT(*) FROM invoices").fetchone()[0]
+
+def progress_at(attempt):
+    def progress(percent, message=None):
+        pass
+    progress.attempt = attempt
+    return progress
+
+def test_skip_existing_by_client_and_due_date(invoices):
+    assert create_invoices(selection())['created'] == 2
+    result = create_invoices(selection('99,50'))
+    assert result['created'] == 0
+    assert [line for line, _ in result['errors']] == [1, 2]
+
+def test_skip_saved_ignores_only_identical_invoices(invoices):
+    assert create_invoices(selection(), skip_existing=False)['created'] == 2
+
+    retry = create_invoices(selection(), skip_existing=False, skip_saved=True)
+    assert retry['created'] == 0
+    assert len(retry['errors']) == 2
+
+    # Duplicatas permitidas: outro valor no mesmo vencimento é gravado
+    assert create_invoices(selection('99,50'), skip_existing=False, skip_saved=True)['created'] == 2
+    assert invoice_count() == 4
+
+def test_reclaimed_batch_job_does_not_duplicate(invoices):
+    params = {'rows': serialize_invoice_rows(selection()), 'skip_existing': False}
+    assert batch_invoices_job(params, progress_at(1))['created'] == 2
+    assert batch_invoices_job(params, progress_at(2))['created'] == 0
+    assert invoice_count() == 2
+
+def test_batch_job_keeps_result_when_report_refresh_fails(invoices, monkeypatch):
+    def failing_refresh(force=False):
+        raise RuntimeError('agregado indisponível')
+    monkeypatch.setattr(report_jobs, 'refresh_invoice_rollup', failing_refresh)
+
+    params = {'rows': serialize_invoice_rows(selection()), 'skip_existing': True}
+    result = batch_invoices_job(params, progress_at(1))
+    assert result['created'] == 2
+    assert result['client_ids'] == [1, 2]
+    assert invoice_count() == 2
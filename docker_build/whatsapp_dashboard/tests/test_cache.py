@@ -0,0 +1,33 @@
+from datetime import datetime
+
+import pytest
+
+from src.main import create_app
+from src.models import cache
+from src.models.cache import CacheEntry, cache_delete, cache_delete_prefix
+from src.models.database import db
+
+@pytest.fixture
+def app(tmp_path):
+    """SQLite em arquivo: em memória a sessão e o cache dividiriam a mesma conexão"""
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'cache.db'}",
+                      'SQLALCHEMY_ENGINE_OPTIONS': {}, 'TESTING': True})
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+def entry(key):
+    return CacheEntry(cache_key=key, value='1', expires_at=datetime(2100, 1, 1))
+
+def test_cache_writes_do_not_commit_the_callers_pending_work(sqlite_sql):
+    sqlite_sql(cache)
+    db.session.add_all([entry('overview'), entry('fragment:dashboard:abc')])
+    db.session.commit()
+
+    db.session.add(entry('pendente'))
+    cache_delete('overview')
+    cache_delete_prefix('fragment:dashboard:')
+    db.session.rollback()
+
+    assert db.session.get(CacheEntry, 'pendente') is None
+    assert CacheEntry.query.count() == 0
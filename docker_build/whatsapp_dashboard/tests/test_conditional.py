@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from flask import make_response
+
+import src.main
+from src.models import conditional
+from src.models.conditional import conditional_get
+
+NOW = datetime(2024, 5, 10, 12, 0, 0)
+
+@pytest.fixture
+def state(app, monkeypatch):
+    """View de teste com os marcadores de mudança e o usuário logado simulados"""
+    state = SimpleNamespace(markers=[NOW - timedelta(minutes=5), 10], calls=0)
+    user = SimpleNamespace(id=1, role='admin', technician_id=None, full_name='Admin')
+    monkeypatch.setattr(conditional, 'table_versions', lambda tables: (NOW, list(state.markers)))
+    monkeypatch.setattr(conditional, 'get_current_user', lambda: user)
+    monkeypatch.setattr(src.main, 'get_current_user', lambda: user)
+
+    def view():
+        state.calls += 1
+        return f'página {state.calls}'
+
+    def no_store_view():
+        response = make_response('processando')
+        response.cache_control.no_store = True
+        return response
+
+    app.add_url_rule('/_conditional', 'conditional_test', conditional_get('clients')(view))
+    state.versions = {1: 'v1', 2: 'v1'}
+    app.add_url_rule('/_conditional/<int:item_id>', 'conditional_versioned',
+                     conditional_get('clients', version=lambda item_id: state.versions[item_id])(
+                         lambda item_id: f'item {item_id}'))
+    app.add_url_rule('/_conditional/no-store', 'conditional_no_store', conditional_get('clients')(no_store_view))
+    state.app = app
+    return state
+
+def logged_client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    return client
+
+def test_unchanged_tables_return_304_without_running_view(state):
+    client = logged_client(state.app)
+    first = client.get('/_conditional')
+    assert first.status_code == 200
+    assert first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    second = client.get('/_conditional', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 304
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert state.calls == 1
+
+def test_changed_marker_renders_again(state):
+    client = logged_client(state.app)
+    etag = client.get('/_conditional').headers['ETag']
+    state.markers[1] = 11
+
+    response = client.get('/_conditional', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert state.calls == 2
+
+def test_change_in_current_second_gets_no_etag(state):
+    state.markers[0] = NOW - timedelta(seconds=1)
+    response = logged_client(state.app).get('/_conditional')
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+
+def test_anonymous_request_is_not_validated(state):
+    response = state.app.test_client().get('/_conditional')
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+
+def test_marker_error_runs_view(state, monkeypatch):
+    def failing(tables):
+        raise RuntimeError('sem conexão')
+    monkeypatch.setattr(conditional, 'table_versions', failing)
+    response = logged_client(state.app).get('/_conditional')
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+
+def test_no_store_response_is_not_validated(state):
+    response = logged_client(state.app).get('/_conditional/no-store')
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+
+def test_version_changes_etag_of_its_view_only(state):
+    client = logged_client(state.app)
+    first = client.get('/_conditional/1').headers['ETag']
+    other = client.get('/_conditional/2').headers['ETag']
+    state.versions[1] = 'v2'
+
+    assert client.get('/_conditional/1', headers={'If-None-Match': first}).status_code == 200
+    assert client.get('/_conditional/2', headers={'If-None-Match': other}).status_code == 304
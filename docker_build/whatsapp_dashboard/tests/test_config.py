@@ -0,0 +1,36 @@
+import pytest
+
+from src.config import _database_uri
+from src.main import DEV_DATABASE_URI, create_app
+
+SQLITE = {'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SQLALCHEMY_ENGINE_OPTIONS': {}}
+
+def test_refuses_to_start_without_secret_key():
+    with pytest.raises(RuntimeError, match='SECRET_KEY'):
+        create_app({**SQLITE, 'SECRET_KEY': None})
+
+def test_debug_and_testing_get_a_random_secret_key():
+    first = create_app({**SQLITE, 'SECRET_KEY': None, 'DEBUG': True})
+    second = create_app({**SQLITE, 'SECRET_KEY': None, 'TESTING': True})
+    assert first.secret_key and second.secret_key
+    assert first.secret_key != second.secret_key
+    assert 'whatsapp_dashboard_secret_key' not in first.secret_key
+
+def test_keeps_configured_secret_key():
+    assert create_app({**SQLITE, 'SECRET_KEY': 'chave-do-deploy'}).secret_key == 'chave-do-deploy'
+
+def test_refuses_to_start_without_database():
+    with pytest.raises(RuntimeError, match='DATABASE_URL'):
+        create_app({'SQLALCHEMY_DATABASE_URI': None, 'SECRET_KEY': 'chave-do-deploy'})
+
+def test_debug_falls_back_to_local_database_without_password():
+    app = create_app({'SQLALCHEMY_DATABASE_URI': None, 'SECRET_KEY': 'chave-do-deploy', 'DEBUG': True})
+    assert app.config['SQLALCHEMY_DATABASE_URI'] == DEV_DATABASE_URI
+
+def test_database_uri_has_no_default(monkeypatch):
+    for name in ('DATABASE_URL', 'DB_HOST'):
+        monkeypatch.delenv(name, raising=False)
+    assert _database_uri() is None
+    monkeypatch.setenv('DB_HOST', 'db')
+    monkeypatch.setenv('DB_PASSWORD', 'p@ss')
+    assert _database_uri() == 'mysql+pymysql://root:p%40ss@db:3306/WTS2'
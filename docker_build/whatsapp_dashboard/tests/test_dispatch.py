@@ -0,0 +1,49 @@
+import random
+
+import pytest
+
+from src.models.dispatch import GridIndex, haversine_km
+
+def brute_force(points, latitude, longitude, k):
+    return sorted(haversine_km(latitude, longitude, lat, lng) for lat, lng, _ in points)[:k]
+
+def random_points(rng, count):
+    # Maioria numa região metropolitana, alguns espalhados pelo país
+    points = [(rng.uniform(-23.8, -23.3), rng.uniform(-46.9, -46.3), i) for i in range(count)]
+    points += [(rng.uniform(-33.0, 5.0), rng.uniform(-73.0, -35.0), count + i) for i in range(count // 10)]
+    return points
+
+def test_haversine_km():
+    assert haversine_km(0, 0, 0, 0) == 0
+    # São Paulo -> Rio de Janeiro: ~361 km
+    assert haversine_km(-23.5505, -46.6333, -22.9068, -43.1729) == pytest.approx(361, abs=2)
+
+@pytest.mark.parametrize('cell_degrees', [0.01, 0.05, 0.5])
+@pytest.mark.parametrize('k', [1, 5, 20])
+def test_nearest_matches_brute_force(cell_degrees, k):
+    rng = random.Random(f"{cell_degrees}-{k}")
+    points = random_points(rng, 200)
+    index = GridIndex(cell_degrees)
+    for lat, lng, item in points:
+        index.insert(lat, lng, item)
+
+    queries = random_points(rng, 30)
+    # Pontos fora da área ocupada também precisam da resposta exata
+    queries += [(-3.1, -60.0, None), (-30.0, -51.2, None), (-23.55, -46.63, None)]
+    for lat, lng, _ in queries:
+        found = index.nearest(lat, lng, k)
+        assert [distance for distance, _ in found] == pytest.approx(brute_force(points, lat, lng, k))
+        expected_items = {item for item_lat, item_lng, item in points}
+        assert all(item in expected_items for _, item in found)
+
+def test_nearest_with_fewer_items_than_k():
+    index = GridIndex()
+    index.insert(-23.5, -46.6, 'a')
+    index.insert(-22.9, -43.2, 'b')
+    assert [item for _, item in index.nearest(-23.0, -43.0, 5)] == ['b', 'a']
+
+def test_nearest_on_empty_index():
+    assert GridIndex().nearest(-23.5, -46.6, 3) == []
+    index = GridIndex()
+    index.insert(-23.5, -46.6, 'a')
+    assert index.nearest(-23.5, -46.6, 0) == []
@@ -0,0 +1,24 @@
+import html
+import re
+from types import SimpleNamespace
+
+import pytest
+from flask import render_template
+
+@pytest.fixture
+def render_dashboard(app, monkeypatch):
+    monkeypatch.setattr('src.main.get_current_user', lambda: SimpleNamespace(role='admin'))
+
+    def render(orders_by_status, data_version):
+        stats = {'total_messages': 1, 'active_clients': 2, 'pending_orders': 3, 'revenue_today': 4}
+        with app.test_request_context('/dashboard/'):
+            page = render_template('dashboard/main.html', stats=stats, alerts=[], live_url='/dashboard/live',
+                                   orders_by_status=orders_by_status, data_version=data_version)
+        return html.unescape(re.search(r"data-orders-by-status='([^']*)'", page).group(1))
+    return render
+
+def test_status_chart_is_part_of_the_cached_dashboard_fragment(render_dashboard):
+    assert render_dashboard({'pending': 5}, 'v1') == '{"pending": 5}'
+    # Mesma versão do overview: o gráfico vem do cache junto com os contadores
+    assert render_dashboard({'pending': 9}, 'v1') == '{"pending": 5}'
+    assert render_dashboard({'pending': 9}, 'v2') == '{"pending": 9}'
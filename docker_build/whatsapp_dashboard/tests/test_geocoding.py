@@ -0,0 +1,26 @@
+import pytest
+
+from src.models.geocoding import address_key, normalize_address, parse_coordinates
+
+@pytest.mark.parametrize('text, expected', [
+    ('-23.55, -46.63', (-23.55, -46.63)),
+    ('(-23.5505;-46.6333)', (-23.5505, -46.6333)),
+    ('  12 , 45  ', (12.0, 45.0)),
+    ('-90, 180', (-90.0, 180.0)),
+])
+def test_parse_coordinates(text, expected):
+    assert parse_coordinates(text) == expected
+
+@pytest.mark.parametrize('text', [
+    None, '', 'Rua das Flores, 123', '91, 10', '-23.5, 181', '23.5', '23.5, -46.6, 10'
+])
+def test_parse_coordinates_rejects_addresses_and_out_of_range(text):
+    assert parse_coordinates(text) is None
+
+def test_normalize_address():
+    assert normalize_address('  Rua  das Flores ,123 ,  São Paulo. ') == 'rua das flores, 123, são paulo'
+    assert normalize_address(None) == ''
+
+def test_equivalent_addresses_share_key():
+    assert address_key('Rua das Flores, 123') == address_key('RUA DAS FLORES,123.')
+    assert address_key('Rua das Flores, 123') != address_key('Rua das Flores, 124')
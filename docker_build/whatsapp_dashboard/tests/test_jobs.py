@@ -0,0 +1,94 @@
+from datetime import datetime
+
+import pytest
+
+from src.models import jobs
+from src.models.jobs import JOB_TYPES, claim_job, enqueue_job, get_job, job_key, job_to_dict
+
+@pytest.fixture
+def queue(app, sqlite_sql, monkeypatch):
+    """Fila no SQLite com dois tipos de job de teste (relatório com resultado guardado e gravação)"""
+    sqlite_sql(jobs)
+    calls = []
+
+    def report(params, progress):
+        calls.append(params)
+        if params.get('fail'):
+            raise RuntimeError('falhou')
+        return {'total': params['a'] + params['b']}
+
+    monkeypatch.setitem(JOB_TYPES, 'test_report', {'handler': report, 'permission': None, 'result_ttl': None})
+    monkeypatch.setitem(JOB_TYPES, 'test_write', {'handler': report, 'permission': None, 'result_ttl': 0})
+    app.config['JOBS_INLINE'] = True
+    return calls
+
+def test_job_key_ignores_param_order():
+    assert job_key('report', {'a': 1, 'b': 2}) == job_key('report', {'b': 2, 'a': 1})
+    assert job_key('report', {'a': 1}) != job_key('other', {'a': 1})
+    assert job_key('report', {'a': 1}) != job_key('report', {'a': 2})
+
+def test_unknown_kind_is_rejected(queue):
+    with pytest.raises(ValueError):
+        enqueue_job('nao_existe', {})
+
+def test_inline_job_runs_and_result_is_reused(queue):
+    job = enqueue_job('test_report', {'a': 1, 'b': 2}, user_id=7)
+    assert job['status'] == 'done'
+    assert job['result'] == {'total': 3}
+    assert job['attempts'] == 1
+
+    again = enqueue_job('test_report', {'b': 2, 'a': 1})
+    assert again['id'] == job['id']
+    assert queue == [{'a': 1, 'b': 2}]
+
+    other = enqueue_job('test_report', {'a': 2, 'b': 2})
+    assert other['id'] != job['id']
+
+def test_failed_job_releases_key(queue):
+    job = enqueue_job('test_report', {'a': 1, 'b': 2, 'fail': True})
+    assert job['status'] == 'failed'
+    assert job['error'] == 'falhou'
+
+    retry = enqueue_job('test_report', {'a': 1, 'b': 2, 'fail': True})
+    assert retry['id'] != job['id']
+    assert len(queue) == 2
+
+def test_job_without_result_ttl_runs_every_time(queue):
+    first = enqueue_job('test_write', {'a': 1, 'b': 1})
+    second = enqueue_job('test_write', {'a': 1, 'b': 1})
+    assert first['id'] != second['id']
+    assert second['result'] == {'total': 2}
+    assert len(queue) == 2
+
+def test_queued_job_is_claimed_by_one_worker(app, queue):
+    app.config['JOBS_INLINE'] = False
+    job = enqueue_job('test_report', {'a': 1, 'b': 2})
+    assert job['status'] == 'queued'
+    # Pedido igual enquanto está na fila cai no mesmo job
+    assert enqueue_job('test_report', {'a': 1, 'b': 2})['id'] == job['id']
+
+    claimed = claim_job('worker-a')
+    assert claimed['id'] == job['id']
+    assert claimed['status'] == 'running'
+    assert claim_job('worker-b') is None
+    assert claim_job('worker-b', job['id']) is None
+    assert get_job(job['id'])['attempts'] == 1
+    assert queue == []
+
+def test_handler_sees_attempt_number(app, queue, monkeypatch):
+    attempts = []
+    monkeypatch.setitem(JOB_TYPES, 'test_attempt', {
+        'handler': lambda params, progress: attempts.append(progress.attempt),
+        'permission': None, 'result_ttl': 0})
+    enqueue_job('test_attempt', {})
+    assert attempts == [1]
+
+def test_job_to_dict_shows_result_only_when_done():
+    job = {'id': 1, 'kind': 'test_report', 'status': 'running', 'progress': 40, 'message': 'Lendo',
+           'error': None, 'result': None, 'created_at': datetime(2024, 1, 2, 3, 4, 5), 'finished_at': None}
+    data = job_to_dict(job)
+    assert data['created_at'] == '2024-01-02T03:04:05'
+    assert 'result' not in data
+
+    job.update(status='done', result={'total': 3}, finished_at=datetime(2024, 1, 2, 3, 5))
+    assert job_to_dict(job)['result'] == {'total': 3}
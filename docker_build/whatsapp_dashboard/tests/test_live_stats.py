@@ -0,0 +1,33 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+from src.models.live_stats import _normalize, diff_snapshot, format_event
+
+def test_diff_snapshot_unchanged_is_empty():
+    state = {'stats': {'clients': 10, 'orders': 3}, 'alerts': ['a']}
+    assert diff_snapshot(state, json.loads(json.dumps(state))) == {}
+
+def test_diff_snapshot_sends_only_changed_subkeys():
+    previous = {'stats': {'clients': 10, 'orders': 3, 'old': 1}, 'alerts': ['a']}
+    current = {'stats': {'clients': 11, 'orders': 3, 'new': 2}, 'alerts': ['a', 'b']}
+    assert diff_snapshot(previous, current) == {
+        'stats': {'clients': 11, 'new': 2, 'old': None},
+        'alerts': ['a', 'b']
+    }
+
+def test_diff_snapshot_from_empty_state_is_everything():
+    current = {'stats': {'clients': 1}, 'orders_by_status': {'pending': 2}}
+    assert diff_snapshot({}, current) == current
+
+def test_diff_snapshot_value_replaced_by_dict():
+    assert diff_snapshot({'stats': None}, {'stats': {'clients': 1}}) == {'stats': {'clients': 1}}
+
+def test_normalize_matches_cached_representation():
+    computed = {'revenue': Decimal('10.50'), 'day': date(2024, 1, 2)}
+    cached = {'revenue': '10.50', 'day': '2024-01-02'}
+    assert diff_snapshot(_normalize(cached), _normalize(computed)) == {}
+
+def test_format_event():
+    assert format_event('update', 3, {'stats': {'clients': 1}}) == (
+        'id: 3\nevent: update\ndata: {"stats": {"clients": 1}}\n\n')
@@ -0,0 +1,25 @@
+from types import SimpleNamespace
+
+import pytest
+from flask import g
+
+from src.routes.metrics import (UNKNOWN_ROWCOUNT, _after_cursor_execute, _before_cursor_execute,
+                                normalize_statement)
+
+def test_normalize_statement_drops_literals_and_list_sizes():
+    assert normalize_statement("SELECT * FROM clients WHERE id IN (%s, %s, %s) AND name = 'Ana'") == (
+        "SELECT * FROM clients WHERE id IN (?, ...) AND name = ?")
+    assert normalize_statement("INSERT INTO t (a, b) VALUES (1, NOW()), (2, NOW()), (3, NOW())") == (
+        "INSERT INTO t (a, b) VALUES (?, NOW()), ...")
+
+@pytest.mark.parametrize('rowcount, expected', [(3, 3), (0, 0), (-1, 0), (UNKNOWN_ROWCOUNT, 0)])
+def test_rows_ignore_unknown_rowcount(app, rowcount, expected):
+    """Cursor sem buffer (exportação em streaming) informa 2**64 - 1 linhas"""
+    connection = SimpleNamespace(info={})
+    cursor = SimpleNamespace(rowcount=rowcount, description=[('id',)])
+    with app.test_request_context('/'):
+        app.preprocess_request()
+        _before_cursor_execute(connection, cursor, 'SELECT id FROM clients', (), None, False)
+        _after_cursor_execute(connection, cursor, 'SELECT id FROM clients', (), None, False)
+        assert g._sql_stats['queries'] == 1
+        assert g._sql_stats['rows'] == expected
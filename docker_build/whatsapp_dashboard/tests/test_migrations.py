@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+import pytest
+
+import src.main
+from src.models import pagination
+from src.models.migrations import HOT_QUERIES
+from src.routes import clients, financial, service_orders
+
+USER = SimpleNamespace(id=1, role='admin', technician_id=None, full_name='Admin',
+                       has_permission=lambda permission: True)
+
+@pytest.fixture
+def executed(app, monkeypatch):
+    """SQL enviado pelas listas ao paginate_keyset (a consulta falha e a página sai vazia)"""
+    executed = []
+
+    def capture(sql, params=None):
+        executed.append((sql, list(params or [])))
+        raise RuntimeError('sem banco')
+
+    monkeypatch.setattr(pagination, 'execute_sql', capture)
+    for module in (src.main, clients, financial, service_orders):
+        monkeypatch.setattr(module, 'get_current_user', lambda: USER)
+    for module in (clients, financial, service_orders):
+        monkeypatch.setattr(module, 'render_template', lambda template, **context: '')
+    return executed
+
+def logged_client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    return client
+
+@pytest.mark.parametrize('url, query_name', [
+    ('/financial/invoices', 'financial.invoices'),
+    ('/orders/?status=pending', 'service_orders.list: por status'),
+    ('/clients/', 'clients.list'),
+])
+def test_hot_queries_are_the_list_routes_sql(app, executed, url, query_name):
+    """O EXPLAIN do "flask upgrade --check" analisa exatamente o SQL da primeira página"""
+    assert logged_client(app).get(url).status_code == 200
+    hot = {name: (sql, list(params)) for name, sql, params in HOT_QUERIES}
+    assert executed == [hot[query_name]]
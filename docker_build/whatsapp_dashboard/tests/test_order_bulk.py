@@ -0,0 +1,152 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.models import order_bulk
+from src.models.database import db
+from src.models.order_bulk import MAX_BULK_ORDERS, bulk_update_orders, parse_order_ids
+
+# (id, client_id, technician_id, status, completed_at)
+ORDERS = [
+    (1, 10, 1, 'assigned', None),
+    (2, 11, 1, 'in_progress', None),
+    (3, 12, 2, 'assigned', None),
+    (4, 10, 1, 'completed', '2024-01-01 08:00:00'),
+]
+
+def make_user(role, technician_id=None, permissions=()):
+    return SimpleNamespace(role=role, technician_id=technician_id,
+                           has_permission=lambda permission: permission in permissions)
+
+ADMIN = make_user('admin', permissions=('edit_all', 'edit_orders'))
+TECHNICIAN = make_user('technician', technician_id=1, permissions=('edit_orders',))
+
+@pytest.fixture
+def orders(sqlite_sql):
+    sqlite_sql(order_bulk)
+    connection = db.session.connection()
+    connection.exec_driver_sql("CREATE TABLE technicians (id INTEGER PRIMARY KEY)")
+    connection.exec_driver_sql("INSERT INTO technicians (id) VALUES (1), (2), (3)")
+    connection.exec_driver_sql("""
+        CREATE TABLE service_orders (id INTEGER PRIMARY KEY, client_id INTEGER, technician_id INTEGER,
+                                     status TEXT, completed_at TEXT)
+    """)
+    for order in ORDERS:
+        connection.exec_driver_sql("INSERT INTO service_orders VALUES (?, ?, ?, ?, ?)", order)
+    db.session.commit()
+
+def order_rows():
+    result = db.session.connection().exec_driver_sql(
+        "SELECT id, technician_id, status, completed_at FROM service_orders ORDER BY id")
+    return {row.id: row for row in result}
+
+def messages(results):
+    return [(result['id'], result['ok'], result['message']) for result in results]
+
+def test_parse_order_ids():
+    assert parse_order_ids(['3, 1', '2;3', 'x', '']) == [3, 1, 2]
+    assert parse_order_ids('5 6,5') == [5, 6]
+
+@pytest.mark.parametrize('kwargs, message', [
+    ({'status': 'finished'}, 'Status inválido'),
+    ({}, 'Informe o novo status'),
+    ({'technician_id': 99}, 'Técnico não encontrado'),
+])
+def test_invalid_requests(orders, kwargs, message):
+    with pytest.raises(ValueError, match=message):
+        bulk_update_orders(ADMIN, [1], **kwargs)
+
+def test_too_many_orders(orders):
+    with pytest.raises(ValueError, match='no máximo'):
+        bulk_update_orders(ADMIN, list(range(1, MAX_BULK_ORDERS + 2)), status='assigned')
+
+def test_technician_cannot_reassign(orders):
+    with pytest.raises(ValueError, match='Apenas administradores'):
+        bulk_update_orders(TECHNICIAN, [1], technician_id=2)
+
+def test_admin_completes_and_keeps_previous_completion(orders):
+    results, client_ids = bulk_update_orders(ADMIN, [4, 1, 99], status='completed')
+    assert messages(results) == [(4, True, 'Atualizada'), (1, True, 'Atualizada'),
+                                 (99, False, 'Ordem não encontrada')]
+    assert client_ids == [10]
+
+    rows = order_rows()
+    assert rows[1].status == 'completed' and rows[1].completed_at is not None
+    assert rows[4].completed_at == '2024-01-01 08:00:00'
+    assert rows[2].status == 'in_progress'
+
+def test_admin_reassigns(orders):
+    results, client_ids = bulk_update_orders(ADMIN, [1, 3], technician_id=3)
+    assert all(result['ok'] for result in results)
+    assert client_ids == [10, 12]
+    rows = order_rows()
+    assert (rows[1].technician_id, rows[3].technician_id) == (3, 3)
+    assert rows[1].status == 'assigned'
+
+def test_technician_updates_only_own_orders(orders):
+    results, client_ids = bulk_update_orders(TECHNICIAN, [1, 3], status='en_route')
+    assert messages(results) == [(1, True, 'Atualizada'), (3, False, 'Ordem não atribuída a você')]
+    assert client_ids == [10]
+    rows = order_rows()
+    assert rows[1].status == 'en_route'
+    assert rows[3].status == 'assigned'
+
+def test_order_reassigned_after_read_is_not_reported_updated(orders, monkeypatch):
+    """Ordem reatribuída entre a leitura e o UPDATE: não é alterada nem aparece como atualizada"""
+    load_orders = order_bulk._load_orders
+
+    def load_then_reassign(order_ids):
+        loaded = load_orders(order_ids)
+        db.session.connection().exec_driver_sql("UPDATE service_orders SET technician_id = 2 WHERE id = 2")
+        return loaded
+
+    monkeypatch.setattr(order_bulk, '_load_orders', load_then_reassign)
+    results, client_ids = bulk_update_orders(TECHNICIAN, [1, 2], status='arrived')
+    assert messages(results) == [(1, True, 'Atualizada'), (2, False, 'Ordem não atribuída a você')]
+    assert client_ids == [10]
+    assert order_rows()[2].status == 'in_progress'
+
+def test_bulk_route_reports_saved_orders_when_rollup_refresh_fails(app, orders, sqlite_sql, monkeypatch):
+    """Falha no agregado dos técnicos depois do commit não vira "Nenhuma ordem foi alterada" """
+    import src.main
+    from src.models import cache
+    from src.routes import service_orders
+
+    def failing_refresh(force=False):
+        raise RuntimeError('agregado indisponível')
+
+    sqlite_sql(cache)
+    monkeypatch.setattr(service_orders, 'refresh_technician_rollup', failing_refresh)
+    monkeypatch.setattr(service_orders, 'get_current_user', lambda: ADMIN)
+    monkeypatch.setattr(src.main, 'get_current_user', lambda: ADMIN)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+
+    response = client.post('/orders/bulk-update', json={'order_ids': [1, 2], 'status': 'arrived'})
+    assert response.status_code == 200
+    assert response.get_json()['updated'] == 2
+    assert order_rows()[1].status == 'arrived'
+
+def test_update_route_reports_saved_order_when_rollup_refresh_fails(app, orders, sqlite_sql, monkeypatch):
+    """Mesmo caso na edição de uma ordem: a mensagem é de sucesso e a ordem fica gravada"""
+    import src.main
+    from src.models import cache
+    from src.routes import service_orders
+
+    def failing_refresh(force=False):
+        raise RuntimeError('agregado indisponível')
+
+    sqlite_sql(cache, service_orders)
+    monkeypatch.setattr(service_orders, 'refresh_technician_rollup', failing_refresh)
+    monkeypatch.setattr(service_orders, 'get_current_user', lambda: ADMIN)
+    monkeypatch.setattr(src.main, 'get_current_user', lambda: ADMIN)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+
+    response = client.post('/orders/1/update', data={'status': 'arrived'})
+    assert response.status_code == 302
+    with client.session_transaction() as session:
+        assert [category for category, _ in session['_flashes']] == ['success']
+    assert order_rows()[1].status == 'arrived'
@@ -0,0 +1,72 @@
+import pytest
+
+from src.models import pagination
+from src.models.database import db
+from src.models.pagination import decode_cursor, encode_cursor, keyset_query, paginate_keyset
+
+# (id, score): score NULL em três linhas e empates em 3 e 5
+ITEMS = [(1, 5), (2, None), (3, 3), (4, 5), (5, None), (6, 7), (7, 3), (8, None), (9, 1)]
+
+# Ordem do MySQL (e do SQLite): NULL é o menor valor
+DESC_ORDER = [6, 4, 1, 7, 3, 9, 8, 5, 2]
+ASC_ORDER = [2, 5, 8, 9, 3, 7, 1, 4, 6]
+
+@pytest.fixture
+def items(sqlite_sql):
+    sqlite_sql(pagination)
+    connection = db.session.connection()
+    connection.exec_driver_sql("CREATE TABLE items (id INTEGER PRIMARY KEY, score INTEGER)")
+    connection.exec_driver_sql("INSERT INTO items (id, score) VALUES " + ', '.join(
+        f"({item_id}, {'NULL' if score is None else score})" for item_id, score in ITEMS))
+
+def page(cursor=None, direction='next', descending=True, nullable=True):
+    return paginate_keyset("SELECT id, score FROM items", [], [], 'score', 'id', cursor=cursor,
+                           direction=direction, descending=descending, nullable=nullable, per_page=2)
+
+def walk_forward(descending):
+    pages = [page(descending=descending)]
+    while pages[-1].has_next:
+        pages.append(page(pages[-1].next_cursor, descending=descending))
+    return pages
+
+def ids(result):
+    return [row.id for row in result.rows]
+
+def test_cursor_roundtrip():
+    assert decode_cursor(encode_cursor('2024-01-01 10:00:00', 42)) == ('2024-01-01 10:00:00', 42)
+    assert decode_cursor(encode_cursor(None, 7)) == (None, 7)
+
+def test_invalid_cursor_starts_from_first_page():
+    assert decode_cursor('não-é-cursor') is None
+    assert decode_cursor('') is None
+
+@pytest.mark.parametrize('descending, expected', [(True, DESC_ORDER), (False, ASC_ORDER)])
+def test_nullable_sort_visits_every_row_once(items, descending, expected):
+    pages = walk_forward(descending)
+    assert [item_id for result in pages for item_id in ids(result)] == expected
+    assert not pages[0].has_prev
+    assert all(result.has_prev for result in pages[1:])
+
+@pytest.mark.parametrize('descending', [True, False])
+def test_prev_cursor_returns_previous_page(items, descending):
+    pages = walk_forward(descending)
+    for previous, current in zip(pages, pages[1:]):
+        back = page(current.prev_cursor, direction='prev', descending=descending)
+        assert ids(back) == ids(previous)
+        assert back.has_next
+
+def test_non_nullable_sort_with_filter(items):
+    result = paginate_keyset("SELECT id, score FROM items", ['score IS NOT NULL'], [], 'score', 'id',
+                             descending=False, per_page=4)
+    assert ids(result) == [9, 3, 7, 1]
+    result = paginate_keyset("SELECT id, score FROM items", ['score IS NOT NULL'], [], 'score', 'id',
+                             cursor=result.next_cursor, descending=False, per_page=4)
+    assert ids(result) == [4, 6]
+    assert not result.has_next
+
+def test_keyset_query_after_null_position():
+    sql, params = keyset_query("SELECT id, score FROM items", ['score > %s'], [0], 'score', 'id',
+                               position=(None, 5), nullable=True, per_page=2)
+    assert sql == ("SELECT id, score FROM items WHERE score > %s AND (score IS NULL AND id < %s)"
+                   " ORDER BY score DESC, id DESC LIMIT %s")
+    assert params == [0, 5, 3]
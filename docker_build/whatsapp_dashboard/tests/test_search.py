@@ -0,0 +1,9 @@
+from src.models.search import phone_prefixes, search_filter, NO_MATCH
+
+def test_phone_prefixes_skip_all_zero_terms():
+    assert phone_prefixes('0000') == []
+    assert phone_prefixes('011 9999-0000') == ['1199990000', '551199990000']
+
+def test_search_filter_without_conditions_matches_nothing():
+    assert search_filter('!!', [('id', 'clients')]) == (NO_MATCH, [])
+    assert search_filter('  ', [('id', 'clients')]) == (None, [])
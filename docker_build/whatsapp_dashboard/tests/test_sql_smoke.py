@@ -0,0 +1,68 @@
+import ast
+import glob
+import os
+from datetime import date
+
+from src.models.database import execute_sql
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+
+def test_no_textual_sql_in_session_execute():
+    """SQLAlchemy 2 recusa texto em session.execute: todo SQL literal passa por execute_sql"""
+    offenders = []
+    for path in glob.glob(os.path.join(SRC_DIR, '**', '*.py'), recursive=True):
+        with open(path, encoding='utf-8') as source:
+            tree = ast.parse(source.read())
+        for node in ast.walk(tree):
+            if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                    and node.func.attr == 'execute' and node.args
+                    and isinstance(node.args[0], (ast.Constant, ast.JoinedStr))):
+                offenders.append(f"{os.path.relpath(path, SRC_DIR)}:{node.lineno}")
+    assert offenders == []
+
+def test_execute_sql_without_params(app):
+    assert execute_sql("SELECT 1").fetchone()[0] == 1
+
+def test_dashboard_cache_roundtrip(mysql_app):
+    from src.models.cache import cache_get, cache_set, cache_delete
+    cache_set('test:smoke', {'value': 1}, 60)
+    assert cache_get('test:smoke') == {'value': 1}
+    cache_delete('test:smoke')
+    assert cache_get('test:smoke') is None
+
+def test_dashboard_stats_snapshot(mysql_app):
+    from src.models.dashboard_stats import DashboardStats
+    snapshot = DashboardStats.take_snapshot(date.today())
+    assert snapshot.stat_date == date.today()
+    assert isinstance(DashboardStats.get_current_stats(), dict)
+    assert DashboardStats.get_history(7)
+
+def test_invoice_rollup_moves_changed_due_date(mysql_app):
+    """Fatura que muda de vencimento sai da contagem do dia antigo na atualização incremental"""
+    import pytest
+    from src.models.database import db
+    from src.models.invoice_rollup import rebuild_invoice_rollup, refresh_invoice_rollup, invoice_report
+
+    client = execute_sql("SELECT id FROM clients LIMIT 1").fetchone()
+    if client is None:
+        pytest.skip('sem clientes no banco de teste')
+
+    old_day, new_day = date(2001, 1, 10), date(2001, 1, 20)
+    invoice_id = execute_sql("""
+        INSERT INTO invoices (client_id, amount, due_date, status, description, created_at)
+        VALUES (%s, 10, %s, 'open', 'teste do agregado', NOW())
+    """, (client[0], old_day)).lastrowid
+    db.session.commit()
+    try:
+        rebuild_invoice_rollup()
+        execute_sql("UPDATE invoices SET due_date = %s WHERE id = %s", (new_day, invoice_id))
+        db.session.commit()
+        refresh_invoice_rollup(force=True)
+
+        report = invoice_report(old_day, date(2001, 2, 1))
+        assert report['status_stats']['open']['count'] == 1
+        assert invoice_report(old_day, new_day)['status_stats'] == {}
+    finally:
+        execute_sql("DELETE FROM invoices WHERE id = %s", (invoice_id,))
+        db.session.commit()
+        rebuild_invoice_rollup()